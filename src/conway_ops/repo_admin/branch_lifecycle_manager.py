@@ -1,11 +1,17 @@
 import os                                                           as _os
 
+import pandas                                                       as _pd
+
 from conway.application.application                                 import Application
 from conway.async_utils.scheduling_context                          import SchedulingContext
 from conway.async_utils.ushering_to                                 import UsheringTo
 
+from conway_ops.repo_admin.github_bundle_inspector                  import GitHub_BundleInspector
+from conway_ops.repo_admin.github_repo_inspector                    import GitHub_RepoInspector
 from conway_ops.repo_admin.repo_administration                      import RepoAdministration
+from conway_ops.repo_admin.repo_inspector                           import PullRequestOutcome
 from conway_ops.repo_admin.repo_inspector_factory                   import RepoInspectorFactory
+from conway_ops.repo_admin.repo_statics                             import RepoStatics
 from conway_ops.util.git_branches                                   import GitBranches
 from conway_ops.util.git_local_client                               import GitLocalClient
 
@@ -79,40 +85,32 @@ class BranchLifecycleManager(RepoAdministration):
 
         super().__init__(local_root, remote_root, repo_bundle, remote_gh_user, remote_gh_organization, gh_secrets_path)
 
-    async def pull_request_integration_to_master(self):
+    async def pull_request_integration_to_master(self, fast_forward=False):
         '''
         Does a pull request to update the remote master from the remote integration, and vice versa.
+
+        Pull requests that would have nothing to merge are not created (see :meth:`_pull_requests`).
+
+        :param bool fast_forward: optional parameter that defaults to False. If True, destination branches that
+            lack no commits of the source branch are fast-forwarded instead of getting a merge commit from a pull
+            request (see :meth:`conway_ops.repo_admin.repo_inspector.RepoInspector.pull_request`).
+        :return: A summary of which repos needed pull requests
+        :rtype: :class:`pandas.DataFrame`
         '''
         GB                                              = GitBranches
-        app_name                                        = Application.app().app_name
         master                                          = GB.MASTER_BRANCH.value
         integration                                     = GB.INTEGRATION_BRANCH.value
         
         parent_context                                  = SchedulingContext()
 
-        async with UsheringTo(result_l=[]) as usher:
-            for repo_name in self.repo_names():
-                self.log_info(f"----------- {repo_name} (remote) -----------",
-                              xlabels = parent_context.as_xlabel())
-
-                inspector                               = RepoInspectorFactory.findInspector(self.remote_root,
-                                                                                             repo_name)
+        pr_specs_l                                      = []
+        for repo_name in self.repo_names():
+            pr_specs_l.append((repo_name, master, integration))
+            pr_specs_l.append((repo_name, integration, master))
 
-                usher                                   += inspector.pull_request(
-                                                            scheduling_context   = SchedulingContext(parent_context),
-                                                            from_branch          = master, 
-                                                            to_branch            = integration,
-                                                            title                = f"Merge {master} -> {integration} (remote)",
-                                                            body                 = f"Automated PR creation by {app_name}")
-            
-                usher                                   += inspector.pull_request(
-                                                            scheduling_context   = SchedulingContext(parent_context),
-                                                            from_branch          = integration, 
-                                                            to_branch            = master,
-                                                            title                = f"Merge {integration} -> {master} (remote)",
-                                                            body                 = f"Automated PR creation by {app_name}")
+        return await self._pull_requests(parent_context, pr_specs_l, fast_forward=fast_forward)
 
-    async def publish_release(self):
+    async def publish_release(self, fast_forward=False):
         '''
         This is used when the remote master branch contains a new release, arising from the development
         workflows: feature branches were merged into integration, and the remote integration branch was
@@ -126,28 +124,26 @@ class BranchLifecycleManager(RepoAdministration):
 
         End effect is that we "published" a release from the remote master branch to the local operate
         branch.
+
+        :param bool fast_forward: optional parameter that defaults to False. If True, destination branches that
+            lack no commits of the source branch are fast-forwarded instead of getting a merge commit from a pull
+            request (see :meth:`conway_ops.repo_admin.repo_inspector.RepoInspector.pull_request`).
+        :return: A summary of which repos needed pull requests
+        :rtype: :class:`pandas.DataFrame`
         '''
         GB                                              = GitBranches
-        app_name                                        = Application.app().app_name
         master                                          = GB.MASTER_BRANCH.value
         operate                                         = GB.OPERATE_BRANCH.value     
 
         parent_context                                  = SchedulingContext()
         
+        summary_df                                      = await self._pull_requests(
+                                                                parent_context,
+                                                                [(repo_name, master, operate) for repo_name in self.repo_names()],
+                                                                fast_forward        = fast_forward)
+
         async with UsheringTo(result_l=[]) as usher:       
             for repo_name in self.repo_names():
-                self.log_info(f"----------- {repo_name} (remote) -----------",
-                              xlabels = parent_context.as_xlabel())
-
-                remote_inspector                        = RepoInspectorFactory.findInspector(self.remote_root,
-                                                                                                repo_name)
-                usher                                   += remote_inspector.pull_request(
-                                                                scheduling_context  = SchedulingContext(parent_context),
-                                                                from_branch         = master, 
-                                                                to_branch           = operate,
-                                                                title               = f"Merge {master} -> {operate} (remote)",
-                                                                body                = f"Automated PR creation by {app_name}")
-                
                 self.log_info(f"----------- {repo_name} (local) -----------",
                               xlabels = parent_context.as_xlabel())
 
@@ -158,8 +154,9 @@ class BranchLifecycleManager(RepoAdministration):
                 usher                                   += local_inspector.update_local(
                                                                 scheduling_context  = SchedulingContext(parent_context),
                                                                 branch              = operate)
+        return summary_df
 
-    async def publish_hot_fix(self):
+    async def publish_hot_fix(self, fast_forward=False):
         '''
         A "hot fix" is a change that is implemented in the local operate branch. To publish the "hot fix"
         means to make the change available to the official release line (the master branch) as well as to
@@ -172,40 +169,40 @@ class BranchLifecycleManager(RepoAdministration):
         1. Does a pull request from the (remote) operate branch to the (remote) master branch
         2. Does a pull request from the (remote) master branch to the (remote) integration branch
         3. Does a pull to the local integration branch.
+
+        Each step is done for all repos before moving on to the next step, since each step needs the changes
+        of the previous one. 
+
+        :param bool fast_forward: optional parameter that defaults to False. If True, destination branches that
+            lack no commits of the source branch are fast-forwarded instead of getting a merge commit from a pull
+            request (see :meth:`conway_ops.repo_admin.repo_inspector.RepoInspector.pull_request`).
+        :return: A summary of which repos needed pull requests
+        :rtype: :class:`pandas.DataFrame`
         '''
         GB                                              = GitBranches
-        app_name                                        = Application.app().app_name
         master                                          = GB.MASTER_BRANCH.value
         integration                                     = GB.INTEGRATION_BRANCH.value
         operate                                         = GB.OPERATE_BRANCH.value   
         
         parent_context                                  = SchedulingContext()         
 
+        # Update operate => master (remote)
+        summary1_df                                     = await self._pull_requests(
+                                                                parent_context,
+                                                                [(repo_name, operate, master) for repo_name in self.repo_names()],
+                                                                fast_forward        = fast_forward)
+
+        # Update master => integration (remote)
+        summary2_df                                     = await self._pull_requests(
+                                                                parent_context,
+                                                                [(repo_name, master, integration) for repo_name in self.repo_names()],
+                                                                fast_forward        = fast_forward)
+
         async with UsheringTo(result_l=[]) as usher:
             for repo_name in self.repo_names():
 
-                remote_inspector                        = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
                 local_inspector                         = RepoInspectorFactory.findInspector(self.local_root, repo_name)
 
-                self.log_info(f"----------- {repo_name} (remote) -----------",
-                              xlabels = parent_context.as_xlabel())
-
-                # Update operate => master (remote)
-                usher                                   += remote_inspector.pull_request(
-                                                                scheduling_context  = SchedulingContext(parent_context),
-                                                                from_branch         = operate, 
-                                                                to_branch           = master,
-                                                                title               = f"Merge {operate} -> {master} (remote)",
-                                                                body                = f"Automated PR creation by {app_name}")
-
-                # Update master => integration (remote)
-                usher                                   += remote_inspector.pull_request(
-                                                                scheduling_context  = SchedulingContext(parent_context),
-                                                                from_branch         = master, 
-                                                                to_branch           = integration,
-                                                                title               = f"Merge {master} -> {integration} (remote)",
-                                                                body                = f"Automated PR creation by {app_name}")
-
                 self.log_info(f"----------- {repo_name} (local) -----------",
                               xlabels = parent_context.as_xlabel())
                 # Now update local integration from the remote
@@ -213,6 +210,128 @@ class BranchLifecycleManager(RepoAdministration):
                                                                 scheduling_context  = SchedulingContext(parent_context),
                                                                 branch              = integration)
 
+        return _pd.concat([summary1_df, summary2_df], ignore_index=True)
+
+    async def _pull_requests(self, parent_context, pr_specs_l, fast_forward=False):
+        '''
+        Creates and completes pull requests in the remote repos, skipping those that would have nothing to merge.
+
+        Before making any pull request, it checks for all of them at once how many commits the source branch
+        has that the destination branch lacks. This avoids wasting mutating (and rate limited) calls on pull
+        requests that GitHub would reject anyway because there are no commits between the branches.
+
+        Pull requests for different repos run concurrently, but those for the same repo run in the order given.
+
+        :param conway.async_utils.scheduling_context.SchedulingContext parent_context: context of the caller.
+        :param list[tuple] pr_specs_l: triples of strings (repo name, from branch, to branch), one per pull request.
+        :param bool fast_forward: if True, destination branches are fast-forwarded instead of merged into whenever
+            possible.
+        :return: A summary with one row per pull request in ``pr_specs_l``, which is also logged.
+        :rtype: :class:`pandas.DataFrame`
+        '''
+        RS                                              = RepoStatics
+        app_name                                        = Application.app().app_name
+
+        ahead_by_dict                                   = await self._commits_to_merge(pr_specs_l)
+
+        async def _one_pull_request(repo_name, from_branch, to_branch, commits_to_merge):
+            if commits_to_merge == 0:
+                self.log_info(f"{repo_name}: {from_branch}->{to_branch}: skipped, nothing to merge",
+                              xlabels = parent_context.as_xlabel())
+                return [repo_name, from_branch, to_branch, commits_to_merge, "Skipped (nothing to merge)"]
+
+            inspector                                   = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
+            result                                      = await inspector.pull_request(
+                                                            scheduling_context   = SchedulingContext(parent_context),
+                                                            from_branch          = from_branch, 
+                                                            to_branch            = to_branch,
+                                                            title                = f"Merge {from_branch} -> {to_branch} (remote)",
+                                                            body                 = f"Automated PR creation by {app_name}",
+                                                            fast_forward         = fast_forward)
+            outcome                                     = {PullRequestOutcome.NOOP:            "Not needed",
+                                                           PullRequestOutcome.FAST_FORWARD:    "Fast-forwarded",
+                                                           PullRequestOutcome.MERGE:           "Merged"}[result.outcome]
+            return [repo_name, from_branch, to_branch, commits_to_merge, outcome]
+
+        async def _repo_pull_requests(repo_specs_l):
+            # GOTCHA: a repo's pull requests must go one at a time, in the order given. For example, once the merge
+            #   of integration into master lands, the pull request from master to integration no longer matches the
+            #   head of master, and GitHub rejects its merge with a 409.
+            rows_l                                      = []
+            for repo_name, from_branch, to_branch in repo_specs_l:
+                rows_l.append(await _one_pull_request(repo_name, from_branch, to_branch,
+                                                      ahead_by_dict[(repo_name, from_branch, to_branch)]))
+            return rows_l
+
+        specs_by_repo_dict                              = {}
+        for repo_name, from_branch, to_branch in pr_specs_l:
+            specs_by_repo_dict.setdefault(repo_name, []).append((repo_name, from_branch, to_branch))
+
+        rows_by_repo_l                                  = []
+        async with UsheringTo(result_l=rows_by_repo_l) as usher:
+            for repo_specs_l in specs_by_repo_dict.values():
+                usher                                   += _repo_pull_requests(repo_specs_l)
+        data_l                                          = [row for rows_l in rows_by_repo_l for row in rows_l]
+
+        summary_df                                      = _pd.DataFrame(data    = data_l,
+                                                                        columns = [RS.REPO_NAME_COL, RS.FROM_BRANCH_COL,
+                                                                                   RS.TO_BRANCH_COL, RS.COMMITS_TO_MERGE_COL,
+                                                                                   RS.PR_OUTCOME_COL])
+        summary_df                                      = summary_df.sort_values(by = [RS.REPO_NAME_COL, RS.FROM_BRANCH_COL],
+                                                                                 ignore_index = True)
+        needed_l                                        = sorted(set(summary_df[summary_df[RS.PR_OUTCOME_COL].isin(
+                                                                                    ["Merged", "Fast-forwarded"])]
+                                                                                [RS.REPO_NAME_COL]))
+        self.log_info(f"Pull requests were needed for {len(needed_l)} of {len(set(summary_df[RS.REPO_NAME_COL]))} repos"
+                      + (f" ({', '.join(needed_l)})" if len(needed_l) > 0 else "")
+                      + ":\n" + summary_df.to_string(index=False),
+                      xlabels = parent_context.as_xlabel())
+        return summary_df
+
+    async def _commits_to_merge(self, pr_specs_l):
+        '''
+        :param list[tuple] pr_specs_l: triples of strings (repo name, from branch, to branch), one per pull request.
+        :return: A dictionary whose keys are the triples in ``pr_specs_l``, and whose values are the number of commits
+            in the from branch that are not in the to branch, or None if that can't be determined (e.g., if a branch
+            does not exist).
+        :rtype: dict
+        '''
+        # For repos in GitHub, get all the counts with batched GraphQL queries. For other remotes, go one by one.
+        github_l                                        = []
+        others_l                                        = []
+        for spec in pr_specs_l:
+            repo_name                                   = spec[0]
+            if isinstance(RepoInspectorFactory.findInspector(self.remote_root, repo_name), GitHub_RepoInspector):
+                github_l.append(spec)
+            else:
+                others_l.append(spec)
+
+        result_dict                                     = {}
+        if len(github_l) > 0:
+            bundle_dict                                 = await GitHub_BundleInspector(self.remote_root).ahead_by(
+                                                                    [(repo_name, to_branch, from_branch)
+                                                                        for repo_name, from_branch, to_branch in github_l])
+            for repo_name, from_branch, to_branch in github_l:
+                result_dict[(repo_name, from_branch, to_branch)] \
+                                                        = bundle_dict[(repo_name, to_branch, from_branch)]
+
+        async def _one_count(repo_name, from_branch, to_branch):
+            inspector                                   = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
+            try:
+                result                                  = await inspector.ahead_behind(base=to_branch, head=from_branch)
+                ahead                                   = None if result is None else result[0]
+            except Exception:
+                ahead                                   = None
+            return (repo_name, from_branch, to_branch), ahead
+
+        counts_l                                        = []
+        async with UsheringTo(result_l=counts_l) as usher:
+            for repo_name, from_branch, to_branch in others_l:
+                usher                                   += _one_count(repo_name, from_branch, to_branch)
+        result_dict.update(dict(counts_l))
+
+        return result_dict
+
     async def complete_feature(self, feature_branch):
         '''
         Merges a feature branch into the integration branch locally, and pushes the integration branch.
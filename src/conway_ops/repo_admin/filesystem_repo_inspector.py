@@ -1,11 +1,14 @@
+import asyncio
 import git
 import datetime as _dt
 
 from conway.observability.logger                                    import Logger
 from conway.util.date_utils                                         import DateUtils
 
-from conway_ops.repo_admin.repo_inspector                           import RepoInspector, CommitInfo, CommittedFileInfo
-from conway_ops.util.git_local_client                                     import GitLocalClient
+from conway_ops.repo_admin.repo_inspector                           import RepoInspector, CommitInfo, CommittedFileInfo, \
+                                                                            RepoStatusSnapshot, PullRequestOutcome
+from conway_ops.util.git_local_client                               import GitLocalClient
+from conway_ops.util.git_ref_reader                                 import GitRefReader
 
 
 class FileSystem_RepoInspector(RepoInspector):
@@ -24,6 +27,7 @@ class FileSystem_RepoInspector(RepoInspector):
         super().__init__(parent_url, repo_name)
 
         self.executor                       = GitLocalClient(parent_url + "/" + repo_name)
+        self.ref_reader                     = GitRefReader(parent_url + "/" + repo_name)
 
     def init_repo(self):
         '''
@@ -40,7 +44,10 @@ class FileSystem_RepoInspector(RepoInspector):
         :return: The name of the current branch
         :rtype: str
         '''
-        result                              = await self.executor.execute(command = "git rev-parse --abbrev-ref HEAD")
+        # Read the HEAD file directly if possible, as that is much cheaper than running GIT
+        result                              = self.ref_reader.current_branch()
+        if result is None:
+            result                          = await self.executor.execute(command = "git rev-parse --abbrev-ref HEAD")
         return result
     
     async def modified_files(self):
@@ -99,6 +106,64 @@ class FileSystem_RepoInspector(RepoInspector):
 
         return result
 
+    async def status_snapshot(self):
+        '''
+        Gets at once the current branch, the last commit and the untracked, modified and deleted files, with just
+        one ``git status`` (which scans the working tree once) and one ``git log``, run concurrently.
+
+        :return: the status of the repo.
+        :rtype: RepoStatusSnapshot
+        '''
+        raw, last_commit                    = await asyncio.gather(
+                                                    self.executor.execute(
+                                                        command = "git status --porcelain=v2 --branch -z --untracked-files=all"),
+                                                    self.last_commit())
+
+        current_branch                      = None
+        untracked_files_l                   = []
+        modified_files_l                    = []
+        deleted_files_l                     = []
+
+        # raw is a sequence of NUL-terminated records, such as
+        #
+        #       '# branch.head master'
+        #       '1 .M N... 100644 100644 100644 3f2a...e1 3f2a...e1 src/conway_ops/util/git_local_client.py'
+        #       '? docs/new notes.txt'
+        #
+        # For each file, the first letter tells the kind of record ("1" for ordinary changes, "2" for renames or copies,
+        # "u" for unmerged files, and "?" for untracked files), and for changes the second character of the "XY" field
+        # tells the status in the working tree relative to the index. Paths are not quoted, and may contain spaces.
+        #
+        # Renames and copies are followed by an additional record with the original path, which we skip.
+        #
+        records_l                           = raw.split("\0")
+        idx                                 = 0
+        while idx < len(records_l):
+            record                          = records_l[idx]
+            idx                             += 1
+            if record.startswith("# branch.head "):
+                current_branch              = record[len("# branch.head "):]
+                if current_branch == "(detached)":
+                    # Same as what "git rev-parse --abbrev-ref HEAD" gives
+                    current_branch          = "HEAD"
+            elif record.startswith("? "):
+                untracked_files_l.append(record[2:])
+            elif record[:2] in ["1 ", "2 ", "u "]:
+                # Number of space-separated fields before the path, for each kind of record
+                nb_fields                   = {"1": 8, "2": 9, "u": 10}[record[0]]
+                tokens                      = record.split(" ", nb_fields)
+                worktree_status             = tokens[1][1]
+                if record[0] == "2":
+                    idx                     += 1
+                # Like "git ls-files -m", unmerged files count as modified. For them, "XY" tells what each side
+                # of the merge did, not the status in the working tree
+                if record[0] == "u" or worktree_status in ["M", "T"]:
+                    modified_files_l.append(tokens[-1])
+                elif worktree_status == "D":
+                    deleted_files_l.append(tokens[-1])
+
+        return RepoStatusSnapshot(current_branch, last_commit, untracked_files_l, modified_files_l, deleted_files_l)
+
     async def last_commit(self):
         '''
         :return: A :class:`CommitInfo` with information about last commit"
@@ -153,6 +218,11 @@ class FileSystem_RepoInspector(RepoInspector):
         :return: (local) branches for the repo
         :rtype: list[str]
         '''
+        # Read the refs directly if possible, as that is much cheaper than running GIT
+        result                              = self.ref_reader.branches()
+        if not result is None:
+            return result
+
         raw                                 = await self.executor.execute(command = 'git branch')
         # raw is something like
         #
@@ -170,151 +240,91 @@ class FileSystem_RepoInspector(RepoInspector):
         result                              = await self.executor.execute(command = "git checkout " + str(branch_name))
         return result
 
-    async def committed_files(self):
+    async def committed_files(self, since=None, until=None, max_commits=None, paths=None):
         '''
         Returns an iterable over CommitedFileInfo objects, yielding in chronological order the history of commits
         (i.e., a log) for the repo associated to this :class:`RepoInspector`
-        '''
-        log                                             = await self.executor.execute(command = "git log --name-only")
-        commits                                         = log.split("commit ")
-        commits                                         = [c for c in commits if len(c)>0] # Filter out spurious tokens
 
+        The optional parameters are pushed down to ``git log`` as options, so GIT only reads the bounded history.
+        See :meth:`RepoInspector.committed_files` for their meaning.
+        '''
         result                                          = []
+        async for cfi_l in self._committed_file_batches(since, until, max_commits, paths):
+            result.extend(cfi_l)
+        return result
 
+    async def iter_committed_files(self, since=None, until=None, max_commits=None, paths=None):
+        '''
+        Like :meth:`committed_files`, but yields the CommittedFileInfo objects as the output of ``git log`` is read
+        instead of returning them all at once, so memory use does not grow with the size of the history.
+        '''
+        async for cfi_l in self._committed_file_batches(since, until, max_commits, paths):
+            for cfi in cfi_l:
+                yield cfi
 
-        for commit_idx in range(len(commits)): # Use reversed to list commits in the order in which they were made
-            commit                                      = commits[commit_idx]
-
-            # commit_idx goes like 0, 1, 2, ..., listing commits in reverse order, so if we count commits
-            # from the first commit to the last, we need to make commit_nb go in the reverse ordering: .., 2, 1, 0
-            commit_nb                                   = len(commits) - 1 - commit_idx
-            lines                                       = commit.split("\n")
-            '''
-            The business logic below is inspired by this observation: if we print the lines
-            with a prefix for the line number, by doing
-
-                    for idx in range(len(lines)):
-                        line = lines[idx]
-                        print(str(idx) + ": " + line)
-
-            then the result is something like
-
-                0: 0d7521b185f4ba7748ca1e78f990b61a4bdfd8b8
-                1: Author: Alejandro Hernandez <alejandro.hernandez@finastra.com>
-                2: Date:   Wed May 17 14:03:58 2023 -0700
-                3: 
-                4:     [LEA UserStory 1455] Moved notebooks to ops repo
-                5: 
-                6: src/notebooks/.ipynb_checkpoints/GIT dashboard-checkpoint.ipynb
-                7: src/notebooks/.ipynb_checkpoints/Scratch-checkpoint.ipynb
-                8: src/notebooks/.ipynb_checkpoints/exploreClassifier-checkpoint.ipynb
-
-                        ...             ...
-
-            (Preliminary) UPSHOT: this tells that lines 0,1,2,4 give us the hash, author, date and summary, and lines 6+ the 
-                files that changed.
-
-            The above needs to be more nuanced, because if a commit is a merge, then it looks like this:
-
-                0: e7f556f218ad218a2484581e0b7efec522dcf33a
-                1: Merge: e9fc7d3 5019add
-                2: Author: Alejandro Hernandez at CC Labs <alejandro@chateauclaudia-labs.com>
-                3: Date:   Sat Jun 3 21:22:05 2023 -0700
-                4:    Merge pull request #1 from ChateauClaudia-Labs/integration
-                5:    
-                6:    First MVP
-
-            So for the (real UPSHOT):
-            - As we parse lines, if they start with "Author:" or "Date", that is whwere we get these fields from
-            - If a list is not blank but starts with blanks, then we treat it as part of the Summary
-            - Only when we are past the lines that start with blanks we assume we have the committed files
-            - And be aware that for merge commits, there might not be any files at all...
-
-            So we traverse through these states, progressing the line_idx as we go
-
-            '''
-            line_idx                                        = 0
-            hash                                            = lines[line_idx]
-
-            author                                          = None
-            date                                            = None
-            summary                                         = None
-
-            MAX_LINES                                       = len(lines)
-            A_SPACE                                         = " "
-            def _advance_to_summary():
-                nonlocal author
-                nonlocal date
-                nonlocal line_idx
-
-                while line_idx + 1 < MAX_LINES:
-                    next_line                               = lines[line_idx + 1]
-                    if next_line.startswith("Author:"):
-                        author                              = next_line.strip("Author:").strip()
-                    elif next_line.startswith("Date:"):
-                        date                                = next_line.strip("Date:").strip()
-                    elif next_line.startswith(A_SPACE):
-                        # Got to the summary. Done parsing this phase of the text
-                        return
-                    
-                    line_idx                                = line_idx + 1
-            
-            def _advance_to_committed_files():
-                nonlocal summary
-                nonlocal line_idx
-
-                while line_idx + 1 < MAX_LINES:
-                    next_line                               = lines[line_idx + 1]
-                    if len(next_line) == 0:
-                        line_idx                            = line_idx + 1
-                        continue
-                    elif next_line.startswith(A_SPACE):
-                        # This is part of the summary
-                        commit_msg                          = next_line.strip()
-                        summary                             = commit_msg if summary is None else summary + "; " + commit_msg
-                        line_idx                            = line_idx + 1
-                    else:
-                        # We don't start with a space or have an empty line, so we are done with the summary
-                        return
-
-
-            _advance_to_summary()
-            _advance_to_committed_files()
-
-            OFFSET                                          = line_idx + 1
-            for idx in range(OFFSET, MAX_LINES):
-                file                                        = lines[idx]
-                if len(file) == 0: # Empty line, ignore it
-                    continue
-
-                cfi                                         = CommittedFileInfo(commit_nb           = commit_nb,
-                                                                                commit_date         = date,
-                                                                                summary             = summary,
-                                                                                commit_file_nb      = idx - OFFSET,
-                                                                                commit_file         = file,
-                                                                                commit_hash         = hash,
-                                                                                commit_author       = author)
-
-                result.append(cfi)
-            
-            # Boundary case: perhaps there were no files at all, so in that case we still want to register
-            # the commit
-            if OFFSET >= MAX_LINES:
-                cfi                                         = CommittedFileInfo(commit_nb           = commit_nb,
-                                                                                commit_date         = date,
-                                                                                summary             = summary,
-                                                                                commit_file_nb      = 0,
-                                                                                commit_file         = "",
-                                                                                commit_hash         = hash,
-                                                                                commit_author       = author)
+    async def _committed_file_batches(self, since, until, max_commits, paths):
+        '''
+        Reads the log incrementally, yielding lists with the CommittedFileInfo objects for each part of the log read.
 
-                result.append(cfi)
+        :rtype: AsyncIterator[list[CommittedFileInfo]]
+        '''
+        # Pass the bounds as arguments rather than in a command string, so that paths need no quoting
+        bounds_l                                        = []
+        if not since is None:
+            bounds_l                                    += ["--since=" + RepoInspector._as_iso8601(since)]
+        if not until is None:
+            bounds_l                                    += ["--until=" + RepoInspector._as_iso8601(until)]
+        if not max_commits is None:
+            bounds_l                                    += [f"--max-count={int(max_commits)}"]
+        if not paths is None:
+            bounds_l                                    += ["--"] + list(paths)
+
+        # Commits are numbered from the oldest (0) but listed from the newest, so we need to know how many there
+        # are before numbering any. Counting is cheap compared to the log.
+        #
+        # GOTCHA: count before starting the log, not while it streams. The log holds a turn with the 
+        #       GitConcurrencyGovernor while it streams, so if it waited for the count, and many logs streamed at
+        #       once, they could hold all the turns and the counts would never get one.
+        #
+        count_result                                    = await self.executor.run(["git", "rev-list", "--count", "HEAD"]
+                                                                                  + bounds_l)
+        parser                                          = _CommitLogParser(int(count_result.stdout))
+        command_l                                       = ["git", "log", "-z", "--name-only",
+                                                           "--format=" + _CommitLogParser.FORMAT] + bounds_l
+        async for record_l in self.executor.stream(command = command_l, separator = "\0"):
+            yield parser.parse(record_l)
+        yield parser.close()
 
 
-        return result
-    
+    async def ahead_behind(self, base, head):
+        '''
+        Counts how far ``head`` has diverged from ``base``, without needing to get the log of either.
+
+        :param str base: branch name or commit hash used as the reference.
+        :param str head: branch name or commit hash compared against ``base``.
+        :return: a pair of ints: how many commits ``head`` is ahead of ``base``, and how many it is behind. None
+            if the repo does not know ``base`` or ``head``.
+        :rtype: tuple
+        '''
+        args_list                                       = ["git", "rev-list", "--left-right", "--count", f"{base}...{head}"]
+        result                                          = await self.executor.run(args_list, check=False)
+        if result.exit_code != 0:
+            for rev in [base, head]:
+                verify_result                           = await self.executor.run(
+                                                                ["git", "rev-parse", "-q", "--verify", f"{rev}^{{commit}}"],
+                                                                check=False)
+                if verify_result.exit_code != 0:
+                    return None
+            raise ValueError(GitLocalClient._failure_message(args_list, result.exit_code, result.stderr))
+        raw                                             = result.stdout
+
+        # raw is something like "3\t5", where the left count is for commits only in base and the right count
+        # is for commits only in head
+        #
+        behind, ahead                                   = [int(token) for token in raw.split()]
+        return ahead, behind
 
-    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body):
+    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body, fast_forward=False):
         '''
         Creates and completes a pull request from the ``from_branch`` to the ``to_branch``.
 
@@ -331,9 +341,11 @@ class FileSystem_RepoInspector(RepoInspector):
                 exists is that it was mandated by the abstract parent class.
         :param str body: this parameter is not used in this class, so it is ignored. The only reason the parameter
                 exists is that it was mandated by the abstract parent class.
-        :returns: The pull request information. If the pull request was not created for a benign reason
-                (for example, if there are no commits to merge from the `from_branch` to the `to_branch`)
-                it returns None.
+        :param bool fast_forward: this parameter is not used in this class, so it is ignored: ``git merge`` 
+                already fast-forwards whenever possible. The only reason the parameter exists is that it was
+                mandated by the abstract parent class.
+        :returns: What was done. Its details are the output of the GIT merge.
+        :rtype: PullRequestOutcome
         '''    
         # Remember the original branch that is checked out in the remote, so that later we can go back to it
         original_branch     = await self.current_branch()
@@ -344,16 +356,40 @@ class FileSystem_RepoInspector(RepoInspector):
             Logger.log_info(f"@ '{to_branch}' (local):\n\n{status1}",
                                   xlabels=scheduling_context.as_xlabel())
 
+        head_before         = await self._head_sha(executor)
         status2             = await executor.execute(command = 'git merge ' + from_branch)
         Logger.log_info(f"'{from_branch}' (local) -> '{to_branch}' (local):\n\n{status2}",
                                   xlabels=scheduling_context.as_xlabel())
 
+        # GOTCHA: tell what the merge did from the commits involved rather than from its output, which is meant
+        #       for humans and may change across GIT versions. A fast-forward leaves the HEAD at the same commit as
+        #       the from_branch, whereas a merge leaves it at a new merge commit.
+        #
+        head_after          = await self._head_sha(executor)
+        if head_after == head_before:
+            outcome         = PullRequestOutcome.NOOP
+        elif head_after == (await executor.execute(command = 'git rev-parse ' + from_branch)).strip():
+            outcome         = PullRequestOutcome.FAST_FORWARD
+        else:
+            outcome         = PullRequestOutcome.MERGE
+
         # Restore original branch
         if to_branch != original_branch:
             status3             = await executor.execute(command = 'git checkout ' + original_branch)
             Logger.log_info(f"@ '{original_branch}' (local):\n\n{status3}",
                                   xlabels=scheduling_context.as_xlabel())
 
+        return PullRequestOutcome(outcome, status2)
+
+    async def _head_sha(self, executor):
+        '''
+        :param GitLocalClient executor: the client for this inspector's repo
+        :return: the hash of the commit checked out in this inspector's repo, or None if there is none yet.
+        :rtype: str
+        '''
+        result              = await executor.run(["git", "rev-parse", "-q", "--verify", "HEAD"], check=False)
+        return result.stdout.strip() if result.exit_code == 0 else None
+
     async def update_local(self, scheduling_context, branch):
         '''
         Updates the local repo from the remote, for the given ``branch``.
@@ -388,4 +424,84 @@ class FileSystem_RepoInspector(RepoInspector):
             status3             = await executor.execute(command = 'git checkout ' + original_branch)
             Logger.log_info(f"@ '{original_branch}' (local):\n\n{status3}",
                                   xlabels=scheduling_context.as_xlabel())
-            
\ No newline at end of file
+            
+
+class _CommitLogParser():
+    '''
+    Helper class used by the :class:`FileSystem_RepoInspector` to turn the output of ``git log`` into
+    CommittedFileInfo objects, a part at a time.
+
+    The log is requested with an explicit format and with NUL-terminated file names, so that it can be parsed
+    without guessing which lines belong to the commit message and which are files, and so that GIT never quotes
+    unusual file names. Commits start with an ASCII "record separator" and their fields end with an ASCII "unit
+    separator", neither of which can appear in hashes, names or dates, nor is expected in commit messages. So with
+    -z, the log consists of NUL-terminated records like these, for a commit that changed two files followed by a
+    merge commit with no files:
+
+                "\\x1e<hash>\\x1f<author>\\x1f<date>\\x1f<message>\\x1f"
+                "\\n<file 1>"
+                "<file 2>"
+                "\\x1e<hash>\\x1f<author>\\x1f<date>\\x1f<message>\\x1f"
+
+    :param int commit_count: the number of commits in the log. Commits are listed from the newest, but numbered
+        from the oldest.
+    '''
+    COMMIT_START                                        = "\x1e"
+    FIELD_END                                           = "\x1f"
+    FORMAT                                              = f"{COMMIT_START}%H{FIELD_END}%aN <%aE>{FIELD_END}" \
+                                                            + f"%ad{FIELD_END}%B{FIELD_END}"
+
+    def __init__(self, commit_count):
+        self.commit_nb                                  = commit_count
+        self.hash                                       = None
+        self.author                                     = None
+        self.date                                       = None
+        self.summary                                    = None
+        self.commit_file_nb                             = 0
+
+    def parse(self, record_l):
+        '''
+        :param list[str] record_l: the next records in the log.
+        :return: the CommittedFileInfo objects for the files in ``record_l``, and for the commits that ended before
+            or at the start of ``record_l`` without any files.
+        :rtype: list[CommittedFileInfo]
+        '''
+        START                                           = _CommitLogParser.COMMIT_START
+        END                                             = _CommitLogParser.FIELD_END
+        result                                          = []
+        # This loop runs once per committed file, so keep the state in local variables while in it
+        commit_nb, hash, author, date, summary, commit_file_nb \
+                                                        = self.commit_nb, self.hash, self.author, self.date, \
+                                                            self.summary, self.commit_file_nb
+        for record in record_l:
+            if record.startswith(START):
+                # Boundary case: perhaps the previous commit had no files at all (e.g., a merge commit), but we
+                # still want to register it
+                if not hash is None and commit_file_nb == 0:
+                    result.append(CommittedFileInfo(commit_nb, date, summary, 0, "", hash, author))
+                commit_nb                               -= 1
+                hash, author, date, message             = record[1:].split(END, 3)
+                lines                                   = [line.strip() for line in message.rstrip(END).splitlines()]
+                summary                                 = "; ".join(line for line in lines if len(line) > 0) or None
+                commit_file_nb                          = 0
+            elif len(record) > 0:
+                # The first file of a commit comes after the line break that ends the commit's header
+                if commit_file_nb == 0 and record[0] == "\n":
+                    record                              = record[1:]
+                    if len(record) == 0:
+                        continue
+                result.append(CommittedFileInfo(commit_nb, date, summary, commit_file_nb, record, hash, author))
+                commit_file_nb                          += 1
+
+        self.commit_nb, self.hash, self.author, self.date, self.summary, self.commit_file_nb \
+                                                        = commit_nb, hash, author, date, summary, commit_file_nb
+        return result
+
+    def close(self):
+        '''
+        :return: the CommittedFileInfo object for the last commit in the log, if it had no files.
+        :rtype: list[CommittedFileInfo]
+        '''
+        if not self.hash is None and self.commit_file_nb == 0:
+            return [CommittedFileInfo(self.commit_nb, self.date, self.summary, 0, "", self.hash, self.author)]
+        return []
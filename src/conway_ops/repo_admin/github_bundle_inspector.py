@@ -0,0 +1,182 @@
+from dateutil                                               import parser as _parser
+
+from conway.util.date_utils                                 import DateUtils
+
+from conway_ops.util.github_client                          import GitHub_Client
+from conway_ops.repo_admin.github_repo_inspector            import GitHub_RepoInspector
+from conway_ops.repo_admin.repo_inspector                   import CommitInfo
+
+class GitHub_BundleInspector():
+
+    '''
+    Utility class to query many GitHub repos under the same owner at once, using batched GraphQL queries.
+
+    Whereas a :class:`GitHub_RepoInspector` needs separate REST calls per repo to get the last commit and the
+    branches, this class gets that information for a whole bundle of repos in one GraphQL call per
+    ``BATCH_SIZE`` repos.
+
+    :param str parent_url: A string identifying the location under which the repos of interest live as
+        "subfolders" or "sub resources". It is expected to be the URL to a GitHub organization or user account.
+    '''
+    def __init__(self, parent_url):
+
+        self.parent_url                         = parent_url
+
+        # parent_url is something like
+        #
+        #       "https://github.com/alejandro-fin"
+        #
+        # so we can extract the owner name from it ("alejandro-fin" in the example)
+        #
+        cleaned_url                             = parent_url.strip("/").strip()
+        self.github_owner                       = cleaned_url.split("/")[-1]
+
+    # Number of repos per GraphQL query. Kept moderate so that each query stays well within GitHub's limits
+    # on query complexity.
+    BATCH_SIZE                                  = 25
+
+    # GitHub caps the page size of GraphQL connections at 100
+    MAX_BRANCHES_PER_REPO                       = 100
+
+    async def repos_info(self, repo_names, branch="master"):
+        '''
+        :param list[str] repo_names: names of the repos for which information is requested.
+        :param str branch: branch whose head commit is to be returned for each repo.
+        :return: A dictionary whose keys are the names in ``repo_names``, and whose values are
+            :class:`BundledRepoInfo` objects. Repos that don't exist in GitHub are omitted.
+        :rtype: dict
+        '''
+        result_dict                             = {}
+        async with GitHub_Client(github_owner = self.github_owner) as ctx:
+            for start in range(0, len(repo_names), GitHub_BundleInspector.BATCH_SIZE):
+                batch_l                         = repo_names[start:start + GitHub_BundleInspector.BATCH_SIZE]
+                result_dict.update(await self._one_batch(ctx, batch_l, branch))
+
+        return result_dict
+
+    async def _one_batch(self, ctx, repo_names, branch):
+        '''
+        Queries GitHub for all repos in ``repo_names`` with one GraphQL call.
+
+        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed.
+        '''
+        # We build a query with one aliased "repository" field per repo, such as
+        #
+        #       r0: repository(owner: $owner, name: $n0) { ... }
+        #       r1: repository(owner: $owner, name: $n1) { ... }
+        #
+        # Repo names are passed as variables rather than spliced into the query text, to avoid escaping issues.
+        #
+        variables                               = {"owner": self.github_owner, "ref": f"refs/heads/{branch}"}
+        declarations_l                          = ["$owner: String!", "$ref: String!"]
+        fields_l                                = []
+        for idx, repo_name in enumerate(repo_names):
+            variables[f"n{idx}"]                = repo_name
+            declarations_l.append(f"$n{idx}: String!")
+            fields_l.append(f"r{idx}: repository(owner: $owner, name: $n{idx}) {{ ...repoFields }}")
+
+        query                                   = "query(" + ", ".join(declarations_l) + ") {\n  " \
+                                                    + "\n  ".join(fields_l) + "\n}\n" \
+                                                    + "fragment repoFields on Repository {\n" \
+                                                    + "  name\n" \
+                                                    + "  ref(qualifiedName: $ref) { target { ... on Commit { oid message author { date } } } }\n" \
+                                                    + f"  refs(refPrefix: \"refs/heads/\", first: {GitHub_BundleInspector.MAX_BRANCHES_PER_REPO}) " \
+                                                    + "{ pageInfo { hasNextPage } nodes { name } }\n" \
+                                                    + "}\n"
+
+        data                                    = await ctx.GRAPHQL(parent_context=None, query=query, variables=variables)
+
+        result_dict                             = {}
+        for idx, repo_name in enumerate(repo_names):
+            repo_data                           = data.get(f"r{idx}")
+            if repo_data is None:
+                continue
+
+            commit_info                         = None
+            if not repo_data['ref'] is None:
+                commit_data                     = repo_data['ref']['target']
+                commit_datetime                 = _parser.parse(commit_data['author']['date'])
+
+                # Convert the commit date the the standard timezone used in CCL, which is California
+                #
+                commit_datetime                 = DateUtils().to_ccl_timezone(commit_datetime)
+                commit_ts                       = commit_datetime.strftime("%y%m%d.%H%M%S")
+                commit_info                     = CommitInfo(commit_data['oid'], commit_data['message'], commit_ts)
+
+            if repo_data['refs']['pageInfo']['hasNextPage']:
+                # Boundary case: too many branches to get in one query, so fall back to the REST API for this repo
+                branches_l                      = await GitHub_RepoInspector(self.parent_url, repo_name).branches()
+            else:
+                branches_l                      = [b['name'] for b in repo_data['refs']['nodes']]
+
+            result_dict[repo_name]              = BundledRepoInfo(branch, commit_info, branches_l)
+
+        return result_dict
+
+    async def ahead_by(self, comparisons_l):
+        '''
+        Counts how many commits each of several branches has that some other branch lacks, for many repos at
+        once with batched GraphQL queries. Typical use is to find out which pull requests would be empty
+        before creating them.
+
+        :param list[tuple] comparisons_l: triples of strings (repo name, base branch, head branch).
+        :return: A dictionary whose keys are the triples in ``comparisons_l``, and whose values are the number of
+            commits in the head branch that are not in the base branch, or None if either branch or the repo
+            does not exist.
+        :rtype: dict
+        '''
+        result_dict                             = {}
+        async with GitHub_Client(github_owner = self.github_owner) as ctx:
+            for start in range(0, len(comparisons_l), GitHub_BundleInspector.BATCH_SIZE):
+                batch_l                         = comparisons_l[start:start + GitHub_BundleInspector.BATCH_SIZE]
+                result_dict.update(await self._one_ahead_by_batch(ctx, batch_l))
+
+        return result_dict
+
+    async def _one_ahead_by_batch(self, ctx, comparisons_l):
+        '''
+        Queries GitHub for all the comparisons in ``comparisons_l`` with one GraphQL call.
+
+        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed.
+        '''
+        # We build a query with one aliased "repository" field per comparison, such as
+        #
+        #       c0: repository(owner: $owner, name: $n0) { ref(qualifiedName: $b0) { compare(headRef: $h0) { aheadBy } } }
+        #
+        variables                               = {"owner": self.github_owner}
+        declarations_l                          = ["$owner: String!"]
+        fields_l                                = []
+        for idx, (repo_name, base, head) in enumerate(comparisons_l):
+            variables.update({f"n{idx}": repo_name, f"b{idx}": f"refs/heads/{base}", f"h{idx}": f"refs/heads/{head}"})
+            declarations_l.extend([f"$n{idx}: String!", f"$b{idx}: String!", f"$h{idx}: String!"])
+            fields_l.append(f"c{idx}: repository(owner: $owner, name: $n{idx}) "
+                            + f"{{ ref(qualifiedName: $b{idx}) {{ compare(headRef: $h{idx}) {{ aheadBy }} }} }}")
+
+        query                                   = "query(" + ", ".join(declarations_l) + ") {\n  " \
+                                                    + "\n  ".join(fields_l) + "\n}\n"
+
+        data                                    = await ctx.GRAPHQL(parent_context=None, query=query, variables=variables)
+
+        result_dict                             = {}
+        for idx, comparison in enumerate(comparisons_l):
+            repo_data                           = data.get(f"c{idx}")
+            if repo_data is None or repo_data['ref'] is None or repo_data['ref']['compare'] is None:
+                result_dict[comparison]         = None
+            else:
+                result_dict[comparison]         = repo_data['ref']['compare']['aheadBy']
+
+        return result_dict
+
+class BundledRepoInfo():
+    '''
+    Helper data structure to contain the information that :class:`GitHub_BundleInspector` gets for one repo
+
+    :param str current_branch: the branch whose head commit is given by ``last_commit``.
+    :param CommitInfo last_commit: information about the head commit of ``current_branch``, or None if
+        there is no such branch.
+    :param list[str] branches: names of all branches in the repo.
+    '''
+    def __init__(self, current_branch, last_commit, branches):
+        self.current_branch                     = current_branch
+        self.last_commit                        = last_commit
+        self.branches                           = branches
@@ -0,0 +1,74 @@
+from conway_ops.repo_admin.filesystem_repo_inspector                import FileSystem_RepoInspector
+from conway_ops.repo_admin.github_repo_inspector                    import GitHub_RepoInspector
+from conway_ops.util.github_mirror_cache                            import GitHub_MirrorCache
+
+class GitHub_MirrorRepoInspector(GitHub_RepoInspector):
+
+    '''
+    Utility class for repos located in GitHub that answers read-only queries (branches, last commit and history)
+    with local GIT commands on a bare mirror of the repo kept by the :class:`GitHub_MirrorCache`, refreshing the
+    mirror first if it is stale.
+
+    All other operations, such as pull requests and comparisons used to decide on pull requests, are done through
+    the GitHub API as in the parent class, so that they never act on stale data.
+
+    :param str parent_url: A string identifying the location under which the repo of interest lives as
+        a "subfolder" or "sub resource". It is expected to be the URL to a GitHub organization or user account.
+    :param str repo_name: A string identifying the name of the repo of interest, as a "subfolder"
+        or "sub resource" under the ``parent_url``.
+    '''
+    def __init__(self, parent_url, repo_name):
+
+        super().__init__(parent_url, repo_name)
+
+    async def last_commit(self):
+        '''
+        :return: A :class:`CommitInfo` with information about last commit in the master branch
+        :rtype: CommitInfo
+        '''
+        return await (await self._mirror_inspector()).last_commit()
+
+    async def branches(self):
+        '''
+        :return: branches for the repo
+        :rtype: list[str]
+        '''
+        return await (await self._mirror_inspector()).branches()
+
+    async def committed_files(self, since=None, until=None, max_commits=None, paths=None):
+        '''
+        Returns an iterable over CommitedFileInfo objects, yielding in chronological order the history of commits
+        in the master branch. See :meth:`RepoInspector.committed_files` for the meaning of the parameters.
+
+        :rtype: Iterable[CommittedFileInfo]
+        '''
+        return await (await self._mirror_inspector()).committed_files(since, until, max_commits, paths)
+
+    async def iter_committed_files(self, since=None, until=None, max_commits=None, paths=None):
+        '''
+        Like :meth:`committed_files`, but yields the CommittedFileInfo objects as the mirror's log is read.
+
+        :rtype: AsyncIterator[CommittedFileInfo]
+        '''
+        async for cfi in (await self._mirror_inspector()).iter_committed_files(since, until, max_commits, paths):
+            yield cfi
+
+    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body, fast_forward=False):
+        '''
+        Creates and completes a pull request through the GitHub API, as per the parent class, and then marks the
+        mirror as stale so that later queries see the change.
+        '''
+        try:
+            return await super().pull_request(scheduling_context, from_branch, to_branch, title, body, fast_forward)
+        finally:
+            GitHub_MirrorCache.mark_stale(self.github_owner, self.repo_name)
+
+    async def _mirror_inspector(self):
+        '''
+        :return: an inspector for the mirror of this repo, after refreshing the mirror if needed.
+        :rtype: FileSystem_RepoInspector
+        '''
+        path                                    = await GitHub_MirrorCache.refresh(self.parent_url, self.github_owner,
+                                                                                   self.repo_name)
+        parent_path, mirror_name                = path.rsplit("/", 1)
+        return FileSystem_RepoInspector(parent_path, mirror_name)
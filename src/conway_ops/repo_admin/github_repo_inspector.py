@@ -1,10 +1,18 @@
+import asyncio
+
+from contextlib                                             import aclosing
 from dateutil                                               import parser as _parser
+from urllib.parse                                           import urlencode
 
 from conway.application.application                         import Application
 from conway.util.date_utils                                 import DateUtils
 
 from conway_ops.util.github_client                          import GitHub_Client
-from conway_ops.repo_admin.repo_inspector                   import RepoInspector, CommitInfo, CommittedFileInfo
+from conway_ops.util.github_commit_store                    import GitHub_CommitStore, StoredCommit
+from conway_ops.util.github_mergeability_waiter             import GitHub_MergeabilityWaiter
+from conway_ops.util.github_response_handler                import GitHub_ReponseHandler, GitHub_ResponseError
+from conway_ops.repo_admin.repo_inspector                   import RepoInspector, CommitInfo, CommittedFileInfo, \
+                                                                    PullRequestOutcome
 
 class GitHub_RepoInspector(RepoInspector):
 
@@ -84,7 +92,8 @@ class GitHub_RepoInspector(RepoInspector):
             data                            = await ctx.GET(
                                                         parent_context  = None,
                                                         resource        = "repos",
-                                                       sub_path         = f"/{self.repo_name}/commits/master")
+                                                       sub_path         = f"/{self.repo_name}/commits/master",
+                                                        fields          = GitHub_ReponseHandler.COMMIT_FIELDS)
         
         commit_datetime                     = _parser.parse(data['commit']['author']['date'])
 
@@ -107,32 +116,94 @@ class GitHub_RepoInspector(RepoInspector):
         :return: (local) branches for the repo
         :rtype: list[str]
         '''
+        # Use pagination, since GitHub only returns the first 30 branches otherwise
         async with self._init_ctx() as ctx:
-            data                            = await ctx.GET(
+            result                          = [b['name'] async for b in ctx.GET_paginated(
                                                         parent_context  = None,
                                                         resource        = "repos",
-                                                        sub_path        = f"/{self.repo_name}/branches")
-
-        result                              = [b['name'] for b in data]
+                                                        sub_path        = f"/{self.repo_name}/branches",
+                                                        fields          = GitHub_ReponseHandler.BRANCH_FIELDS)]
 
         return result
 
-    async def committed_files(self):
+    # Maximum number of per-commit GETs that a history crawl makes concurrently
+    MAX_CONCURRENT_COMMIT_FETCHES               = 10
+
+    async def committed_files(self, since=None, until=None, max_commits=None, paths=None):
         '''
         Returns an iterable over CommitedFileInfo objects, yielding in chronological order the history of commits
         (i.e., a log) for the repo associated to this :class:`RepoInspector`
+
+        The optional parameters are pushed down to GitHub as query parameters of the "/commits" endpoint, so only
+        the bounded history is downloaded. See :meth:`RepoInspector.committed_files` for their meaning.
         '''
-        # This provides the first most recent commit, and links to "parent" commits - the commits right before it
+        # The "/commits" list endpoint gives us the commits reachable from master, a page at a time, but without
+        # the files of each commit. So we get the commit hashes from it, and then get the files for each commit
+        # with concurrent calls, bounded by a semaphore so that big repos don't flood the connection pool.
+        #
+        # Commits downloaded in previous crawls are taken from the GitHub_CommitStore. 
+        #
+        bounded                             = not (since is None and until is None and max_commits is None and paths is None)
+        known_dict                          = await asyncio.to_thread(GitHub_CommitStore.load, self.github_owner, self.repo_name)
         async with self._init_ctx() as ctx:
-            data                            = await ctx.GET(
-                                                        parent_context  = None,
-                                                        resource        = "repos",
-                                                        sub_path        = f"/{self.repo_name}/commits/master")
+            if bounded:
+                window_l                    = await self._commits_in_window(ctx, since, until, max_commits, paths)
+                new_parents_dict            = {c['sha']: [p['sha'] for p in c['parents']] for c in window_l
+                                                if not c['sha'] in known_dict}
+                head_hash                   = None
+            else:
+                new_parents_dict, head_hash = await self._unknown_commits(ctx, known_dict)
+
+            semaphore                       = asyncio.Semaphore(GitHub_RepoInspector.MAX_CONCURRENT_COMMIT_FETCHES)
+            commit_tasks_l                  = [asyncio.create_task(self._one_commit(ctx, commit_hash, parents_l, semaphore))
+                                                for commit_hash, parents_l in new_parents_dict.items()]
+            try:
+                new_commits_l               = await asyncio.gather(*commit_tasks_l)
+            finally:
+                # If a fetch failed, don't leave the others running
+                for task in commit_tasks_l:
+                    task.cancel()
+
+        # GOTCHA:
+        #       A bounded history may lack some ancestors of its commits, so saving its commits would break the
+        #   guarantee that the GitHub_CommitStore only contains commits whose ancestors are all saved too.
+        #   So commits are only saved after full crawls (bounded crawls still benefit from previously saved ones).
+        #
+        if not bounded:
+            await asyncio.to_thread(GitHub_CommitStore.save, self.github_owner, self.repo_name, new_commits_l)
+        known_dict.update({c.sha: c for c in new_commits_l})
 
-            results_dict                    = await self._committed_files_impl(ctx, results_dict_so_far={}, data=data)
+        if bounded:
+            selected_l                      = [known_dict[c['sha']] for c in window_l]
+        else:
+            # The store may contain commits that are no longer in master (e.g., after a force-push), so only keep
+            # those reachable from master's head
+            selected_l                      = []
+            seen_hashes                     = set()
+            to_visit_l                      = [] if head_hash is None else [head_hash]
+            while len(to_visit_l) > 0:
+                commit                      = known_dict[to_visit_l.pop()]
+                if commit.sha in seen_hashes:
+                    continue
+                seen_hashes.add(commit.sha)
+                selected_l.append(commit)
+                to_visit_l.extend(commit.parents)
+
+        # Keys of results_dict are pairs of strings representing (commit hash, commit date)
+        results_dict                        = {}
+        for commit in selected_l:
+            filenames_l                     = [f for f in commit.files if RepoInspector._is_in_paths(f, paths)]
+            results_dict[(commit.sha, commit.commit_date)] \
+                                            = [CommittedFileInfo(commit_nb           = -99, # Set later below
+                                                                 commit_date         = commit.commit_date,
+                                                                 summary             = commit.message,
+                                                                 commit_file_nb      = file_nb,
+                                                                 commit_file         = filename,
+                                                                 commit_hash         = commit.sha,
+                                                                 commit_author       = commit.author)
+                                                for file_nb, filename in enumerate(filenames_l)]
 
         # We need to sort commits by date in descending order (so most recent commits on top).
-        # Remember that the keys of results_dict are pairs of strings representing (commit hash, commit date)
         #
         unsorted_keys                       = list(results_dict.keys())
         sorted_keys                         = sorted(unsorted_keys, key=lambda pair: pair[1], reverse=True)
@@ -151,8 +222,110 @@ class GitHub_RepoInspector(RepoInspector):
             commit_nb                       -= 1
 
         return aggregated_cfi_l
+
+    async def _unknown_commits(self, ctx, known_dict):
+        '''
+        Helper method used by the method committed_files to find the commits reachable from master that are not
+        yet known.
+
+        Since the GitHub_CommitStore only contains commits whose ancestors are all in the store too, we can stop
+        listing commits as soon as all the parents of the new commits we have seen so far are known.
+
+        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed.
+        :param dict known_dict: the commits already known, keyed by commit hash.
+        :return: a pair, whose first element is a dictionary with the parents of each unknown commit, keyed by commit
+            hash, and whose second element is the hash of the head of master (None if the repo has no commits).
+        :rtype: tuple
+        '''
+        new_parents_dict                    = {}
+        pending_hashes                      = set() # Parents of new commits that we have not yet come across
+        head_hash                           = None
+        async with aclosing(ctx.GET_paginated(
+                                                    parent_context  = None,
+                                                    resource        = "repos",
+                                                    sub_path        = f"/{self.repo_name}/commits?sha=master",
+                                                    fields          = {"sha": None, "parents": {"sha": None}})) as commits:
+            async for commit in commits:
+                commit_hash                 = commit['sha']
+                head_hash                   = commit_hash if head_hash is None else head_hash
+                pending_hashes.discard(commit_hash)
+                if not commit_hash in known_dict and not commit_hash in new_parents_dict:
+                    parents_l               = [p['sha'] for p in commit['parents']]
+                    new_parents_dict[commit_hash] = parents_l
+                    pending_hashes.update([p for p in parents_l if not p in known_dict and not p in new_parents_dict])
+                if len(pending_hashes) == 0:
+                    break
+
+        return new_parents_dict, head_hash
+
+    async def _commits_in_window(self, ctx, since, until, max_commits, paths):
+        '''
+        Helper method used by the method committed_files to list the commits of master within the bounds given by
+        the parameters. See :meth:`RepoInspector.committed_files` for their meaning.
+
+        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed.
+        :return: the Json representation of each commit in the window, with its hash, parents and date, most recent
+            first.
+        :rtype: list[dict]
+        '''
+        params                              = {"sha": "master"}
+        if not since is None:
+            params["since"]                 = RepoInspector._as_iso8601(since)
+        if not until is None:
+            params["until"]                 = RepoInspector._as_iso8601(until)
+        per_page                            = 100 if max_commits is None else max(1, min(100, max_commits))
+
+        # GitHub only supports one path per listing, so for multiple paths we do one listing per path
+        window_dict                         = {}
+        for path in [None] if paths is None else paths:
+            path_params                     = params if path is None else dict(params, path=path)
+            async with aclosing(ctx.GET_paginated(
+                                                    parent_context  = None,
+                                                    resource        = "repos",
+                                                    sub_path        = f"/{self.repo_name}/commits?" + urlencode(path_params),
+                                                    per_page        = per_page,
+                                                    fields          = {"sha": None, "parents": {"sha": None},
+                                                                       "commit": {"author": {"date": None}}})) as commits:
+                count                       = 0
+                async for commit in commits:
+                    if not max_commits is None and count >= max_commits:
+                        break
+                    window_dict[commit['sha']] = commit
+                    count                   += 1
+
+        window_l                            = sorted(window_dict.values(), key=lambda c: c['commit']['author']['date'],
+                                                     reverse=True)
+        return window_l if max_commits is None else window_l[:max_commits]
     
-    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body):
+    async def ahead_behind(self, base, head):
+        '''
+        Counts how far ``head`` has diverged from ``base``, without needing to get the log of either.
+
+        :param str base: branch name or commit hash used as the reference.
+        :param str head: branch name or commit hash compared against ``base``. GitHub must know it, so if it is
+            the hash of a local commit it must have been pushed.
+        :return: a pair of ints: how many commits ``head`` is ahead of ``base``, and how many it is behind. None
+            if GitHub does not know ``base`` or ``head``.
+        :rtype: tuple
+        '''
+        # The compare endpoint also lists the commits and files that differ, which we don't need, so ask for the
+        # smallest page of commits
+        async with self._init_ctx() as ctx:
+            try:
+                data                        = await ctx.GET(
+                                                        parent_context  = None,
+                                                        resource        = "repos",
+                                                        sub_path        = f"/{self.repo_name}/compare/{base}...{head}?per_page=1",
+                                                        fields          = {"ahead_by": None, "behind_by": None})
+            except GitHub_ResponseError as ex:
+                # GitHub answers 404 for commits it doesn't have, and 422 for some refs it can't resolve
+                if ex.status_code in [404, 422]:
+                    return None
+                raise
+
+        return data['ahead_by'], data['behind_by']
+
+    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body, fast_forward=False):
         '''
         Creates and completes a pull request from the ``from_branch`` to the ``to_branch``.
 
@@ -167,20 +340,88 @@ class GitHub_RepoInspector(RepoInspector):
         :param str to_branch: GIT branch used as the destination for the pull request
         :param str title: the value of the `title` field in the GitHub pull request object being created
         :param str body: the value of the `body` field in the GitHub pull request object being created
-        :returns: The pull request information. If the pull request was not created for a benign reason
-                (for example, if there are no commits to merge from the `from_branch` to the `to_branch`)
-                it returns None.
-
-        :rtype: dict
+        :param bool fast_forward: optional parameter that defaults to False. If True, and the ``to_branch`` has no
+            commits that the ``from_branch`` lacks, then no pull request is made: instead, the ``to_branch`` is
+            moved to the head of the ``from_branch`` with a single ref update. This avoids the merge commit (which
+            would make the branches diverge) and takes one mutating call instead of two. If a real merge is
+            needed, a pull request is made as usual.
+        :returns: What was done. If the pull request was merged, the details are the merge information. If the
+                ``to_branch`` was fast-forwarded, they are the updated ref's information. If the pull request was not
+                created for a benign reason (for example, if there are no commits to merge from the `from_branch` to
+                the `to_branch`) the outcome is ``PullRequestOutcome.NOOP``.
+
+        :rtype: PullRequestOutcome
         '''    
         async with self._init_ctx() as ctx:
+            if fast_forward:
+                ff_result                   = await self._fast_forward(scheduling_context, ctx, from_branch, to_branch)
+                if ff_result == GitHub_RepoInspector._NOTHING_TO_MERGE:
+                    return PullRequestOutcome(PullRequestOutcome.NOOP)
+                elif not ff_result is None:
+                    return PullRequestOutcome(PullRequestOutcome.FAST_FORWARD, ff_result)
+
             pr_result                       =  await self._create_pull_request(scheduling_context, ctx,
                                                                                from_branch, to_branch, title, body)
             if pr_result is None:
-                return None
+                return PullRequestOutcome(PullRequestOutcome.NOOP)
             else:
                 pull_number                 = pr_result['number']
-                return await self._merge_pull_request(scheduling_context, ctx, pr_result, f"[PR #{pull_number}] {title}")
+                merge_result                = await self._merge_pull_request(scheduling_context, ctx, pr_result,
+                                                                             f"[PR #{pull_number}] {title}")
+                return PullRequestOutcome(PullRequestOutcome.MERGE, merge_result)
+
+    # Returned by _fast_forward when the from_branch has nothing that the to_branch lacks
+    _NOTHING_TO_MERGE                       = "nothing to merge"
+
+    async def _fast_forward(self, scheduling_context, ctx, from_branch, to_branch):
+        '''
+        Moves the ``to_branch`` to the head of the ``from_branch``, if that is a fast-forward.
+
+        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed.
+        :returns: the updated ref's information if the ``to_branch`` was fast-forwarded, ``_NOTHING_TO_MERGE`` if
+            there was no need to, or None if it is not a fast-forward (so a real merge is needed).
+        '''
+        # Pin the head of from_branch first, so that the comparison and the ref update are about the same commit
+        # even if from_branch moves meanwhile. We bypass caches since this is a mutating workflow.
+        head_data                           = await ctx.GET(
+                                                        parent_context  = scheduling_context,
+                                                        resource        = "repos",
+                                                        sub_path        = f"/{self.repo_name}/commits/{from_branch}",
+                                                        use_cache       = False,
+                                                        fields          = {"sha": None})
+        from_sha                            = head_data['sha']
+        compare_data                        = await ctx.GET(
+                                                        parent_context  = scheduling_context,
+                                                        resource        = "repos",
+                                                        sub_path        = f"/{self.repo_name}/compare/{to_branch}...{from_sha}?per_page=1",
+                                                        use_cache       = False,
+                                                        fields          = {"ahead_by": None, "behind_by": None})
+        if compare_data['ahead_by'] == 0:
+            Application.app().log(f"{from_branch}->{to_branch}: no merge needed",
+                                  xlabels=scheduling_context.as_xlabel())
+            return GitHub_RepoInspector._NOTHING_TO_MERGE
+        if compare_data['behind_by'] > 0:
+            Application.app().log(f"{from_branch}->{to_branch}: not a fast-forward, so a pull request is needed",
+                                  xlabels=scheduling_context.as_xlabel())
+            return None
+
+        try:
+            # "force": False makes GitHub reject the update if to_branch moved meanwhile and this is no longer
+            # a fast-forward
+            ref_result                      = await ctx.PATCH(
+                                                        parent_context  = scheduling_context,
+                                                        resource        = "repos",
+                                                        sub_path        = f"/{self.repo_name}/git/refs/heads/{to_branch}",
+                                                        body            = {"sha": from_sha, "force": False})
+        except ValueError as ex:
+            Application.app().log(f"{from_branch}->{to_branch}: fast-forward rejected, so a pull request is needed. "
+                                  + f"Reason: {ex}",
+                                  xlabels=scheduling_context.as_xlabel())
+            return None
+
+        Application.app().log(f"{from_branch}->{to_branch}: fast-forwarded to {from_sha}",
+                              xlabels=scheduling_context.as_xlabel())
+        return ref_result
     
     async def _create_pull_request(self, scheduling_context, ctx, from_branch, to_branch, title, body):
         '''
@@ -230,7 +471,7 @@ class GitHub_RepoInspector(RepoInspector):
         
     async def _merge_pull_request(self, scheduling_context, ctx, pr, title):
         '''
-        Merges a pull request.
+        Merges a pull request, once GitHub reports that it is mergeable (see :class:`GitHub_MergeabilityWaiter`).
 
         If anything goes wrong it raises an exception.
 
@@ -257,6 +498,8 @@ class GitHub_RepoInspector(RepoInspector):
                                                 "sha":              sha,
                                                 "merge_method":     "merge"}
 
+        await GitHub_MergeabilityWaiter.wait_until_mergeable(scheduling_context, self.github_owner, self.repo_name,
+                                                             pull_number)
 
         merge_result                    =  await ctx.PUT(    
                                                         parent_context = scheduling_context,
@@ -286,68 +529,31 @@ class GitHub_RepoInspector(RepoInspector):
         '''
         raise ValueError("This method does not apply for GitHub repos - never call it")
 
-    async def _committed_files_impl(self, ctx, results_dict_so_far, data):
+    async def _one_commit(self, ctx, commit_hash, parents_l, semaphore):
         '''
-        Helper method used to implement the recursion approach behind the method committed_files.
-
-        It incrementally aggregates the file-per-file information for one commit, and then 
-        recursively calls itself to process the parent commits.
+        Helper method used by the method committed_files to get the information for one commit, including the 
+        files it changed.
 
-        The incremental aggregation is effected by adding additional entries to the ``results_dict_so_far``
-        dictionary.
+        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed.
+        :param str commit_hash: the hash of the commit to process.
+        :param list[str] parents_l: the hashes of the commit's parents.
+        :param asyncio.Semaphore semaphore: bounds how many commits are fetched concurrently.
 
-        :param conway_ops.util.github_client.GitHub_Client ctx: context for making the HTTP call. It must be non-closed and should not
-            be shared with any other threads.
-        :param dict results_dict_so_far:  keys are pairs of strings (the commit hash and commit date) 
-            and for each key the value is the list
-            of CommittedFileInfo objects for this commit. It represents the information we seek for 
-            the commits that have been already processed prior to this method being called.
-        :param dict data: The JSON response from querying the Git Hub API for the next commit to process.
-
-        :return: a dictionary extending ``results_dict_so_far`` with additional entries for the commit
-            represented by the ``data`` parameter, and the ancestors of that commit.
-        :rtype: dict
+        :rtype: conway_ops.util.github_commit_store.StoredCommit
         '''
-        commit_date                         = data['commit']['author']['date']
-        commit_author                       = data['commit']['author']['name']
-        
-        commit_hash                         = data['sha']
-        commit_msg                          = data['commit']['message']
-
-        # The commit history is a tree, so not linear. It is possible we come across the same commit more than once.
-        # So if we already saw this commit, don't process it again.
-        #
-        if (commit_hash, commit_date) in results_dict_so_far.keys():
-            return results_dict_so_far
-
-        file_count                          = 0
-        commit_cfi_l                        = []
-        results_dict                        = results_dict_so_far
-        for file_info_dict in data['files']:
-            filename                        = file_info_dict['filename']
-            cfi                             = CommittedFileInfo(commit_nb           = -99, # Caller will later set this
-                                                                commit_date         = commit_date,
-                                                                summary             = commit_msg,
-                                                                commit_file_nb      = file_count,
-                                                                commit_file         = filename,
-                                                                commit_hash         = commit_hash,
-                                                                commit_author       = commit_author)
-            commit_cfi_l.append(cfi)
-            file_count                      += 1
-
-        results_dict[(commit_hash, commit_date)]    = commit_cfi_l
-
-        # Now do recursion, for each parent
-        parents                             = data['parents']
-
-        for p in parents:
-            p_data                          = await ctx.GET(
+        async with semaphore:
+            data                            = await ctx.GET(
                                                     parent_context  = None,
                                                     resource        = "repos",
-                                                    sub_path        = f"/{self.repo_name}/{p['url']}")
-            results_dict                    = await self._committed_files_impl(ctx, results_dict, p_data)
-
-        return results_dict
+                                                    sub_path        = f"/{self.repo_name}/commits/{commit_hash}",
+                                                    fields          = GitHub_ReponseHandler.COMMIT_FIELDS)
+
+        return StoredCommit(sha             = commit_hash,
+                            commit_date     = data['commit']['author']['date'],
+                            author          = data['commit']['author']['name'],
+                            message         = data['commit']['message'],
+                            parents         = parents_l,
+                            files           = [f['filename'] for f in data['files']])
         
     def _init_ctx(self):
         return GitHub_Client(github_owner = self.github_owner)
\ No newline at end of file
@@ -11,10 +11,19 @@ from conway.reports.report_writer                                   import Repor
 from conway.util.yaml_utils                                         import YAML_Utils
 
 from conway_ops.onboarding.git_usage                                import GitUsage
+from conway_ops.repo_admin.github_bundle_inspector                  import GitHub_BundleInspector
+from conway_ops.repo_admin.github_repo_inspector                    import GitHub_RepoInspector
 from conway_ops.repo_admin.repo_statics                             import RepoStatics
 from conway_ops.repo_admin.repo_inspector_factory                   import RepoInspectorFactory
 from conway_ops.repo_admin.repo_inspector                           import RepoInspector
-from conway_ops.util.git_local_client                                     import GitLocalClient
+from conway_ops.util.github_change_detector                         import GitHub_ChangeDetector
+from conway_ops.util.github_commit_store                            import GitHub_CommitStore
+from conway_ops.util.github_metrics                                 import GitHub_Metrics
+from conway_ops.util.github_mirror_cache                            import GitHub_MirrorCache
+from conway_ops.util.github_request_coalescer                       import GitHub_RequestCoalescer
+from conway_ops.util.git_concurrency_governor                       import GitConcurrencyGovernor
+from conway_ops.util.git_local_client                               import GitLocalClient
+from conway_ops.util.git_ref_reader                                 import GitRefReader
 
 
 
@@ -61,6 +70,11 @@ class RepoAdministration():
         :return: branches in local repo
         :rtype: list[str]
         '''
+        # Read the refs directly if possible, as that is much cheaper than running GIT
+        branch_l                = GitRefReader(self.local_root + "/" + repo_name).branches()
+        if not branch_l is None:
+            return branch_l
+
         executor                = GitLocalClient(self.local_root + "/" + repo_name)
 
         git_result              = await executor.execute("git branch")
@@ -114,7 +128,14 @@ class RepoAdministration():
     async def create_repo_report(self, publications_folder, 
                            repos_in_scope_l             = None, 
                            git_usage                    = GitUsage.git_local_and_remote,
-                           mask_nondeterministic_data   = False):
+                           mask_nondeterministic_data   = False,
+                           remote_stats_via_graphql     = False,
+                           include_divergence           = False,
+                           since                        = None,
+                           until                        = None,
+                           max_commits                  = None,
+                           paths                        = None,
+                           skip_unchanged_remotes       = False):
         '''
         Creates an Excel report with multiple worksheets, as follows:
 
@@ -133,6 +154,20 @@ class RepoAdministration():
         :param bool mask_nondeterministic_data: If True, then any data that is non-deterministic (such as dates or hash 
             codes) is masked. This is False by default. Typical use case for masking is in test cases that need 
             determinism.
+        :param bool remote_stats_via_graphql: If True, then stats for remote repos in GitHub are obtained for all repos
+            at once with batched GraphQL queries, instead of with REST calls per repo. This is False by default.
+        :param bool include_divergence: If True, then the stats worksheet also has the number of commits that each
+            local repo's current branch is ahead and behind the remote. This is False by default.
+        :param since: if not None, the log worksheets only include commits made at or after this time. May be a
+            :class:`datetime.datetime` or an ISO 8601 string.
+        :param until: if not None, the log worksheets only include commits made at or before this time. May be a
+            :class:`datetime.datetime` or an ISO 8601 string.
+        :param int max_commits: if not None, the log worksheets only include the most recent ``max_commits`` commits.
+        :param list[str] paths: if not None, the log worksheets only include files under these paths (relative to
+            each repo's root).
+        :param bool skip_unchanged_remotes: If True, then stats and logs of remote repos in GitHub that did not change
+            since they were last computed are reused instead of fetched again (see :meth:`repo_stats`). This is 
+            False by default.
         :rtype: None
         '''
 
@@ -151,56 +186,69 @@ class RepoAdministration():
         writer                                              = ReportWriter()
 
 
-        # Now generate and save the stats worksheet
-        stats_df                                            = await self.repo_stats(git_usage, repos_in_scope_l)
-        if mask_nondeterministic_data:
-            stats_df[RS.LAST_COMMIT_TIMESTAMP_COL]          = MASKED_MSG
-            stats_df[RS.LAST_COMMIT_HASH_COL]               = MASKED_MSG
+        # Different parts of the report request the same remote resources (e.g., the last commit is needed both for
+        # the stats and the logs), so memoize GitHub responses for the duration of the report run
+        #
+        async with GitHub_RequestCoalescer.memo_scope():
+
+            # Now generate and save the stats worksheet
+            stats_df                                            = await self.repo_stats(git_usage, repos_in_scope_l,
+                                                                                        remote_stats_via_graphql,
+                                                                                        include_divergence,
+                                                                                        skip_unchanged_remotes)
+            if mask_nondeterministic_data:
+                stats_df[RS.LAST_COMMIT_TIMESTAMP_COL]          = MASKED_MSG
+                stats_df[RS.LAST_COMMIT_HASH_COL]               = MASKED_MSG
    
-        worksheet                                           = workbook.add_worksheet(RS.REPORT_REPO_STATS_WORKSHEET)
-        widths_dict                                         = {RS.REPO_NAME_COL:               20,
-                                                                RS.LOCAL_OR_REMOTE_COL:         15,
-                                                                RS.LAST_COMMIT_COL:             40,
-                                                                RS.LAST_COMMIT_TIMESTAMP_COL:   30,
-                                                                RS.LAST_COMMIT_HASH_COL:        45}
-        async with UsheringTo(result_l = []) as usher: # We don't care about the results, so use an discardable list
+            worksheet                                           = workbook.add_worksheet(RS.REPORT_REPO_STATS_WORKSHEET)
+            widths_dict                                         = {RS.REPO_NAME_COL:               20,
+                                                                    RS.LOCAL_OR_REMOTE_COL:         15,
+                                                                    RS.LAST_COMMIT_COL:             40,
+                                                                    RS.LAST_COMMIT_TIMESTAMP_COL:   30,
+                                                                    RS.LAST_COMMIT_HASH_COL:        45}
+            async with UsheringTo(result_l = []) as usher: # We don't care about the results, so use an discardable list
             
-            usher                                           += asyncio.to_thread(
-                                                                writer.populate_excel_worksheet,
-                                                                stats_df, 
-                                                                workbook, 
-                                                                worksheet, 
-                                                                widths_dict=widths_dict
-                                                                )
+                usher                                           += asyncio.to_thread(
+                                                                    writer.populate_excel_worksheet,
+                                                                    stats_df, 
+                                                                    workbook, 
+                                                                    worksheet, 
+                                                                    widths_dict=widths_dict
+                                                                    )
             
-            # Now generate and save the multiple log worksheets
-            all_repos_logs_dict                             = await self._repo_logs(git_usage, repos_in_scope_l)
-            for repo_name in all_repos_logs_dict.keys():
-                a_repo_logs_dict                            = all_repos_logs_dict[repo_name]
-                for instance_type in a_repo_logs_dict.keys(): # instance_type refers to local vs remote repos
-                    log_df                                  = a_repo_logs_dict[instance_type]
-                    if mask_nondeterministic_data:
-                        log_df[RS.COMMIT_DATE_COL]          = MASKED_MSG
-                        log_df[RS.COMMIT_HASH_COL]          = MASKED_MSG
-                        log_df[RS.COMMIT_AUTHOR_COL]        = MASKED_MSG
-
-                    sheet_name                              = RepoAdministration.worksheet_for_log(repo_name, 
-                                                                                                    instance_type)
-                    worksheet                               = workbook.add_worksheet(sheet_name)
-                    widths_dict                             = {RS.COMMIT_DATE_COL:             30,
-                                                                RS.COMMIT_SUMMARY_COL:          35,
-                                                                RS.COMMIT_FILE_COL:             65,
-                                                                RS.COMMIT_HASH_COL:             45,
-                                                                RS.COMMIT_AUTHOR_COL:           40
-                    }
-                    usher                                           += asyncio.to_thread(
-                                                                        writer.populate_excel_worksheet,
-                                                                        log_df, 
-                                                                        workbook, 
-                                                                        worksheet, 
-                                                                        widths_dict=widths_dict, 
-                                                                        freeze_col_nb=3
-                                                                        )
+                # Now generate and save the multiple log worksheets
+                all_repos_logs_dict                             = await self._repo_logs(git_usage, repos_in_scope_l,
+                                                                                        since               = since,
+                                                                                        until               = until,
+                                                                                        max_commits         = max_commits,
+                                                                                        paths               = paths,
+                                                                                        skip_unchanged_remotes = skip_unchanged_remotes)
+                for repo_name in all_repos_logs_dict.keys():
+                    a_repo_logs_dict                            = all_repos_logs_dict[repo_name]
+                    for instance_type in a_repo_logs_dict.keys(): # instance_type refers to local vs remote repos
+                        log_df                                  = a_repo_logs_dict[instance_type]
+                        if mask_nondeterministic_data:
+                            log_df[RS.COMMIT_DATE_COL]          = MASKED_MSG
+                            log_df[RS.COMMIT_HASH_COL]          = MASKED_MSG
+                            log_df[RS.COMMIT_AUTHOR_COL]        = MASKED_MSG
+
+                        sheet_name                              = RepoAdministration.worksheet_for_log(repo_name, 
+                                                                                                        instance_type)
+                        worksheet                               = workbook.add_worksheet(sheet_name)
+                        widths_dict                             = {RS.COMMIT_DATE_COL:             30,
+                                                                    RS.COMMIT_SUMMARY_COL:          35,
+                                                                    RS.COMMIT_FILE_COL:             65,
+                                                                    RS.COMMIT_HASH_COL:             45,
+                                                                    RS.COMMIT_AUTHOR_COL:           40
+                        }
+                        usher                                           += asyncio.to_thread(
+                                                                            writer.populate_excel_worksheet,
+                                                                            log_df, 
+                                                                            workbook, 
+                                                                            worksheet, 
+                                                                            widths_dict=widths_dict, 
+                                                                            freeze_col_nb=3
+                                                                            )
                                                         
         workbook.close()
 
@@ -222,10 +270,21 @@ class RepoAdministration():
         return sheet_name
 
 
-    async def repo_stats(self, git_usage=GitUsage.git_local_and_remote, repos_in_scope_l=None):
+    async def repo_stats(self, git_usage=GitUsage.git_local_and_remote, repos_in_scope_l=None,
+                         remote_stats_via_graphql=False, include_divergence=False, skip_unchanged_remotes=False):
         '''
         :param list[str] repos_in_scope_l: A list of names for GIT repos for which stats are requested. If set to None, 
             then it will default to provide stats for names of ``self.repo_bundle.bundled_repos()``
+        :param bool remote_stats_via_graphql: If True, then stats for remote repos in GitHub are obtained for all repos
+            at once with batched GraphQL queries (see :class:`GitHub_BundleInspector`), instead of with REST calls
+            per repo. This is False by default.
+        :param bool include_divergence: If True, then for local repos the DataFrame also has the number of commits 
+            that the current branch is ahead and behind the remote (see :meth:`divergence`). This is False by default.
+        :param bool skip_unchanged_remotes: If True, then the stats of remote repos in GitHub are only fetched for
+            the repos that changed since their stats were last fetched. For the others, the stats from then are
+            reused. Changes are detected with one listing of all the remote repos (see 
+            :class:`GitHub_ChangeDetector`), so a bundle with no changes only costs one GitHub call. This is
+            False by default.
         :return: A descriptive DataFrame with information about each repo, such as what branch it is in for local and 
             remote, whether it has unchecked or untracked files, and most recent commit.
         :rtype: :class:`pandas.DataFrame`
@@ -244,16 +303,27 @@ class RepoAdministration():
                                                            RS.LAST_COMMIT_TIMESTAMP_COL,
                                                            RS.LAST_COMMIT_HASH_COL,
                                                            ]
+        nb_stats_cols                                   = len(columns)
+        if include_divergence:
+            columns                                     += [RS.COMMITS_AHEAD_COL, RS.COMMITS_BEHIND_COL]
+
         async def _process_one_repo(repo_name, inspector, local_or_remote):
             repo_name, current_branch, \
                 commit_message, commit_ts, commit_hash, \
                 untracked_files, modified_files, deleted_files \
                                                         = await self._one_repo_stats(inspector)
 
-            return [repo_name, local_or_remote, current_branch, 
-                        len(untracked_files), len(modified_files), len(deleted_files),
-                        commit_message, commit_ts, commit_hash, 
-                        ]
+            row                                         = [repo_name, local_or_remote, current_branch, 
+                                                            len(untracked_files), len(modified_files), len(deleted_files),
+                                                            commit_message, commit_ts, commit_hash, 
+                                                            ]
+            if include_divergence:
+                if local_or_remote == RS.LOCAL_REPO and git_usage in [GitUsage.git_local_and_remote]:
+                    row                                 += list(await self._one_repo_divergence(repo_name, current_branch,
+                                                                                                 current_branch))
+                else:
+                    row                                 += [None, None]
+            return row
 
         # Need to pass repos_in_scope_l to the supervisor to avoid getting errors like
         # 
@@ -261,24 +331,71 @@ class RepoAdministration():
         #
         if repos_in_scope_l is None:
             repos_in_scope_l                            = self.repo_names()
-        async with UsheringTo(data_l) as usher:
-            for repo_name in repos_in_scope_l:
-
-                if git_usage in [GitUsage.git_local_and_remote, GitUsage.git_local_only]:
-                    local_inspector                     = RepoInspectorFactory.findInspector(self.local_root, repo_name)
 
-                    usher                               += _process_one_repo(
+        # Remote repos in GitHub that did not change since their stats were last fetched reuse those stats
+        #
+        fingerprints_dict                               = {}
+        reused_rows_l                                   = []
+        if skip_unchanged_remotes and git_usage in [GitUsage.git_local_and_remote]:
+            github_owner, fingerprints_dict             = await self._remote_fingerprints(repos_in_scope_l)
+            for repo_name, fingerprint in fingerprints_dict.items():
+                row                                     = GitHub_ChangeDetector.recall(github_owner, repo_name, fingerprint, "stats")
+                if not row is None:
+                    reused_rows_l.append(row)
+        reused_repos_l                                  = [row[0] for row in reused_rows_l]
+
+        # Remote repos in GitHub may be handled all at once with GraphQL, instead of one at a time.
+        # We start that in the background so that it runs concurrently with the per-repo processing.
+        #
+        graphql_repos_l                                 = []
+        graphql_task                                    = None
+        if remote_stats_via_graphql and git_usage in [GitUsage.git_local_and_remote]:
+            graphql_repos_l                             = [repo_name for repo_name in repos_in_scope_l 
+                                                            if isinstance(RepoInspectorFactory.findInspector(self.remote_root, repo_name),
+                                                                          GitHub_RepoInspector)
+                                                                and not repo_name in reused_repos_l]
+        if len(graphql_repos_l) > 0:
+            graphql_task                                = asyncio.create_task(self._remote_stats_via_graphql(graphql_repos_l))
+
+        try:
+            async with UsheringTo(data_l) as usher:
+                for repo_name in repos_in_scope_l:
+
+                    if git_usage in [GitUsage.git_local_and_remote, GitUsage.git_local_only]:
+                        local_inspector                 = RepoInspectorFactory.findInspector(self.local_root, repo_name)
+
+                        usher                           += _process_one_repo(
                                                                     repo_name, 
                                                                     inspector           = local_inspector, 
                                                                     local_or_remote     = RS.LOCAL_REPO)
 
-                if git_usage in [GitUsage.git_local_and_remote]:
-                    remote_inspector                    = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
+                    if git_usage in [GitUsage.git_local_and_remote] and not repo_name in graphql_repos_l + reused_repos_l:
+                        remote_inspector                = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
 
-                    usher                               += _process_one_repo(
+                        usher                           += _process_one_repo(
                                                                     repo_name, 
                                                                     inspector           = remote_inspector, 
                                                                     local_or_remote     = RS.REMOTE_REPO)
+        except BaseException:
+            # GOTCHA: otherwise the background GraphQL task would be left running, unawaited, after we raise
+            if not graphql_task is None:
+                graphql_task.cancel()
+            raise
+
+        if not graphql_task is None:
+            graphql_rows_l                              = await graphql_task
+            if include_divergence:
+                graphql_rows_l                          = [row + [None, None] for row in graphql_rows_l]
+            data_l.extend(graphql_rows_l)
+
+        if len(fingerprints_dict) > 0:
+            await GitHub_ChangeDetector.remember(github_owner,
+                                                 [(row[0], fingerprints_dict[row[0]], "stats", row[:nb_stats_cols])
+                                                    for row in data_l if row[1] == RS.REMOTE_REPO
+                                                        and row[0] in fingerprints_dict and not row[0] in reused_repos_l])
+        if include_divergence:
+            reused_rows_l                               = [row + [None, None] for row in reused_rows_l]
+        data_l.extend(reused_rows_l)
 
         result_df                                       = _pd.DataFrame(data = data_l, columns = columns)
 
@@ -288,13 +405,90 @@ class RepoAdministration():
 
         return result_df
     
-    async def _repo_logs(self, git_usage, repos_in_scope_l=None):
+    async def divergence(self, repos_in_scope_l=None, branch_pairs=None):
+        '''
+        Tells whether local repos are in sync with their remotes, by counting how many commits each local branch
+        is ahead and behind of its counterpart in the remote. This only needs one cheap call per repo and branch
+        pair, instead of getting the logs.
+
+        For remotes in GitHub this uses GitHub's compare endpoint, and for remotes in the file system it uses 
+        ``git rev-list``. If the remote does not know the local branch's head (e.g., because it has commits that 
+        were not pushed yet), the comparison is instead done locally against the upstream branch as of the last
+        fetch.
+
+        :param list[str] repos_in_scope_l: A list of names for GIT repos for which divergence is requested. If set to
+            None, then it will default to the repos of ``self.repo_bundle``
+        :param list[tuple] branch_pairs: pairs of (local branch, remote branch) names to compare in each repo. If
+            set to None, then the current local branch is compared to the remote branch with the same name.
+        :return: A DataFrame with one row per repo and branch pair, with the commits ahead and behind.
+        :rtype: :class:`pandas.DataFrame`
+        '''
+        RS                                              = RepoStatics
+        if repos_in_scope_l is None:
+            repos_in_scope_l                            = self.repo_names()
+
+        async def _one_repo_divergence(repo_name, local_branch, remote_branch):
+            if local_branch is None:
+                local_branch                            = await RepoInspectorFactory.findInspector(self.local_root,
+                                                                                                    repo_name).current_branch()
+                remote_branch                           = local_branch
+            ahead, behind                               = await self._one_repo_divergence(repo_name, local_branch, remote_branch)
+            return [repo_name, local_branch, remote_branch, ahead, behind]
+
+        data_l                                          = []
+        async with UsheringTo(data_l) as usher:
+            for repo_name in repos_in_scope_l:
+                for local_branch, remote_branch in branch_pairs if not branch_pairs is None else [(None, None)]:
+                    usher                               += _one_repo_divergence(repo_name, local_branch, remote_branch)
+
+        result_df                                       = _pd.DataFrame(data    = data_l, 
+                                                                        columns = [RS.REPO_NAME_COL, RS.LOCAL_BRANCH_COL,
+                                                                                   RS.REMOTE_BRANCH_COL, RS.COMMITS_AHEAD_COL,
+                                                                                   RS.COMMITS_BEHIND_COL])
+        return result_df.sort_values(by = [RS.REPO_NAME_COL, RS.LOCAL_BRANCH_COL], ignore_index=True)
+
+    async def _one_repo_divergence(self, repo_name, local_branch, remote_branch):
+        '''
+        :return: a pair of ints, with how many commits the ``local_branch`` is ahead and behind the ``remote_branch``
+            for the repo called ``repo_name``. Both are None if they can't be told, e.g., because the remote does not
+            know the ``local_branch``'s head and the ``local_branch`` has no upstream branch either.
+        :rtype: tuple
+        '''
+        local_inspector                                 = RepoInspectorFactory.findInspector(self.local_root, repo_name)
+        remote_inspector                                = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
+
+        local_hash                                      = GitRefReader(self.local_root + "/" + repo_name).branch_sha(local_branch)
+        if local_hash is None:
+            executor                                    = GitLocalClient(self.local_root + "/" + repo_name)
+            local_hash                                  = (await executor.execute(f"git rev-parse {local_branch}")).strip()
+        result                                          = await remote_inspector.ahead_behind(base=remote_branch, head=local_hash)
+        if not result is None:
+            return result
+
+        self.log_info(f"'{repo_name}': remote can't compare '{remote_branch}' to local '{local_branch}' (is it "
+                      + "pushed?), so using the upstream branch as of the last fetch instead")
+        result                                          = await local_inspector.ahead_behind(
+                                                                base=f"{local_branch}@{{upstream}}", head=local_branch)
+        if result is None:
+            self.log_info(f"'{repo_name}': can't tell the divergence of local '{local_branch}' since it has no "
+                          + "upstream branch either")
+            return None, None
+        return result
+
+    async def _repo_logs(self, git_usage, repos_in_scope_l=None, since=None, until=None, max_commits=None, paths=None,
+                         skip_unchanged_remotes=False):
         '''
         :param GitUsage get_usage: enum used to determine which GIT areas were created, if any, to scope the report to the GIT
         areas actually used.
 
         :param list[str] repos_in_scope_l: A list of names for GIT repos for which stats are requested. If set to None, then 
             it will default to provide stats for ``self.repo_names``
+        :param since: optional bound on the logs. See :meth:`RepoInspector.committed_files`.
+        :param until: optional bound on the logs. See :meth:`RepoInspector.committed_files`.
+        :param int max_commits: optional bound on the logs. See :meth:`RepoInspector.committed_files`.
+        :param list[str] paths: optional bound on the logs. See :meth:`RepoInspector.committed_files`.
+        :param bool skip_unchanged_remotes: If True, then the logs of remote repos in GitHub that did not change
+            since they were last fetched (with the same bounds) are reused. See :meth:`repo_stats`.
         :return: Logs for each of the repos named in ``repos_in_scope_l``. For each repo name, two DataFrames are produced, 
             corresponding to the local and remote repos for a given name. These multiple DataFrames are packaged in 
             a 2-level dictionary, where the top level keys are the repo names, the next level keys are the 
@@ -305,17 +499,33 @@ class RepoAdministration():
         if repos_in_scope_l is None:
             repos_in_scope_l                                    = self.repo_names()
 
+        fingerprints_dict                                       = {}
+        if skip_unchanged_remotes and git_usage in [GitUsage.git_local_and_remote]:
+            github_owner, fingerprints_dict                     = await self._remote_fingerprints(repos_in_scope_l)
+        log_key                                                 = f"log since={since} until={until} " \
+                                                                    + f"max_commits={max_commits} paths={paths}"
+        logs_to_remember_l                                      = []
+
         async def _one_repo_logs(repo_name):
             result_dict[repo_name]                              = {}
             local_log_df                                        = None
             if git_usage in [GitUsage.git_local_and_remote, GitUsage.git_local_only]:
                 local_inspector                                 = RepoInspectorFactory.findInspector(self.local_root, repo_name)
-                local_log_df                                    = await local_inspector.log_to_dataframe()
+                local_log_df                                    = await local_inspector.log_to_dataframe(since, until, max_commits, paths)
 
             remote_log_df                                       = None
             if git_usage in [GitUsage.git_local_and_remote]:
-                remote_inspector                                = RepoInspectorFactory.findInspector(self.remote_root,repo_name)
-                remote_log_df                                   = await remote_inspector.log_to_dataframe()
+                fingerprint                                     = fingerprints_dict.get(repo_name)
+                saved_log                                       = None if fingerprint is None \
+                                                                    else GitHub_ChangeDetector.recall(github_owner, repo_name,
+                                                                                                      fingerprint, log_key)
+                if not saved_log is None:
+                    remote_log_df                               = _pd.DataFrame(saved_log)
+                else:
+                    remote_inspector                            = RepoInspectorFactory.findInspector(self.remote_root,repo_name)
+                    remote_log_df                               = await remote_inspector.log_to_dataframe(since, until, max_commits, paths)
+                    if not fingerprint is None:
+                        logs_to_remember_l.append((repo_name, fingerprint, log_key, remote_log_df.to_dict(orient="list")))
             return repo_name, local_log_df, remote_log_df
         
         repo_logs_l                                             = []
@@ -323,6 +533,8 @@ class RepoAdministration():
             for repo_name in repos_in_scope_l:
                 usher                                           += _one_repo_logs(repo_name)
 
+        if len(logs_to_remember_l) > 0:
+            await GitHub_ChangeDetector.remember(github_owner, logs_to_remember_l)
 
         # Convert the from the tuples (repo_name, local_log_df, remote_log_df) in repo_logs_l
         # to a dictionary
@@ -333,26 +545,177 @@ class RepoAdministration():
  
         return result_dict
 
+    async def changed_remote_repos(self, repos_in_scope_l=None):
+        '''
+        :param list[str] repos_in_scope_l: A list of names for GIT repos of interest. If set to None, then it will
+            default to the repos of ``self.repo_bundle``
+        :return: the names of the remote repos in GitHub that changed since their stats or logs were last fetched
+            with ``skip_unchanged_remotes`` (see :meth:`repo_stats`). Remote repos that are not in GitHub are
+            not included, since there is no cheap way to tell whether they changed.
+        :rtype: list[str]
+        '''
+        if repos_in_scope_l is None:
+            repos_in_scope_l                            = self.repo_names()
+        github_owner, fingerprints_dict                 = await self._remote_fingerprints(repos_in_scope_l)
+        return GitHub_ChangeDetector.changed_repos(github_owner, fingerprints_dict)
+
+    async def _remote_fingerprints(self, repos_in_scope_l):
+        '''
+        :param list[str] repos_in_scope_l: names of the repos of interest.
+        :return: a pair: the GitHub owner of the remote repos, and a dictionary with the current fingerprint (see
+            :class:`GitHub_ChangeDetector`) of each of the ``repos_in_scope_l`` whose remote is in GitHub. The owner 
+            is None and the dictionary empty if no remote is in GitHub.
+        :rtype: tuple
+        '''
+        github_l                                        = [inspector for inspector in [RepoInspectorFactory.findInspector(self.remote_root,
+                                                                                                                          repo_name)
+                                                                                       for repo_name in repos_in_scope_l]
+                                                            if isinstance(inspector, GitHub_RepoInspector)]
+        if len(github_l) == 0:
+            return None, {}
+        github_owner                                    = github_l[0].github_owner
+        all_fingerprints_dict                           = await GitHub_ChangeDetector.fingerprints(github_owner)
+        fingerprints_dict                               = {inspector.repo_name: all_fingerprints_dict.get(inspector.repo_name)
+                                                            for inspector in github_l}
+
+        changed_l                                       = GitHub_ChangeDetector.changed_repos(github_owner, fingerprints_dict)
+        self.log_info(f"{len(changed_l)} of {len(fingerprints_dict)} remote repos changed since last fetched"
+                      + (f" ({', '.join(changed_l)})" if len(changed_l) > 0 else ""))
+        return github_owner, fingerprints_dict
+
+    async def _remote_stats_via_graphql(self, repo_names):
+        '''
+        :param list[str] repo_names: names of remote repos in GitHub for which stats are requested.
+        :return: the rows for the stats DataFrame built by ``self.repo_stats``, one per repo in ``repo_names``.
+        :rtype: list[list]
+        '''
+        RS                                              = RepoStatics
+        bundle_inspector                                = GitHub_BundleInspector(self.remote_root)
+        info_dict                                       = await bundle_inspector.repos_info(repo_names)
+
+        rows_l                                          = []
+        for repo_name in repo_names:
+            info                                        = info_dict.get(repo_name)
+            if info is None:
+                raise ValueError(f"Remote repo '{repo_name}' not found under '{self.remote_root}'")
+            commit_info                                 = info.last_commit
+            if commit_info is None:
+                raise ValueError(f"Remote repo '{repo_name}' has no '{info.current_branch}' branch")
+
+            # In GitHub there is no working tree, so there are never untracked, modified or deleted files
+            rows_l.append([repo_name, RS.REMOTE_REPO, info.current_branch,
+                           0, 0, 0,
+                           commit_info.commit_msg, commit_info.commit_ts, commit_info.commit_hash])
+        return rows_l
+
     async def _one_repo_stats(self, repo: RepoInspector):
         '''
         '''
         repo_name                                       = repo.repo_name
 
-        current_branch                                  = await repo.current_branch()
+        # Get everything in one go, since for local repos that takes only one scan of the working tree
+        snapshot                                        = await repo.status_snapshot()
 
-        commit_info                                     = await repo.last_commit()
+        current_branch                                  = snapshot.current_branch
+
+        commit_info                                     = snapshot.last_commit
         commit_hash                                     = commit_info.commit_hash
         commit_message                                  = commit_info.commit_msg
         commit_ts                                       = commit_info.commit_ts
 
-        untracked_files                                 = await repo.untracked_files()
-        modified_files                                  = await repo.modified_files()
-        deleted_files                                   = await repo.deleted_files()
+        untracked_files                                 = snapshot.untracked_files
+        modified_files                                  = snapshot.modified_files
+        deleted_files                                   = snapshot.deleted_files
 
         return repo_name, current_branch, commit_message, commit_ts, commit_hash, \
             untracked_files, modified_files, deleted_files
 
 
+    async def refresh_mirrors(self, repos_in_scope_l=None, force=False):
+        '''
+        Refreshes in parallel the local mirrors of the remote repos in GitHub, when the :class:`GitHub_MirrorCache`
+        is enabled. Otherwise it does nothing.
+
+        Mirrors are also refreshed on demand when stale, so calling this is optional. Typical use is to refresh
+        all mirrors up front, at the start of an operator session.
+
+        :param list[str] repos_in_scope_l: names of the repos whose mirrors are to be refreshed. If set to None, it
+            defaults to all the repos in ``self.repo_bundle``
+        :param bool force: if True, mirrors are refreshed even if they are not stale.
+        '''
+        if repos_in_scope_l is None:
+            repos_in_scope_l                            = self.repo_names()
+        github_l                                        = [inspector for inspector in [RepoInspectorFactory.findInspector(self.remote_root,
+                                                                                                                          repo_name)
+                                                                                       for repo_name in repos_in_scope_l]
+                                                            if isinstance(inspector, GitHub_RepoInspector)]
+        if not GitHub_MirrorCache.ENABLED or len(github_l) == 0:
+            return
+        await GitHub_MirrorCache.refresh_all(self.remote_root, github_l[0].github_owner,
+                                             [inspector.repo_name for inspector in github_l], force)
+
+    def invalidate_commit_store(self, repos_in_scope_l=None, compact=False):
+        '''
+        Discards the commits saved in the :class:`GitHub_CommitStore` for the remote repos, so that the next report
+        downloads their history again. This is needed if the history of a remote repo was rewritten, e.g., by
+        a force-push.
+
+        :param list[str] repos_in_scope_l: names of the repos to invalidate. If set to None, it defaults to all
+            the repos in ``self.repo_bundle``
+        :param bool compact: if True, the store's database file is also shrunk afterwards.
+        '''
+        if repos_in_scope_l is None:
+            repos_in_scope_l                            = self.repo_names()
+
+        for repo_name in repos_in_scope_l:
+            inspector                                   = RepoInspectorFactory.findInspector(self.remote_root, repo_name)
+            if isinstance(inspector, GitHub_RepoInspector):
+                GitHub_CommitStore.invalidate(inspector.github_owner, repo_name)
+                self.log_info(f"Invalidated stored commits for '{inspector.github_owner}/{repo_name}'")
+
+        if compact:
+            GitHub_CommitStore.compact()
+
+    def github_metrics_summary(self, log=True, reset=False):
+        '''
+        Summarizes the GitHub calls made so far in this process, typically at the end of a run of
+        :meth:`create_repo_report` or of a :class:`BranchLifecycleManager` workflow.
+
+        :param bool log: if True (the default), the summary is also logged at the INFO log level.
+        :param bool reset: if True, the metrics are discarded after being summarized, so that the next summary
+            only covers the calls made after this one.
+        :return: a table with one row per GitHub endpoint, with call counts, latencies, bytes received, statuses,
+            retries and rate limit waits. See :meth:`GitHub_Metrics.summary_df`.
+        :rtype: pandas.DataFrame
+        '''
+        summary_df                                      = GitHub_Metrics.summary_df()
+        if log and len(summary_df) > 0:
+            with _pd.option_context("display.max_columns", None, "display.width", 250):
+                self.log_info("GitHub calls summary:\n" + summary_df.to_string(index=False))
+        if reset:
+            GitHub_Metrics.reset()
+        return summary_df
+
+    def git_concurrency_summary(self, log=True, reset=False):
+        '''
+        Summarizes how long the GIT commands run so far in this process waited for their turn with the
+        :class:`GitConcurrencyGovernor`, to help tune its caps for this machine.
+
+        :param bool log: if True (the default), the summary is also logged at the INFO log level.
+        :param bool reset: if True, the statistics are discarded after being summarized, so that the next summary
+            only covers the commands run after this one.
+        :return: a table with one row per kind of GIT command (read, network and write), with its cap, the number
+            of commands and their waits. See :meth:`GitConcurrencyGovernor.summary_df`.
+        :rtype: pandas.DataFrame
+        '''
+        summary_df                                      = GitConcurrencyGovernor.summary_df()
+        if log and len(summary_df) > 0:
+            with _pd.option_context("display.max_columns", None, "display.width", 250):
+                self.log_info("GIT commands summary:\n" + summary_df.to_string(index=False))
+        if reset:
+            GitConcurrencyGovernor.reset()
+        return summary_df
+
     def log_info(self, msg, xlabels=None):
         '''
         Logs the ``msg`` at the INFO log level.
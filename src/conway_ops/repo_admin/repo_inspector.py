@@ -1,4 +1,5 @@
 import abc
+import asyncio
 import pandas                                                       as _pd
 
 from conway_ops.repo_admin.repo_statics                             import RepoStatics
@@ -63,18 +64,79 @@ class RepoInspector(abc.ABC):
         '''
 
     @abc.abstractmethod
-    async def committed_files(self):
+    async def committed_files(self, since=None, until=None, max_commits=None, paths=None):
         '''
         Returns an iterable over CommitedFileInfo objects, yielding in chronological order the history of commits
         (i.e., a log) for the repo associated to this :class:`RepoInspector`
+
+        The optional parameters bound the history to look at, so that the cost of bounded logs does not grow as
+        repos age. When used, commits are numbered within the bounded history, i.e., the oldest commit returned
+        gets number 0.
+
+        :param since: if not None, only commits made at or after this time are included. May be a
+            :class:`datetime.datetime` or an ISO 8601 string.
+        :param until: if not None, only commits made at or before this time are included. May be a
+            :class:`datetime.datetime` or an ISO 8601 string.
+        :param int max_commits: if not None, only the most recent ``max_commits`` commits are included.
+        :param list[str] paths: if not None, only commits that changed files under these paths (relative to the
+            repo's root) are included, and for them only the files under these paths.
+        '''
+
+    async def iter_committed_files(self, since=None, until=None, max_commits=None, paths=None):
+        '''
+        Like :meth:`committed_files`, but as an asynchronous iterator, so that callers can process the history as it
+        is read instead of only after all of it has been read.
+
+        This default implementation just iterates over the result of :meth:`committed_files`. Derived classes
+        should override it if they can read the history incrementally.
+
+        :rtype: AsyncIterator[CommittedFileInfo]
+        '''
+        for cfi in await self.committed_files(since=since, until=until, max_commits=max_commits, paths=paths):
+            yield cfi
+
+    async def status_snapshot(self):
         '''
+        Gets at once the current branch, the last commit and the untracked, modified and deleted files. 
+        
+        This default implementation just calls the methods that get each of them, concurrently. Derived classes
+        should override it if they can get all of them more cheaply together.
+
+        :return: the status of the repo.
+        :rtype: RepoStatusSnapshot
+        '''
+        current_branch, last_commit, untracked_files, modified_files, deleted_files \
+                                            = await asyncio.gather(self.current_branch(), self.last_commit(),
+                                                                   self.untracked_files(), self.modified_files(),
+                                                                   self.deleted_files())
+        return RepoStatusSnapshot(current_branch, last_commit, untracked_files, modified_files, deleted_files)
 
     @abc.abstractmethod
-    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body):
+    async def ahead_behind(self, base, head):
+        '''
+        Counts how far ``head`` has diverged from ``base``, without needing to get the log of either.
+
+        :param str base: branch name or commit hash used as the reference.
+        :param str head: branch name or commit hash compared against ``base``.
+        :return: a pair of ints: the number of commits in ``head`` that are not in ``base`` (i.e., how many
+            commits ``head`` is ahead), and the number of commits in ``base`` that are not in ``head`` (i.e., how 
+            many commits ``head`` is behind). None if the repo does not know ``base`` or ``head`` (e.g., because
+            ``head`` is a commit that was not pushed to it yet). If anything else goes wrong it raises an exception.
+        :rtype: tuple
+        '''
+
+    @abc.abstractmethod
+    async def pull_request(self, scheduling_context, from_branch, to_branch, title, body, fast_forward=False):
         '''
         Creates and completes a pull request from the ``from_branch`` to the ``to_branch``.
 
         If anything goes wrong it raises an exception.
+
+        If ``fast_forward`` is True and the ``to_branch`` has no commits that the ``from_branch`` lacks, then
+        the ``to_branch`` is just moved to the head of the ``from_branch`` instead, without a merge commit. 
+
+        :return: what was done, and the details of doing it.
+        :rtype: PullRequestOutcome
         '''
 
 
@@ -93,8 +155,14 @@ class RepoInspector(abc.ABC):
         :param str branch: repo local branch to update from the remote.
         '''
 
-    async def log_to_dataframe(self):
+    async def log_to_dataframe(self, since=None, until=None, max_commits=None, paths=None):
         '''
+        :param since: if not None, only commits made at or after this time are included. May be a
+            :class:`datetime.datetime` or an ISO 8601 string.
+        :param until: if not None, only commits made at or before this time are included. May be a
+            :class:`datetime.datetime` or an ISO 8601 string.
+        :param int max_commits: if not None, only the most recent ``max_commits`` commits are included.
+        :param list[str] paths: if not None, only files under these paths (relative to the repo's root) are included.
         :return: A DataFrame with log information. Each row in the DataFrame
             represents a file that was committed, so there are typically multiple rows per commit.
         :rtype: :class:`pandas.DataFrame`
@@ -107,7 +175,7 @@ class RepoInspector(abc.ABC):
         commit_hash_l                                   = []
         commit_author_l                                 = []
 
-        for cfi in await self.committed_files():
+        async for cfi in self.iter_committed_files(since=since, until=until, max_commits=max_commits, paths=paths):
 
             commit_nb_l.                                append(cfi.commit_nb)
             commit_date_l.                              append(cfi.commit_date)
@@ -128,6 +196,25 @@ class RepoInspector(abc.ABC):
         log_df                                          = _pd.DataFrame(log_dict)
         return log_df
 
+    def _as_iso8601(when):
+        '''
+        :param when: a :class:`datetime.datetime`, an ISO 8601 string, or None.
+        :return: ``when`` as an ISO 8601 string, or None if ``when`` is None. 
+        :rtype: str
+        '''
+        if when is None or isinstance(when, str):
+            return when
+        return when.isoformat()
+
+    def _is_in_paths(filename, paths):
+        '''
+        :return: True if ``paths`` is None, or if ``filename`` is one of the ``paths`` or is under one of them.
+        :rtype: bool
+        '''
+        if paths is None:
+            return True
+        return any(filename == p.strip("/") or filename.startswith(p.strip("/") + "/") for p in paths)
+
 class CommitInfo():
     '''
     Helper data structure to contain some information about a commit
@@ -141,6 +228,42 @@ class CommitInfo():
         self.commit_msg                     = commit_msg
         self.commit_ts                      = commit_ts
 
+class PullRequestOutcome():
+    '''
+    Helper data structure with the result of :meth:`RepoInspector.pull_request`
+
+    :param str outcome: one of ``FAST_FORWARD`` (the destination branch was moved to the head of the source branch),
+        ``MERGE`` (a merge commit was made in the destination branch) or ``NOOP`` (nothing was needed, e.g., because
+        there were no commits to merge).
+    :param details: information about what was done, specific to the kind of inspector. For example, the merged
+        pull request or the updated ref for GitHub, or the output of ``git merge`` for the file system.
+    '''
+    FAST_FORWARD                            = "fast_forward"
+    MERGE                                   = "merge"
+    NOOP                                    = "noop"
+
+    def __init__(self, outcome, details=None):
+        self.outcome                        = outcome
+        self.details                        = details
+
+class RepoStatusSnapshot():
+    '''
+    Helper data structure to contain the status of a repo at a point in time, as returned by
+    :meth:`RepoInspector.status_snapshot`
+
+    :param str current_branch: The name of the current branch
+    :param CommitInfo last_commit: information about the last commit
+    :param list[str] untracked_files: files that are not tracked
+    :param list[str] modified_files: files that have been modified but not yet staged, excluding unstaged deletions
+    :param list[str] deleted_files: files with an unstaged deletion
+    '''
+    def __init__(self, current_branch, last_commit, untracked_files, modified_files, deleted_files):
+        self.current_branch                 = current_branch
+        self.last_commit                    = last_commit
+        self.untracked_files                = untracked_files
+        self.modified_files                 = modified_files
+        self.deleted_files                  = deleted_files
+
 class CommittedFileInfo():
     '''
     Helper data structure to contain log information about 1 file included in a commit, contextualized
@@ -1,7 +1,9 @@
 from pathlib                                            import Path
 
 from conway_ops.repo_admin.filesystem_repo_inspector    import FileSystem_RepoInspector
+from conway_ops.repo_admin.github_mirror_repo_inspector import GitHub_MirrorRepoInspector
 from conway_ops.repo_admin.github_repo_inspector        import GitHub_RepoInspector
+from conway_ops.util.github_mirror_cache                import GitHub_MirrorCache
 
 class RepoInspectorFactory():
 
@@ -11,7 +13,8 @@ class RepoInspectorFactory():
 
     For example, if a filesystem path is given for the repo, then it will instantiate a 
     :class:`FileSystem_RepoInspector`, whild if a ``github.com`` URL is given, it will instantiate a 
-    :class:`GitHub_RepoInspector.
+    :class:`GitHub_RepoInspector`, or a :class:`GitHub_MirrorRepoInspector` if the :class:`GitHub_MirrorCache`
+    is enabled.
     '''
     def __init__(self):
         pass
@@ -33,6 +36,8 @@ class RepoInspectorFactory():
         full_path                                       = parent_url + "/" + repo_name
         if Path(full_path).exists():
             inspector                                   = FileSystem_RepoInspector(parent_url, repo_name)
+        elif RepoInspectorFactory.GIT_HUB_URL_MATCH in parent_url and GitHub_MirrorCache.ENABLED:
+            inspector                                   = GitHub_MirrorRepoInspector(parent_url, repo_name)
         elif RepoInspectorFactory.GIT_HUB_URL_MATCH in parent_url:
             inspector                                   = GitHub_RepoInspector(parent_url, repo_name)
         else:
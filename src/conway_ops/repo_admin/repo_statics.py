@@ -18,6 +18,14 @@ class RepoStatics(abc.ABC):
     NB_UNTRACKED_FILES_COL                              = "# Untracked files"
     NB_MODIFIED_FILES_COL                               = "# Modified files"
     NB_DELETED_FILES_COL                                = "# Deleted files"
+    COMMITS_AHEAD_COL                                   = "# Commits ahead of remote"
+    COMMITS_BEHIND_COL                                  = "# Commits behind remote"
+    LOCAL_BRANCH_COL                                    = "Local branch"
+    REMOTE_BRANCH_COL                                   = "Remote branch"
+    FROM_BRANCH_COL                                     = "From branch"
+    TO_BRANCH_COL                                       = "To branch"
+    COMMITS_TO_MERGE_COL                                = "# Commits to merge"
+    PR_OUTCOME_COL                                      = "Pull request"
 
     LOCAL_REPO                                          = "Local"
     REMOTE_REPO                                         = "Remote"
@@ -0,0 +1,220 @@
+import asyncio
+import os                                                   as _os
+import threading
+import time
+
+from contextlib                                             import asynccontextmanager
+
+import pandas                                               as _pd
+
+class GitConcurrencyGovernor():
+
+    '''
+    Process-wide limit on how many GIT processes run at the same time, used by :class:`GitLocalClient`.
+
+    Without it, reports that look at many repos at once (each with several GIT commands) start all of those
+    processes together, which makes the machine thrash and the whole run slower than if they took turns.
+
+    Commands are classified into three kinds, each with its own cap, since they compete for different resources:
+
+    * "read": commands that only look at a repo, such as ``git status`` or ``git log``. Capped by ``MAX_READS``.
+    * "network": commands that talk to a remote, such as ``git fetch`` or ``git push``. Capped by ``MAX_NETWORK``.
+    * "write": all other commands, such as ``git checkout`` or ``git merge``. Capped by ``MAX_WRITES``.
+
+    For each kind it records how many commands ran and how long they had to wait for their turn, which can be
+    queried as a table with :meth:`summary_df` to tune the caps for a machine with :meth:`configure`.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitConcurrencyGovernor is a static class and should not be instantiated")
+
+    ENABLED                                             = True
+    MAX_READS                                           = max(4, 2 * (_os.cpu_count() or 1))
+    MAX_NETWORK                                         = 8
+    MAX_WRITES                                          = 4
+
+    READ                                                = "read"
+    NETWORK                                             = "network"
+    WRITE                                               = "write"
+    KINDS                                               = [READ, NETWORK, WRITE]
+
+    NETWORK_COMMANDS                                    = ["clone", "fetch", "pull", "push", "ls-remote"]
+    READ_COMMANDS                                       = ["status", "log", "show", "diff", "rev-parse", "rev-list",
+                                                           "ls-files", "ls-tree", "cat-file", "for-each-ref",
+                                                           "show-ref", "describe", "merge-base", "shortlog", "blame",
+                                                           "grep", "name-rev", "count-objects", "var", "version"]
+
+    # Options that make ``git branch`` change the repo, or just list branches, and that make ``git config`` just
+    # look at the configuration
+    _BRANCH_WRITE_OPTIONS                               = ["-d", "-D", "--delete", "-m", "-M", "--move", "-c", "-C",
+                                                           "--copy", "-f", "--force", "-u", "--set-upstream-to",
+                                                           "--unset-upstream", "--edit-description"]
+    _BRANCH_LIST_OPTIONS                                = ["-l", "--list", "--merged", "--no-merged", "--contains",
+                                                           "--no-contains", "--points-at"]
+    _CONFIG_READ_OPTIONS                                = ["-l", "--list", "--get", "--get-all", "--get-regexp",
+                                                           "--get-urlmatch"]
+
+    # GIT options that come before the command and take a separate value, as in "git -C path status"
+    _GLOBAL_OPTIONS_WITH_VALUE                          = ["-C", "-c", "--git-dir", "--work-tree", "--namespace"]
+
+    _loop_state_dict                                    = {} # Keys are event loops, values are semaphores per kind
+    _stats_dict                                         = {} # Keys are kinds, values are _KindStats objects
+    _lock                                               = threading.Lock()
+
+    def configure(enabled=None, max_reads=None, max_network=None, max_writes=None):
+        '''
+        :param bool enabled: if False, GIT commands are started as soon as they are requested.
+        :param int max_reads: maximum number of read-only GIT commands running at the same time.
+        :param int max_network: maximum number of GIT commands talking to a remote at the same time.
+        :param int max_writes: maximum number of other GIT commands running at the same time.
+        '''
+        GCG                                             = GitConcurrencyGovernor
+        with GCG._lock:
+            if not enabled is None:
+                GCG.ENABLED                             = enabled
+            if not max_reads is None:
+                GCG.MAX_READS                           = max_reads
+            if not max_network is None:
+                GCG.MAX_NETWORK                         = max_network
+            if not max_writes is None:
+                GCG.MAX_WRITES                          = max_writes
+            GCG._loop_state_dict                        = {}
+
+    def classify(args_list):
+        '''
+        :param list[str] args_list: a GIT command, such as ["git", "branch", "--merged", "master"]
+        :return: the kind of the command: one of ``READ``, ``NETWORK`` or ``WRITE``. Commands that are not known
+            to be read-only are classified as ``WRITE``.
+        :rtype: str
+        '''
+        GCG                                             = GitConcurrencyGovernor
+        idx                                             = 1 # Skip the "git"
+        while idx < len(args_list) and args_list[idx].startswith("-"):
+            idx                                         += 2 if args_list[idx] in GCG._GLOBAL_OPTIONS_WITH_VALUE else 1
+        if idx >= len(args_list):
+            return GCG.READ # E.g., "git --version"
+
+        command                                         = args_list[idx]
+        options_l                                       = [a.split("=")[0] for a in args_list[idx + 1:] if a.startswith("-")]
+        values_l                                        = [a for a in args_list[idx + 1:] if not a.startswith("-")]
+        if command in GCG.NETWORK_COMMANDS:
+            return GCG.NETWORK
+        if command in GCG.READ_COMMANDS:
+            return GCG.READ
+        if command == "branch":
+            if any(o in GCG._BRANCH_WRITE_OPTIONS for o in options_l):
+                return GCG.WRITE
+            if len(values_l) == 0 or any(o in GCG._BRANCH_LIST_OPTIONS for o in options_l):
+                return GCG.READ
+        if command == "config" and any(o in GCG._CONFIG_READ_OPTIONS for o in options_l):
+            return GCG.READ
+        if command == "symbolic-ref" and len(values_l) <= 1:
+            return GCG.READ
+        return GCG.WRITE
+
+    @asynccontextmanager
+    async def turn(args_list):
+        '''
+        Asynchronous context manager that waits until the GIT command in ``args_list`` may run without exceeding
+        the cap for its kind, and holds its place while the context is open.
+
+        :param list[str] args_list: the GIT command about to run.
+        '''
+        GCG                                             = GitConcurrencyGovernor
+        if not GCG.ENABLED:
+            yield
+            return
+
+        kind                                            = GCG.classify(args_list)
+        semaphore                                       = GCG._semaphores_for_running_loop()[kind]
+        start                                           = time.monotonic()
+        with GCG._lock:
+            stats                                       = GCG._stats_for(kind)
+            stats.waiting                               += 1
+            stats.peak_waiting                          = max(stats.peak_waiting, stats.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            wait_secs                                   = time.monotonic() - start
+            with GCG._lock:
+                stats                                   = GCG._stats_for(kind)
+                stats.waiting                           -= 1
+                stats.commands                          += 1
+                stats.total_wait_secs                   += wait_secs
+                stats.max_wait_secs                     = max(stats.max_wait_secs, wait_secs)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def summary_df():
+        '''
+        :return: a table with one row per kind of GIT command, with the cap, the number of commands run, and how
+            long they waited for their turn.
+        :rtype: pandas.DataFrame
+        '''
+        GCG                                             = GitConcurrencyGovernor
+        caps_dict                                       = {GCG.READ: GCG.MAX_READS, GCG.NETWORK: GCG.MAX_NETWORK,
+                                                           GCG.WRITE: GCG.MAX_WRITES}
+        rows_l                                          = []
+        with GCG._lock:
+            for kind in GCG.KINDS:
+                stats                                   = GCG._stats_dict.get(kind)
+                if stats is None or stats.commands == 0:
+                    continue
+                rows_l.append([kind, caps_dict[kind], stats.commands, round(stats.total_wait_secs, 3),
+                               round(1000 * stats.total_wait_secs / stats.commands, 1),
+                               round(1000 * stats.max_wait_secs, 1), stats.peak_waiting])
+
+        columns                                         = ["Kind", "Cap", "Commands", "Total wait secs", "Mean wait ms",
+                                                           "Max wait ms", "Peak queued"]
+        return _pd.DataFrame(data=rows_l, columns=columns)
+
+    def reset():
+        '''
+        Discards the statistics recorded so far.
+        '''
+        with GitConcurrencyGovernor._lock:
+            GitConcurrencyGovernor._stats_dict          = {}
+
+    def _stats_for(kind):
+        '''
+        Must be called while holding ``_lock``.
+        '''
+        stats                                           = GitConcurrencyGovernor._stats_dict.get(kind)
+        if stats is None:
+            stats                                       = _KindStats()
+            GitConcurrencyGovernor._stats_dict[kind]    = stats
+        return stats
+
+    def _semaphores_for_running_loop():
+        '''
+        :return: the semaphores for each kind of GIT command, for the running event loop. They are kept per event
+            loop since asyncio primitives can't be shared across event loops.
+        :rtype: dict
+        '''
+        GCG                                             = GitConcurrencyGovernor
+        loop                                            = asyncio.get_running_loop()
+        with GCG._lock:
+            for stale_loop in [l for l in GCG._loop_state_dict.keys() if l.is_closed()]:
+                del GCG._loop_state_dict[stale_loop]
+
+            semaphores_dict                             = GCG._loop_state_dict.get(loop)
+            if semaphores_dict is None:
+                semaphores_dict                         = {GCG.READ:     asyncio.Semaphore(GCG.MAX_READS),
+                                                           GCG.NETWORK:  asyncio.Semaphore(GCG.MAX_NETWORK),
+                                                           GCG.WRITE:    asyncio.Semaphore(GCG.MAX_WRITES)}
+                GCG._loop_state_dict[loop]              = semaphores_dict
+        return semaphores_dict
+
+class _KindStats():
+    '''
+    Helper data structure with the statistics that :class:`GitConcurrencyGovernor` records for one kind of GIT command.
+    '''
+    def __init__(self):
+        self.commands                                   = 0
+        self.total_wait_secs                            = 0.0
+        self.max_wait_secs                              = 0.0
+        self.waiting                                    = 0
+        self.peak_waiting                               = 0
@@ -1,59 +1,252 @@
 import asyncio
+import codecs
+import os                                                           as _os
+import signal
+import time
 
-import git                                                          as _git
 from pathlib                                                        import Path
 
-from conway.application.application                                 import Application
 from conway.util.command_parser                                     import CommandParser
 
+from conway_ops.util.git_concurrency_governor                       import GitConcurrencyGovernor
+from conway_ops.util.git_read_cache                                 import GitReadCache
+
 class GitLocalClient():
 
     '''
-    Helper class used to invoke GIT commands as strings. It essentially is a wrapper around GitPython to avoid having
-    awareness of GitPython across Conway modules.
+    Helper class used to invoke GIT commands. Commands run as child processes managed by the asyncio event loop,
+    so they don't tie up threads, and a command that times out or is cancelled has its process killed. How many
+    run at the same time is bounded by the :class:`GitConcurrencyGovernor`.
+
+    Commands may be given as strings (see :meth:`execute`) or as lists of arguments (see :meth:`run`), the latter
+    being preferable when arguments come from data, such as file paths, since no quoting is involved.
 
     :param str repo_path: Location in the file system for the Git repository to be acted on by this :class:`GitLocalClient` instance.
+    :param float timeout: default number of seconds after which commands run by this :class:`GitLocalClient` are
+        killed. If None, commands run for as long as they take.
 
     '''
-    def __init__(self, repo_path):
+    def __init__(self, repo_path, timeout=None):
 
-        # GOTCHA: 
+        # GOTCHA:
         #   If the repo_path does not exist (as it has happened due to typo by the user in setting inputs)
-        #   then unfortunately the GitPython's cmd.Git constructor will not fail and will just use a previous repo from
-        #   some prior instance of cmd.Git (e.g, looks like it does some static caching). That is very bad since then 
-        #   subsequent processing will be manipulating *the wrong repo*.
+        #   then GIT would run in the wrong folder (or fail with a misleading message). That is very bad since then
+        #   subsequent processing could be manipulating *the wrong repo*.
         #
         #   So force an exception in repo_path is not set correctly.
         #
         if not Path(repo_path).exists():
             raise ValueError("Repo folder does not exist: '" + str(repo_path) + "'")
-        
-        self.executor                                       = _git.cmd.Git(repo_path)
 
-    async def execute(self, command):
+        self.repo_path                                      = str(repo_path)
+        self.timeout                                        = timeout
+
+    # Number of bytes read from a GIT process' output at a time by :meth:`stream`
+    STREAM_CHUNK_SIZE                                       = 64 * 1024
+
+    async def execute(self, command, timeout=None):
         '''
         :param str command: a GIT command to execute. Example: "git status"
-        :return: the result of attempting to invoke the GIT ``command``
+        :param float timeout: number of seconds after which the command is killed. If None, the timeout of this
+            :class:`GitLocalClient` is used.
+        :return: the output of the ``command``, without its final line break
         :rtype: str
         '''
+        result                                              = await self.run(GitLocalClient._as_args_list(command),
+                                                                             timeout = timeout)
+        stdout                                              = result.stdout
+        return stdout[:-1] if stdout.endswith("\n") else stdout
 
-        # GOTCHA: On Linux, GitPython requires commands with arguments to be passed as a list, not
-        #       as a string. Thus, a command like "git status" should be passed in Linux as
-        #       ["git", "status"]
-        #
-        # That is why we split the command parameter
-        #
-        args_list                                           = CommandParser().get_argument_list(command)
-        
+    async def run(self, args_list, timeout=None, check=True):
+        '''
+        Runs a GIT command given as a list of arguments, which are passed as they are to GIT.
+
+        If the command is read-only and was already run on the repo when the repo's refs were as they are now, its
+        result is returned from the :class:`GitReadCache` without running GIT.
+
+        :param list[str] args_list: the GIT command. Example: ["git", "log", "-1", "--", "my folder/my file.py"]
+        :param float timeout: number of seconds after which the command is killed. If None, the timeout of this
+            :class:`GitLocalClient` is used.
+        :param bool check: if True, an exception is raised if the command fails (i.e., exits with a non-zero code).
+        :return: the exit code, output and duration of the command.
+        :rtype: GitCommandResult
+        '''
+        fingerprint                                         = None
+        if GitReadCache.ENABLED and GitReadCache.is_cacheable(args_list):
+            # Take the fingerprint before running the command, so that if the repo changes while the command runs,
+            # the result is not used after the change
+            fingerprint                                     = GitReadCache.fingerprint(self.repo_path)
+            if not fingerprint is None:
+                cached_result                               = GitReadCache.recall(self.repo_path, args_list, fingerprint)
+                if not cached_result is None:
+                    return cached_result
+
+        timeout                                             = self.timeout if timeout is None else timeout
+        async with GitConcurrencyGovernor.turn(args_list):
+            start                                           = time.monotonic()
+            process                                         = await self._start(args_list)
+            try:
+                stdout, stderr                              = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                raise ValueError(f"GIT command '{' '.join(args_list)}' timed out after {timeout} secs and was killed")
+            finally:
+                await GitLocalClient._kill(process)
+
+        result                                              = GitCommandResult(
+                                                                args_list   = args_list,
+                                                                exit_code   = process.returncode,
+                                                                stdout      = GitLocalClient._decode(stdout),
+                                                                stderr      = GitLocalClient._decode(stderr),
+                                                                duration    = time.monotonic() - start)
+        if check and result.exit_code != 0:
+            raise ValueError(GitLocalClient._failure_message(args_list, result.exit_code, result.stderr))
+        if not fingerprint is None and result.exit_code == 0:
+            GitReadCache.remember(self.repo_path, args_list, fingerprint, result)
+        return result
+
+    async def stream(self, command, separator="\0", timeout=None):
+        '''
+        Runs a GIT command and yields its output as it is produced, so that commands with large outputs (such as
+        logs) never need to have all their output in memory at once.
+
+        The output is yielded as lists of the complete records read so far, rather than one record at a time, since
+        callers can go through a list much faster than through an asynchronous iterator.
+
+        If the caller stops iterating before the output is exhausted, the GIT process is killed.
+
+        The command holds its turn with the :class:`GitConcurrencyGovernor` until the iteration ends, so callers
+        should not wait for other GIT commands while iterating.
+
+        :param command: a GIT command to execute, as a string or as a list of arguments.
+            Example: "git log -z --name-only"
+        :param str separator: the string that ends each record in the output of the ``command``. It is not
+            part of the records yielded.
+        :param float timeout: number of seconds after which the command is killed, counted from its start (i.e.,
+            not counting the wait for its turn with the :class:`GitConcurrencyGovernor`). If None,
+            the timeout of this :class:`GitLocalClient` is used.
+        :return: an asynchronous iterator over lists of records in the output of the ``command``, in order
+        :rtype: AsyncIterator[list[str]]
+        '''
+        args_list                                           = GitLocalClient._as_args_list(command)
+        timeout                                             = self.timeout if timeout is None else timeout
+        async with GitConcurrencyGovernor.turn(args_list):
+            deadline                                        = None if timeout is None else time.monotonic() + timeout
+            process                                         = await self._start(args_list)
+
+            # Read stderr concurrently, so that the process never blocks on a full stderr pipe
+            stderr_task                                     = asyncio.create_task(process.stderr.read())
+            # GOTCHA: a multi-byte UTF-8 character may be split across chunks, so decode incrementally
+            decoder                                         = codecs.getincrementaldecoder("utf-8")(errors="surrogateescape")
+            pending                                         = ""
+            try:
+                while True:
+                    remaining                               = None if deadline is None else deadline - time.monotonic()
+                    try:
+                        chunk                               = await asyncio.wait_for(
+                                                                process.stdout.read(GitLocalClient.STREAM_CHUNK_SIZE),
+                                                                remaining)
+                    except asyncio.TimeoutError:
+                        raise ValueError(f"GIT command '{' '.join(args_list)}' timed out after {timeout} secs and was killed")
+                    if len(chunk) == 0:
+                        break
+                    records                                 = (pending + decoder.decode(chunk)).split(separator)
+                    pending                                 = records.pop()
+                    if len(records) > 0:
+                        yield records
+
+                pending                                     += decoder.decode(b"", final=True)
+                if len(pending) > 0:
+                    yield [pending]
+
+                stderr                                      = await stderr_task
+                if await process.wait() != 0:
+                    raise ValueError(GitLocalClient._failure_message(args_list, process.returncode,
+                                                                     GitLocalClient._decode(stderr)))
+            finally:
+                await GitLocalClient._kill(process)
+                if not stderr_task.done():
+                    stderr_task.cancel()
+
+    async def _start(self, args_list):
+        '''
+        :return: a GIT process running the command in ``args_list`` in this client's repo.
+        :rtype: asyncio.subprocess.Process
+        '''
+        # Like GitPython did, make GIT's messages independent of the user's locale, since callers parse them
+        env                                                 = dict(_os.environ, LANGUAGE="C", LC_ALL="C")
+        if GitConcurrencyGovernor.classify(args_list) == GitConcurrencyGovernor.READ:
+            # GOTCHA: otherwise commands like "git status" take the index lock and rewrite the index when its stat
+            #       information is stale. That competes with commands changing the repo for the lock, and changes
+            #       the GitReadCache fingerprint (which includes the index), discarding the results it cached.
+            #
+            env["GIT_OPTIONAL_LOCKS"]                       = "0"
         try:
-            response                                        = await asyncio.to_thread(self.executor.execute,
-                                                                                        args_list)
-
-            return response
-        except Exception as ex:
-            raise ValueError("Could not run GIT command '" + str(command) + "'." 
-                             + "\n\t==> Often this happens due to GIT authentication issues. "
-                             + "\n\t==>If so, it's recommended to generate SSH keys as explained in "
-                             + "\n\t\thttps://docs.github.com/en/authentication/connecting-to-github-with-ssh/generating-a-new-ssh-key-and-adding-it-to-the-ssh-agent?platform=linux"
-                             + "\n\nError message is:\n"
-                             + str(ex))
\ No newline at end of file
+            # In POSIX, GIT runs in a session of its own so that it can be killed together with the processes it
+            # starts (see _kill)
+            return await asyncio.create_subprocess_exec(*args_list,
+                                                        cwd                 = self.repo_path,
+                                                        env                 = env,
+                                                        stdin               = asyncio.subprocess.DEVNULL,
+                                                        stdout              = asyncio.subprocess.PIPE,
+                                                        stderr              = asyncio.subprocess.PIPE,
+                                                        start_new_session   = _os.name == "posix")
+        except OSError as ex:
+            raise ValueError(GitLocalClient._failure_message(args_list, None, str(ex)))
+
+    async def _kill(process):
+        '''
+        Kills the ``process`` if it is still running, e.g., because the command timed out or was cancelled.
+        '''
+        if process.returncode is None:
+            # GOTCHA: asyncio only reports that a process ended once its output pipes are closed, but processes
+            #       started by GIT (such as ssh during a fetch, or hooks) inherit those pipes and may keep them open
+            #       after GIT is killed. So in POSIX kill them too, as the whole process group that _start created,
+            #       or else we would wait for them.
+            #
+            try:
+                if _os.name == "posix":
+                    _os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+    def _as_args_list(command):
+        '''
+        :param command: a GIT command, as a string or as a list of arguments.
+        :rtype: list[str]
+        '''
+        if isinstance(command, str):
+            return CommandParser().get_argument_list(command)
+        return list(command)
+
+    def _decode(raw):
+        # Like GitPython did, keep bytes that are not valid UTF-8 (e.g., in old file names) as surrogates
+        return raw.decode("utf-8", errors="surrogateescape")
+
+    def _failure_message(args_list, exit_code, stderr):
+        return ("Could not run GIT command '" + " ".join(args_list) + "'."
+                + "\n\t==> Often this happens due to GIT authentication issues. "
+                + "\n\t==>If so, it's recommended to generate SSH keys as explained in "
+                + "\n\t\thttps://docs.github.com/en/authentication/connecting-to-github-with-ssh/generating-a-new-ssh-key-and-adding-it-to-the-ssh-agent?platform=linux"
+                + "\n\nError message is:\n"
+                + ("" if exit_code is None else f"exit code {exit_code}\n")
+                + stderr)
+
+class GitCommandResult():
+    '''
+    Helper data structure with the outcome of a GIT command run by a :class:`GitLocalClient`.
+
+    :param list[str] args_list: the command that was run.
+    :param int exit_code: the command's exit code, which is 0 if it succeeded.
+    :param str stdout: the command's standard output.
+    :param str stderr: the command's standard error.
+    :param float duration: the number of seconds the command took.
+    '''
+    def __init__(self, args_list, exit_code, stdout, stderr, duration):
+        self.args_list                                      = args_list
+        self.exit_code                                      = exit_code
+        self.stdout                                         = stdout
+        self.stderr                                         = stderr
+        self.duration                                       = duration
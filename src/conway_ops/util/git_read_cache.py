@@ -0,0 +1,196 @@
+import hashlib
+import os                                                   as _os
+import re
+import threading
+
+from collections                                            import OrderedDict
+
+from conway_ops.util.git_concurrency_governor               import GitConcurrencyGovernor
+from conway_ops.util.git_ref_reader                         import GitRefReader
+
+class GitReadCache():
+
+    '''
+    Process-wide memoization of the results of read-only GIT commands, used by :class:`GitLocalClient`, so that
+    asking the same question about a repo again (such as its branches, current branch or last commit, as dashboards
+    do on each refresh) does not start a GIT process unless the repo changed in between.
+
+    Results are keyed on the command and on a "fingerprint" of the repo's state that is cheap to compute without
+    GIT: the contents of ``HEAD`` and of the loose refs, and the file system metadata of ``packed-refs``, of the
+    index and of the repo's configuration. Any commit, checkout, merge, fetch, pull or branch change alters the
+    fingerprint, and so does a configuration change (such as setting a branch's upstream, which changes what
+    ``@{upstream}`` resolves to), so results computed before it are not used after it.
+
+    Only commands whose result depends on nothing but the refs and the objects they point to are cached, such as
+    ``git log`` or ``git branch``. Commands that look at the working tree, such as ``git status``, are not, since
+    edits to files in the working tree don't change the fingerprint.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitReadCache is a static class and should not be instantiated")
+
+    ENABLED                                             = True
+    MAX_ENTRIES                                         = 2000
+
+    CACHEABLE_COMMANDS                                  = ["log", "show", "rev-parse", "rev-list", "branch",
+                                                           "for-each-ref", "show-ref", "merge-base", "cat-file",
+                                                           "ls-tree", "symbolic-ref", "name-rev"]
+
+    # Options whose values may be relative to the current time (like "2 weeks ago"), in which case the result of the
+    # command may change even if the repo doesn't. Commands using them are only cached if the values are absolute.
+    _TIME_OPTIONS                                       = ["--since", "--until", "--after", "--before", "--max-age",
+                                                           "--min-age"]
+    _ABSOLUTE_TIME_REGEX                                = re.compile(r"\d{4}-\d{2}-\d{2}")
+    # Arguments that make GIT print dates relative to the current time, like "3 days ago"
+    _RELATIVE_DATE_REGEX                                = re.compile(r"%[acr]r|--date=relative|--relative-date")
+
+    _results_dict                                       = OrderedDict() # Keys are (repo path, args), values are
+                                                                        # (fingerprint, result) pairs
+    _hits                                               = 0
+    _misses                                             = 0
+    _lock                                               = threading.Lock()
+
+    def configure(enabled=None, max_entries=None):
+        '''
+        :param bool enabled: if False, no results are cached or returned from the cache.
+        :param int max_entries: maximum number of results kept. When exceeded, the least recently used are discarded.
+        '''
+        GRC                                             = GitReadCache
+        with GRC._lock:
+            if not enabled is None:
+                GRC.ENABLED                             = enabled
+            if not max_entries is None:
+                GRC.MAX_ENTRIES                         = max_entries
+            GRC._results_dict                           = OrderedDict()
+
+    def is_cacheable(args_list):
+        '''
+        :param list[str] args_list: a GIT command, such as ["git", "branch", "--merged", "master"]
+        :return: True if the result of the command only depends on the refs of the repo and the objects they
+            point to.
+        :rtype: bool
+        '''
+        GRC                                             = GitReadCache
+        if GitConcurrencyGovernor.classify(args_list) != GitConcurrencyGovernor.READ:
+            return False
+        if len(args_list) < 2 or not args_list[1] in GRC.CACHEABLE_COMMANDS:
+            return False
+        for idx, arg in enumerate(args_list):
+            if GRC._RELATIVE_DATE_REGEX.search(arg):
+                return False
+            option                                      = arg.split("=")[0]
+            if option in GRC._TIME_OPTIONS:
+                value                                   = arg.split("=", 1)[1] if "=" in arg \
+                                                            else (args_list[idx + 1] if idx + 1 < len(args_list) else "")
+                if not GRC._ABSOLUTE_TIME_REGEX.match(value):
+                    return False
+        return True
+
+    def fingerprint(repo_path):
+        '''
+        :param str repo_path: the location of a repo in the local file system. It may be a normal repo, a linked
+            worktree or a bare repo.
+        :return: a string that changes whenever the refs of the repo change, or None if the repo's GIT folder
+            can't be found.
+        :rtype: str
+        '''
+        git_dirs                                        = GitRefReader.find_git_dirs(repo_path)
+        if git_dirs is None:
+            return None
+        git_dir, common_dir                             = git_dirs
+
+        digest                                          = hashlib.sha1()
+        def _add_content(path):
+            try:
+                with open(path, "rb") as file:
+                    digest.update(path.encode("utf-8", errors="surrogateescape") + b"\0" + file.read() + b"\0")
+            except OSError:
+                digest.update(path.encode("utf-8", errors="surrogateescape") + b"\0-\0")
+
+        def _add_stat(path):
+            try:
+                st                                      = _os.stat(path)
+                digest.update(f"{path}\0{st.st_ino}:{st.st_size}:{st.st_mtime_ns}\0".encode("utf-8",
+                                                                                        errors="surrogateescape"))
+            except OSError:
+                digest.update(path.encode("utf-8", errors="surrogateescape") + b"\0-\0")
+
+        def _add_loose_refs(folder):
+            try:
+                entries_l                               = sorted(_os.scandir(folder), key=lambda e: e.name)
+            except OSError:
+                return
+            for entry in entries_l:
+                if entry.is_dir(follow_symlinks=False):
+                    _add_loose_refs(entry.path)
+                else:
+                    # GOTCHA: read the contents rather than rely on modification times, since a ref updated twice
+                    #       within the file system's timestamp granularity would otherwise look unchanged (and refs
+                    #       always have the same size).
+                    _add_content(entry.path)
+
+        _add_content(git_dir + "/HEAD")
+        _add_stat(git_dir + "/index")
+        _add_stat(common_dir + "/packed-refs")
+        _add_stat(common_dir + "/config")
+        _add_content(common_dir + "/reftable/tables.list")
+        _add_loose_refs(common_dir + "/refs")
+        if git_dir != common_dir:
+            # Refs specific to a linked worktree, like those of a bisect in it, and its own configuration
+            _add_loose_refs(git_dir + "/refs")
+            _add_stat(git_dir + "/config.worktree")
+        return digest.hexdigest()
+
+    def recall(repo_path, args_list, fingerprint):
+        '''
+        :return: the result saved by :meth:`remember` for the command in ``args_list`` on the repo, or None if
+            there is none or the repo had a different ``fingerprint`` then.
+        '''
+        GRC                                             = GitReadCache
+        key                                             = (GRC._key_path(repo_path), tuple(args_list))
+        with GRC._lock:
+            entry                                       = GRC._results_dict.get(key)
+            if entry is None or entry[0] != fingerprint:
+                GRC._misses                             += 1
+                return None
+            GRC._results_dict.move_to_end(key)
+            GRC._hits                                   += 1
+            return entry[1]
+
+    def remember(repo_path, args_list, fingerprint, result):
+        '''
+        Saves the ``result`` of the command in ``args_list`` on the repo.
+
+        :param str fingerprint: the fingerprint that the repo had before the command was run.
+        '''
+        GRC                                             = GitReadCache
+        key                                             = (GRC._key_path(repo_path), tuple(args_list))
+        with GRC._lock:
+            GRC._results_dict[key]                      = (fingerprint, result)
+            GRC._results_dict.move_to_end(key)
+            while len(GRC._results_dict) > GRC.MAX_ENTRIES:
+                GRC._results_dict.popitem(last=False)
+
+    def stats():
+        '''
+        :return: a dictionary with the number of "entries" in the cache, and the number of "hits" and "misses"
+            since the cache was last cleared.
+        :rtype: dict
+        '''
+        GRC                                             = GitReadCache
+        with GRC._lock:
+            return {"entries": len(GRC._results_dict), "hits": GRC._hits, "misses": GRC._misses}
+
+    def clear():
+        '''
+        Discards all cached results.
+        '''
+        GRC                                             = GitReadCache
+        with GRC._lock:
+            GRC._results_dict                           = OrderedDict()
+            GRC._hits                                   = 0
+            GRC._misses                                 = 0
+
+    def _key_path(repo_path):
+        return _os.path.abspath(repo_path)
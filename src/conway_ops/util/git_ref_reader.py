@@ -0,0 +1,226 @@
+import os                                                   as _os
+import re
+import threading
+
+class GitRefReader():
+
+    '''
+    Helper class that answers simple questions about a repo's refs (its current branch, its branches, and the
+    commits they point to) by reading the files in the repo's GIT folder, instead of starting a GIT process.
+    Those files are tiny, so this is much cheaper than running GIT, which matters when asking about many repos.
+
+    It understands normal repos, linked worktrees and bare repos, symbolic refs (like ``HEAD``), and refs that GIT
+    packed into the ``packed-refs`` file. For anything unusual, such as a repo that stores refs in the "reftable"
+    format or a ref file it can't parse, its methods return None so that callers can ask GIT instead.
+
+    :param str repo_path: Location in the file system for the Git repository to be read by this :class:`GitRefReader` instance.
+    '''
+    def __init__(self, repo_path):
+        self.repo_path                                  = str(repo_path)
+
+    # Refs may point to SHA-1 (40 hex digits) or SHA-256 (64 hex digits) object names
+    _SHA_REGEX                                          = re.compile(r"[0-9a-f]{40}([0-9a-f]{24})?")
+    _SYMREF_PREFIX                                      = "ref: "
+    _HEADS_PREFIX                                       = "refs/heads/"
+    # How many symbolic refs to follow before giving up, as GIT does, in case they form a cycle
+    _MAX_SYMREF_DEPTH                                   = 5
+
+    _git_dirs_dict                                      = {} # Keys are repo paths, values are (git dir, common dir)
+    _lock                                               = threading.Lock()
+
+    def current_branch(self):
+        '''
+        :return: the name of the current branch, like ``git rev-parse --abbrev-ref HEAD``: "HEAD" if no branch is
+            checked out (i.e., the HEAD is detached). None if it can't be told without GIT.
+        :rtype: str
+        '''
+        head                                            = self._read_ref_file("HEAD")
+        if head is None:
+            return None
+        if head.startswith(GitRefReader._SYMREF_PREFIX):
+            target                                      = head[len(GitRefReader._SYMREF_PREFIX):]
+            if target.startswith(GitRefReader._HEADS_PREFIX):
+                return target[len(GitRefReader._HEADS_PREFIX):]
+            return None
+        return "HEAD" if GitRefReader._SHA_REGEX.fullmatch(head) else None
+
+    def branches(self):
+        '''
+        :return: the names of the local branches, sorted like ``git branch`` lists them. None if they can't be
+            told without GIT.
+        :rtype: list[str]
+        '''
+        branches_dict                                   = self._branch_shas()
+        if branches_dict is None:
+            return None
+        return sorted(branches_dict.keys(), key=lambda name: name.encode("utf-8", errors="surrogateescape"))
+
+    def branch_sha(self, branch_name):
+        '''
+        :param str branch_name: the name of a local branch, such as "master"
+        :return: the hash of the commit that the local branch called ``branch_name`` points to. None if there is no
+            such branch or it can't be told without GIT.
+        :rtype: str
+        '''
+        branches_dict                                   = self._branch_shas()
+        if branches_dict is None:
+            return None
+        return branches_dict.get(branch_name)
+
+    def head_sha(self):
+        '''
+        :return: the hash of the commit that ``HEAD`` points to, directly or through symbolic refs. None if it
+            points to no commit yet (e.g., in a new repo) or it can't be told without GIT.
+        :rtype: str
+        '''
+        ref_name                                        = "HEAD"
+        for _ in range(GitRefReader._MAX_SYMREF_DEPTH):
+            content                                     = self._read_ref_file(ref_name)
+            if content is None and ref_name != "HEAD":
+                packed_dict                             = self._packed_refs()
+                content                                 = None if packed_dict is None else packed_dict.get(ref_name)
+            if content is None:
+                return None
+            if not content.startswith(GitRefReader._SYMREF_PREFIX):
+                return content if GitRefReader._SHA_REGEX.fullmatch(content) else None
+            ref_name                                    = content[len(GitRefReader._SYMREF_PREFIX):]
+        return None
+
+    def find_git_dirs(repo_path):
+        '''
+        :param str repo_path: the location of a repo in the local file system.
+        :return: a pair with the GIT folder of the repo (which holds ``HEAD`` and the index) and the folder it
+            shares with other worktrees of the repo (which holds the refs), or None if there is no GIT folder.
+            Both are the same unless ``repo_path`` is a linked worktree.
+        :rtype: tuple
+        '''
+        GRR                                             = GitRefReader
+        repo_path                                       = _os.path.abspath(repo_path)
+        with GRR._lock:
+            git_dirs                                    = GRR._git_dirs_dict.get(repo_path)
+        if not git_dirs is None:
+            return git_dirs
+
+        dot_git                                         = repo_path + "/.git"
+        try:
+            if _os.path.isdir(dot_git):
+                git_dir                                 = dot_git
+            elif _os.path.isfile(dot_git):
+                # A linked worktree (or submodule), whose .git file is like "gitdir: /path/to/repo/.git/worktrees/name"
+                with open(dot_git, "r", encoding="utf-8") as file:
+                    content                             = file.read().strip()
+                if not content.startswith("gitdir:"):
+                    return None
+                git_dir                                 = _os.path.join(repo_path, content[len("gitdir:"):].strip())
+            elif _os.path.isfile(repo_path + "/HEAD") and _os.path.isdir(repo_path + "/objects"):
+                git_dir                                 = repo_path # A bare repo
+            else:
+                return None
+
+            git_dir                                     = _os.path.normpath(git_dir)
+            common_dir                                  = git_dir
+            if _os.path.isfile(git_dir + "/commondir"):
+                with open(git_dir + "/commondir", "r", encoding="utf-8") as file:
+                    common_dir                          = _os.path.normpath(_os.path.join(git_dir, file.read().strip()))
+        except (OSError, ValueError):
+            return None
+
+        git_dirs                                        = (git_dir, common_dir)
+        with GRR._lock:
+            GRR._git_dirs_dict[repo_path]               = git_dirs
+        return git_dirs
+
+    def _git_dirs(self):
+        '''
+        :return: the GIT folders of this reader's repo (see :meth:`find_git_dirs`), or None if the refs can't be
+            read without GIT.
+        :rtype: tuple
+        '''
+        # GIT would use the folders given by these variables instead of the repo's own
+        if any(v in _os.environ for v in ["GIT_DIR", "GIT_COMMON_DIR"]):
+            return None
+        git_dirs                                        = GitRefReader.find_git_dirs(self.repo_path)
+        if git_dirs is None or _os.path.exists(git_dirs[1] + "/reftable"):
+            return None
+        return git_dirs
+
+    def _read_ref_file(self, ref_name):
+        '''
+        :param str ref_name: the name of a ref, such as "HEAD" or "refs/heads/master"
+        :return: the content of the loose file for the ref (a hash, or "ref: " followed by the name of another ref
+            for symbolic refs), or None if there is no such file or it can't be read.
+        :rtype: str
+        '''
+        git_dirs                                        = self._git_dirs()
+        if git_dirs is None:
+            return None
+        git_dir, common_dir                             = git_dirs
+        # HEAD and refs outside refs/ (like ORIG_HEAD) belong to each worktree, while refs/ is shared
+        folder                                          = common_dir if ref_name.startswith("refs/") else git_dir
+        try:
+            with open(folder + "/" + ref_name, "r", encoding="utf-8", errors="surrogateescape") as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def _packed_refs(self):
+        '''
+        :return: the refs in the ``packed-refs`` file, as a dictionary whose keys are ref names and whose values
+            are hashes. None if the file can't be parsed.
+        :rtype: dict
+        '''
+        git_dirs                                        = self._git_dirs()
+        if git_dirs is None:
+            return None
+        packed_dict                                     = {}
+        try:
+            with open(git_dirs[1] + "/packed-refs", "r", encoding="utf-8", errors="surrogateescape") as file:
+                lines_l                                 = file.read().splitlines()
+        except FileNotFoundError:
+            return packed_dict
+        except OSError:
+            return None
+
+        # The file has a header line starting with "#", then lines like "<hash> refs/heads/master", each of which
+        # may be followed by a line like "^<hash>" with the commit an annotated tag points to
+        for line in lines_l:
+            if len(line) == 0 or line.startswith("#") or line.startswith("^"):
+                continue
+            tokens                                      = line.split(" ", 1)
+            if len(tokens) != 2 or not GitRefReader._SHA_REGEX.fullmatch(tokens[0]):
+                return None
+            packed_dict[tokens[1]]                      = tokens[0]
+        return packed_dict
+
+    def _branch_shas(self):
+        '''
+        :return: the local branches, as a dictionary whose keys are branch names and whose values are hashes, or
+            None if they can't be told without GIT.
+        :rtype: dict
+        '''
+        git_dirs                                        = self._git_dirs()
+        packed_dict                                     = self._packed_refs()
+        if git_dirs is None or packed_dict is None:
+            return None
+
+        HEADS                                           = GitRefReader._HEADS_PREFIX
+        branches_dict                                   = {name[len(HEADS):]: sha for name, sha in packed_dict.items()
+                                                            if name.startswith(HEADS)}
+
+        # Loose refs take precedence over packed ones, since GIT writes updates of packed refs as loose refs
+        heads_folder                                    = git_dirs[1] + "/" + HEADS
+        for folder, _, files_l in _os.walk(heads_folder):
+            for file_name in files_l:
+                if file_name.endswith(".lock"):
+                    continue # A ref being updated by GIT right now; its current value is still in the ref's file
+                path                                    = _os.path.join(folder, file_name)
+                name                                    = _os.path.relpath(path, heads_folder).replace(_os.sep, "/")
+                try:
+                    with open(path, "r", encoding="utf-8", errors="surrogateescape") as file:
+                        content                         = file.read().strip()
+                except OSError:
+                    return None
+                if not GitRefReader._SHA_REGEX.fullmatch(content):
+                    return None # E.g., a symbolic ref, or a broken ref that GIT would warn about
+                branches_dict[name]                     = content
+        return branches_dict
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os                                                   as _os
+import threading
+
+from pathlib                                                import Path
+
+from conway.application.application                         import Application
+
+from conway_ops.util.github_client                          import GitHub_Client
+from conway_ops.util.github_request_coalescer               import GitHub_RequestCoalescer
+from conway_ops.util.github_response_handler                import GitHub_ReponseHandler
+
+class GitHub_ChangeDetector():
+
+    '''
+    Tells which repos of a GitHub owner changed since the last time their results were computed, so that results
+    for unchanged repos (such as their stats and logs) can be reused instead of being fetched from GitHub again.
+
+    Changes are detected with one listing of all the owner's repos (one call per 100 repos, made as a conditional
+    request so that a "304 Not Modified" answer does not count against the rate limit). For each repo, the listing
+    has the time of the last push and the default branch, which together make up the repo's "fingerprint": if it
+    did not change, neither did the repo's branches and commits.
+
+    Results are saved per repo together with the fingerprint they were computed for, in a JSON file per owner in
+    the local file system. They are only returned while the repo keeps that fingerprint.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_ChangeDetector is a static class and should not be instantiated")
+
+    ENABLED                                             = True
+    SNAPSHOT_DIR                                        = str(Path.home()) + "/.conway_ops/cache/github_snapshots"
+
+    # Keys are owners, values are pairs (resource, sub path) with which to list the owner's repos
+    _owner_resource_dict                                = {}
+    _lock                                               = threading.Lock()
+
+    def configure(snapshot_dir=None, enabled=None):
+        '''
+        :param str snapshot_dir: folder in the local file system under which to keep the saved results.
+        :param bool enabled: if False, no results are saved or returned, so every repo is treated as changed.
+        '''
+        GCD                                             = GitHub_ChangeDetector
+        with GCD._lock:
+            if not snapshot_dir is None:
+                GCD.SNAPSHOT_DIR                        = snapshot_dir
+            if not enabled is None:
+                GCD.ENABLED                             = enabled
+
+    async def fingerprints(github_owner):
+        '''
+        :param str github_owner: the GitHub user or organization whose repos are of interest.
+        :return: the fingerprint of each repo of the ``github_owner``, keyed by repo name. If the ``github_owner``
+            is a user other than the one of the GitHub token, only their public repos are included.
+        :rtype: dict
+        '''
+        GCD                                             = GitHub_ChangeDetector
+
+        async def _list(resource, sub_path):
+            fingerprints_dict                           = {}
+            async with GitHub_Client(github_owner = github_owner) as ctx:
+                async for repo in ctx.GET_paginated(parent_context  = None,
+                                                    resource        = resource,
+                                                    sub_path        = sub_path,
+                                                    fields          = GitHub_ReponseHandler.REPO_FIELDS):
+                    fingerprints_dict[repo['name']]     = f"{repo['pushed_at']} {repo['default_branch']}"
+            return fingerprints_dict
+
+        async def _authenticated_login():
+            async with GitHub_Client(github_owner = github_owner) as ctx:
+                try:
+                    user                                = await ctx.GET(parent_context  = None,
+                                                                        resource        = "user",
+                                                                        sub_path        = "",
+                                                                        fields          = {"login": None})
+                except ValueError:
+                    # For example, tokens of GitHub Apps don't belong to a user
+                    return None
+            return None if user is None else user.get("login")
+
+        async def _fetch():
+            # The owner may be an organization or a user, and we only know which after the first listing
+            listing                                     = GCD._owner_resource_dict.get(github_owner)
+            if not listing is None:
+                return await _list(*listing)
+            try:
+                listing                                 = ("orgs", "/repos")
+                result_dict                             = await _list(*listing)
+            except ValueError:
+                # GOTCHA: "/users/{owner}/repos" only lists public repos, even for the owner's own token. The
+                #   owner's private repos are only listed by "/user/repos", which is about the token's user.
+                login                                   = await _authenticated_login()
+                if not login is None and login.lower() == github_owner.lower():
+                    listing                             = ("user", "/repos?affiliation=owner")
+                else:
+                    listing                             = ("users", "/repos")
+                    Application.app().log(f"GitHub user '{github_owner}' is not the one of the GitHub token, so only "
+                                          + "their public repos can be listed. Changes to their private repos can't "
+                                          + "be detected, so those repos will be treated as changed")
+                result_dict                             = await _list(*listing)
+            with GCD._lock:
+                GCD._owner_resource_dict[github_owner]  = listing
+            return result_dict
+
+        # Different parts of a report need the fingerprints, so share the listing with the GitHub_RequestCoalescer
+        return await GitHub_RequestCoalescer.coalesce(key=f"fingerprints of {github_owner}", fetch=_fetch)
+
+    def changed_repos(github_owner, fingerprints_dict):
+        '''
+        :param str github_owner: the GitHub user or organization that owns the repos.
+        :param dict fingerprints_dict: the current fingerprint of each repo of interest, keyed by repo name, as
+            returned by :meth:`fingerprints`.
+        :return: names of the repos in ``fingerprints_dict`` whose fingerprint is not the one for which results
+            were last saved (including repos with no saved results), sorted by name.
+        :rtype: list[str]
+        '''
+        GCD                                             = GitHub_ChangeDetector
+        with GCD._lock:
+            snapshot_dict                               = GCD._load(github_owner)
+        return sorted([repo_name for repo_name, fingerprint in fingerprints_dict.items()
+                        if fingerprint is None or snapshot_dict.get(repo_name, {}).get("fingerprint") != fingerprint])
+
+    def recall(github_owner, repo_name, fingerprint, key):
+        '''
+        :param str github_owner: the GitHub user or organization that owns the repo.
+        :param str repo_name: the name of the repo.
+        :param str fingerprint: the repo's current fingerprint, as returned by :meth:`fingerprints`.
+        :param str key: identifies the result, such as "stats".
+        :return: the result saved for the ``key`` by :meth:`remember`, or None if there is none or the repo
+            changed since then.
+        '''
+        GCD                                             = GitHub_ChangeDetector
+        if not GCD.ENABLED or fingerprint is None:
+            return None
+        with GCD._lock:
+            repo_dict                                   = GCD._load(github_owner).get(repo_name, {})
+        if repo_dict.get("fingerprint") != fingerprint:
+            return None
+        return repo_dict.get("results", {}).get(key)
+
+    async def remember(github_owner, results_l):
+        '''
+        Saves results for repos of the same owner. Results saved for other fingerprints of a repo are discarded, and
+        so are earlier results of the same kind, which is the first word of the key (e.g., a log fetched with some
+        bounds replaces the log fetched with other bounds), so that the saved results don't grow without limit.
+
+        Callers should collect the results of a run and save them with one call, since each call rewrites the
+        owner's whole file. That is done in a worker thread so that the event loop is not blocked meanwhile.
+
+        :param str github_owner: the GitHub user or organization that owns the repos.
+        :param list[tuple] results_l: tuples (repo name, fingerprint, key, value), where the fingerprint is the
+            one that the repo had before the result was computed, the key identifies the result (such as "stats")
+            and the value is the result, which must be serializable as JSON.
+        '''
+        GCD                                             = GitHub_ChangeDetector
+        results_l                                       = [r for r in results_l if not r[1] is None]
+        if not GCD.ENABLED or len(results_l) == 0:
+            return
+
+        def _remember_all():
+            with GCD._lock:
+                snapshot_dict                           = GCD._load(github_owner)
+                for repo_name, fingerprint, key, value in results_l:
+                    repo_dict                           = snapshot_dict.get(repo_name)
+                    if repo_dict is None or repo_dict["fingerprint"] != fingerprint:
+                        repo_dict                       = {"fingerprint": fingerprint, "results": {}}
+                        snapshot_dict[repo_name]        = repo_dict
+                    kind                                = key.split(" ")[0]
+                    repo_dict["results"]                = {k: v for k, v in repo_dict["results"].items()
+                                                            if k.split(" ")[0] != kind}
+                    repo_dict["results"][key]           = value
+                GCD._save(github_owner, snapshot_dict)
+
+        await asyncio.to_thread(_remember_all)
+
+    def invalidate(github_owner=None):
+        '''
+        Discards saved results, so that all repos are treated as changed.
+
+        :param str github_owner: the GitHub user or organization whose results are to be discarded. If None,
+            results for all owners are discarded.
+        '''
+        GCD                                             = GitHub_ChangeDetector
+        with GCD._lock:
+            owners_l                                    = [github_owner] if not github_owner is None \
+                                                            else [p.stem for p in Path(GCD.SNAPSHOT_DIR).glob("*.json")]
+            for owner in owners_l:
+                try:
+                    _os.remove(GCD._snapshot_path(owner))
+                except FileNotFoundError:
+                    pass
+
+    def _snapshot_path(github_owner):
+        return GitHub_ChangeDetector.SNAPSHOT_DIR + "/" + github_owner + ".json"
+
+    def _load(github_owner):
+        '''
+        Must be called while holding ``_lock``.
+
+        :return: the saved results of the ``github_owner``, as a dictionary keyed by repo name whose values are
+            dictionaries with the "fingerprint" and the "results".
+        :rtype: dict
+        '''
+        try:
+            with open(GitHub_ChangeDetector._snapshot_path(github_owner), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            # Missing or corrupted snapshots just mean that all repos are treated as changed
+            return {}
+
+    def _save(github_owner, snapshot_dict):
+        '''
+        Must be called while holding ``_lock``.
+        '''
+        path                                            = GitHub_ChangeDetector._snapshot_path(github_owner)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so that readers never see a partially written snapshot
+        tmp_path                                        = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot_dict, file)
+        _os.replace(tmp_path, path)
@@ -1,45 +1,78 @@
-from httpx                                                  import AsyncClient
+import asyncio
+import time
 
 from conway.application.application                         import Application
 from conway.util.secrets                                    import Secrets
 
+from conway_ops.util.github_metrics                         import GitHub_Metrics
+from conway_ops.util.github_rate_limiter                    import GitHub_RateLimiter
+from conway_ops.util.github_request_coalescer               import GitHub_RequestCoalescer
+from conway_ops.util.github_response_cache                  import GitHub_ResponseCache
 from conway_ops.util.github_response_handler                import GitHub_ReponseHandler
+from conway_ops.util.github_retry_policy                    import GitHub_RetryPolicy
+from conway_ops.util.github_session_pool                    import GitHub_SessionPool
 
 class GitHub_Client():
 
     '''
     Asynchronous context manager used to invoke GitHub APIs
 
+    The HTTP connections are not owned by this class: they are borrowed from the process-wide
+    :class:`GitHub_SessionPool`, so that warm keep-alive connections get reused across all
+    :class:`GitHub_Client` instances. For the same reason, the same instance may be entered concurrently
+    by multiple coroutines.
+
+    GET calls are conditional requests backed by the :class:`GitHub_ResponseCache`, unless the cache is bypassed.
+    Identical GET calls are also de-duplicated by the :class:`GitHub_RequestCoalescer`.
+
+    All calls are scheduled by the :class:`GitHub_RateLimiter`, so they get delayed rather than fail when GitHub's
+    rate limits are reached, and transient failures are retried as per the :class:`GitHub_RetryPolicy`.
+    Latency, traffic and retries of each call are recorded in the :class:`GitHub_Metrics`.
+
     :param str github_owner: the GitHub account under which we will be invoking GitHub APIs. May be a user or an
         organization.
+    :param bool use_cache: optional parameter that defaults to True. If False, GET calls made through this 
+        instance bypass the :class:`GitHub_ResponseCache`. Typical use case is for mutating workflows that
+        need to read what they just changed.
     '''
-    def __init__(self, github_owner):
+    def __init__(self, github_owner, use_cache=True):
         self.github_owner                       = github_owner
-        self.async_client                       = None # will be created in enter
+        self.use_cache                          = use_cache
+        self.async_client                       = None # will be borrowed from the pool in enter
 
-        # We need to enforce that this context manager instance is only entered once at a time, since if two
-        # threads enter it at the same time, the second one will reset the pointer to the
-        # self.async_client, leaving a dangling HTTP connection and/or causing problems with resources being closed
-        # by one thread that affects the other thread. 
+        # Counts how many traversals through this context manager are currently open, so that we only
+        # release the borrowed self.async_client when the last of them exits.
         self.reference_counter                  = 0
 
+    # Base URL of the GitHub API. Can be pointed elsewhere with :meth:`configure`, e.g., to a GitHub Enterprise
+    # server or to a local :class:`GitHub_StandInServer` for offline testing and benchmarking.
+    API_URL                                     = "https://api.github.com"
+
+    def configure(api_url=None):
+        '''
+        Changes settings shared by all :class:`GitHub_Client` instances.
+
+        :param str api_url: base URL of the GitHub API, such as "https://api.github.com".
+        '''
+        if not api_url is None:
+            GitHub_Client.API_URL               = api_url.rstrip("/")
+
     async def __aenter__(self):
         '''
         '''
         self.reference_counter                  += 1
-        if self.reference_counter > 1:
-            raise ValueError("Invalid use of the GitHub_Client context manager: you are entering the same context"
-                             + " a second time, before the first traversal through this context has closed.")
-        self.async_client                       = AsyncClient()
+        self.async_client                       = GitHub_SessionPool.session()
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
         '''
         '''
-        await self.async_client.aclose()
         self.reference_counter                  -= 1
+        if self.reference_counter == 0:
+            # We don't close the session, since it belongs to the pool. Just stop using it.
+            self.async_client                   = None
 
-    async def GET(self, parent_context, resource, sub_path):
+    async def GET(self, parent_context, resource, sub_path, use_cache=None, fields=None, use_memo=None):
         '''
         Invokes the "GET" HTTP verb on the GitHub API specified by the parameters.
 
@@ -51,11 +84,32 @@ class GitHub_Client():
         :param str resource: indicates the top resource for the API. For example, "{owner}/repos". 
         :param str sub_path: Indicates the path of a desired sub-resource to get, under the URL for the
             `resource`. Examples: "/commits/master", "/branches", "/pulls" 
+        :param bool use_cache: optional parameter to override, for this call only, whether the 
+            :class:`GitHub_ResponseCache` is used. If None (the default), `self.use_cache` applies.
+        :param dict fields: optional parameter with the only fields of the resource to return, such as
+            :attr:`GitHub_ReponseHandler.COMMIT_FIELDS`. If None (the default), all fields are returned.
+        :param bool use_memo: optional parameter to override, for this call only, whether responses memoized by the
+            :class:`GitHub_RequestCoalescer` may be used. If None (the default), it is the same as `use_cache`.
+            Typical use case is for polling, which needs conditional requests but never memoized responses.
 
-        :return: A Json representation of the resource as given by the GitHub API
+        :return: A Json representation of the resource as given by the GitHub API. It may be shared with
+            other callers that made the same GET call, so it must be treated as read-only.
         :rtype: str
         '''
-        result                                  = await self._http_call(parent_context, "GET", resource=resource, sub_path=sub_path, body={}, )
+        use_cache                               = self.use_cache if use_cache is None else use_cache
+        use_memo                                = use_cache if use_memo is None else use_memo
+
+        # Identical GETs made concurrently (or, within a memo scope, shortly after each other) share one call.
+        # Calls asking for different fields are not identical, since they don't return the same result.
+        key                                     = self._url(resource, sub_path)
+        if not fields is None:
+            key                                 = (key, repr(fields))
+        result                                  = await GitHub_RequestCoalescer.coalesce(
+                                                        key         = key,
+                                                        fetch       = lambda: self._http_call(parent_context, "GET", resource=resource,
+                                                                                              sub_path=sub_path, body={}, use_cache=use_cache,
+                                                                                              fields=fields),
+                                                        use_memo    = use_memo)
         return result
     
     async def POST(self, parent_context, resource, sub_path, body):
@@ -97,6 +151,26 @@ class GitHub_Client():
         result                                  = await self._http_call(parent_context, "PUT", sub_path=sub_path, body=body, resource=resource)
         return result
            
+    async def PATCH(self, parent_context, resource, sub_path, body):
+        '''
+        Invokes the "PATCH" HTTP verb on the Git Hub API to partially update a resource associated to this inspector's repo.
+
+        :param parent_context: the SchedulingContext of a "parent". Typical use case would be that
+            the "parent" is the SchedulingContext of a caller that directly or indirectly led to the call of this
+            method.
+        :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
+
+        :param str resource: indicates the top resource for the API. For example, "{owner}/repos".
+        :param str sub_path: Indicates the path of a desired sub-resource to update, under the URL for the
+            `resource`. Examples: "/git/refs/heads/master" 
+ 
+        :param dict body: JSON object with the fields to update.
+        :return: A Json representation of the resource as given by the GitHub API
+        :rtype: str
+        '''
+        result                                  = await self._http_call(parent_context, "PATCH", sub_path=sub_path, body=body, resource=resource)
+        return result
+           
     async def DELETE(self, parent_context, resource, sub_path):
         '''
         Invokes the "DELETE" HTTP verb on the Git Hub API to update a resource associated to this inspector's repo.
@@ -117,7 +191,84 @@ class GitHub_Client():
         result                                  = await self._http_call(parent_context, "DELETE", sub_path=sub_path, resource=resource)
         return result
         
-    async def _http_call(self, parent_context, method, resource, sub_path, body={}):
+    async def GRAPHQL(self, parent_context, query, variables=None):
+        '''
+        Invokes the GitHub GraphQL API with the given query.
+
+        :param parent_context: the SchedulingContext of a "parent". Typical use case would be that
+            the "parent" is the SchedulingContext of a caller that directly or indirectly led to the call of this
+            method.
+        :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
+
+        :param str query: the GraphQL query document. Only queries are expected, not mutations.
+        :param dict variables: optional values for the variables declared in the `query`.
+        :return: The "data" member of the GraphQL response. If GitHub could only partially answer the query
+            (for example, if one of several repos queried does not exist), the unanswerable fields are None.
+        :rtype: dict
+        '''
+        body                                    = {"query": query, "variables": {} if variables is None else variables}
+        result                                  = await self._http_call(parent_context, "POST", resource="graphql", sub_path="", body=body)
+
+        # GraphQL reports errors in the payload, with a 200 status code, so the response handler won't catch them
+        data                                    = result.get('data')
+        errors                                  = result.get('errors')
+        if data is None:
+            raise ValueError(f"GitHub GraphQL query failed. Errors are: {errors}")
+        return data
+
+    async def GET_paginated(self, parent_context, resource, sub_path, per_page=100, use_cache=None, fields=None):
+        '''
+        Asynchronous generator over all the items of a GitHub list endpoint (such as "/branches" or "/commits"),
+        across all pages. Pages are requested with ``per_page`` items each, following the "next" links
+        of the ``Link`` header returned by GitHub.
+
+        Items are yielded as soon as each page arrives, and the next page is requested in the background while the
+        caller processes the items of the current page.
+
+        :param parent_context: the SchedulingContext of a "parent". Typical use case would be that
+            the "parent" is the SchedulingContext of a caller that directly or indirectly led to the call of this
+            method.
+        :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
+
+        :param str resource: indicates the top resource for the API. For example, "{owner}/repos". 
+        :param str sub_path: Indicates the path of a desired list of sub-resources, under the URL for the
+            `resource`. It may include query parameters. Examples: "/branches", "/commits?sha=master" 
+        :param int per_page: number of items per page. GitHub allows at most 100.
+        :param bool use_cache: optional parameter to override, for this call only, whether the 
+            :class:`GitHub_ResponseCache` is used. If None (the default), `self.use_cache` applies.
+        :param dict fields: optional parameter with the only fields to return for each item, such as
+            :attr:`GitHub_ReponseHandler.BRANCH_FIELDS`. If None (the default), all fields are returned.
+
+        :return: An asynchronous iterator over the Json representation of each item in the list.
+        '''
+        use_cache                               = self.use_cache if use_cache is None else use_cache
+        separator                               = "&" if "?" in sub_path else "?"
+        url                                     = self._url(resource, f"{sub_path}{separator}per_page={per_page}")
+
+        response                                = await self._send(parent_context, "GET", url, body={}, use_cache=use_cache)
+        next_page_task                          = None
+        try:
+            while True:
+                next_link                       = response.links.get("next")
+                if not next_link is None:
+                    next_page_task              = asyncio.create_task(self._send(parent_context, "GET", next_link["url"],
+                                                                                 body={}, use_cache=use_cache))
+
+                data                            = GitHub_ReponseHandler().process(parent_context=parent_context, response=response,
+                                                                                  fields=fields)
+                for item in data if not data is None else []:
+                    yield item
+
+                if next_page_task is None:
+                    break
+                response                        = await next_page_task
+                next_page_task                  = None
+        finally:
+            # If the caller stopped iterating before the last page, don't leave a request dangling
+            if not next_page_task is None:
+                next_page_task.cancel()
+
+    async def _http_call(self, parent_context, method, resource, sub_path, body={}, use_cache=False, fields=None):
         '''
         Invokes the Git Hub API specified by the parameters.
 
@@ -126,17 +277,34 @@ class GitHub_Client():
             method.
         :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
 
-        :param str method: the HTTP verb to use ("GET", "POST", or "PUT")
+        :param str method: the HTTP verb to use ("GET", "POST", "PUT", "PATCH" or "DELETE")
         :param str sub_path: Indicates the path of a desired sub-resource to delete, under the URL for the
             `resource`. Examples: "/commits/master", "/branches", "/pulls" 
         :param str resource: indicates the top resource for the API. For example, "repos". It is an optional
             argument that defaults to "repos" if it is not provided.
         :param dict body: optional payload to submit in the HTTP request. 
+        :param bool use_cache: optional parameter that defaults to False. If True and `method` is "GET", then the
+            call is made as a conditional request and a "304 Not Modified" response is served from the
+            :class:`GitHub_ResponseCache`.
+        :param dict fields: optional parameter with the only fields of the resource to return. If None (the
+            default), all fields are returned.
         :return: A Json representation of the resource as given by the GitHub API
         :rtype: str
         '''
-        GIT_HUB_API                         = f"https://api.github.com"
- 
+        url                                 = self._url(resource, sub_path)
+        response                            = await self._send(parent_context, method, url, body, use_cache)
+        
+        return GitHub_ReponseHandler().process(parent_context=parent_context, response=response, fields=fields)
+
+    def _url(self, resource, sub_path):
+        '''
+        :param str resource: indicates the top resource for the API. For example, "repos".
+        :param str sub_path: Indicates the path of a desired sub-resource under the URL for the `resource`. 
+        :return: the full URL for the GitHub API call determined by the parameters.
+        :rtype: str
+        '''
+        GIT_HUB_API                         = GitHub_Client.API_URL
+
         match resource:
             case "repos" | "orgs" | "users":
                 url                   = f"{GIT_HUB_API}/{resource}/{self.github_owner}{sub_path}"
@@ -146,11 +314,31 @@ class GitHub_Client():
                 #   resource, which can manipulate "other" users different from the currently authenticated user.
                 #   To create/update repos for a user, use the "user" resource, not the "users" resource.
                 url                   = f"{GIT_HUB_API}/user{sub_path}"
+            case "graphql":
+                url                   = f"{GIT_HUB_API}/graphql"
             case "": # Return meta information
                 url                   = f"{GIT_HUB_API}"
             case _:
                 raise ValueError(f"Unsupported GitHub resource '{resource}'")
-            
+        return url
+
+    async def _send(self, parent_context, method, url, body, use_cache):
+        '''
+        Makes the HTTP call to the GitHub API for the given ``url``, and returns the raw response.
+
+        :param parent_context: the SchedulingContext of a "parent". Typical use case would be that
+            the "parent" is the SchedulingContext of a caller that directly or indirectly led to the call of this
+            method.
+        :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
+
+        :param str method: the HTTP verb to use ("GET", "POST", "PUT", "PATCH" or "DELETE")
+        :param str url: the full URL of the GitHub API to call.
+        :param dict body: payload to submit in the HTTP request. 
+        :param bool use_cache: if True and `method` is "GET", then the call is made as a conditional request and a
+            "304 Not Modified" response is replaced by the response saved in the :class:`GitHub_ResponseCache`.
+        :return: the response from GitHub
+        :rtype: httpx.Response
+        '''
         # Uncomment to debug
         #APP.log(f"... calling '{method} {url}'")
         
@@ -168,21 +356,82 @@ class GitHub_Client():
         #
         self._check_readiness()
 
-        # Now that we did our pre-flight check, make the HTTP call
-        try:
-            response                        = await self.async_client.request(   
+        use_cache                           = use_cache and method == "GET" and GitHub_ResponseCache.ENABLED
+        cached_response                     = None
+        if use_cache:
+            cached_response                 = GitHub_ResponseCache.lookup(url, headers)
+            if not cached_response is None:
+                headers.update(cached_response.conditional_headers())
+
+        # Now that we did our pre-flight check, make the HTTP call. The GitHub_RateLimiter decides when the call
+        # can be made, and if GitHub still rate-limits us, we wait as told by GitHub and try again rather than fail.
+        # Transient failures (connection problems, 502s, ...) are retried as allowed by the GitHub_RetryPolicy
+        # for this HTTP verb, or for this kind of GraphQL operation.
+        #
+        budget_resource                     = "graphql" if url.endswith("/graphql") else "core"
+        retry_policy                        = GitHub_RetryPolicy.for_call(method, budget_resource, body)
+        rate_limit_retries                  = 0
+        attempt                             = 0
+        start_time                          = time.monotonic()
+        while True:
+            attempt                         += 1
+            try:
+                async with GitHub_RateLimiter.slot(method, budget_resource):
+                    call_start              = time.monotonic()
+                    try:
+                        response            = await self.async_client.request(   
                                                                 method          = method, 
                                                                 url             = url, 
                                                                 json            = body,
                                                                 headers         = headers, 
                                                                 timeout         = 20) 
-            
+                    except Exception as ex:
+                        GitHub_Metrics.record_call(method, url, type(ex).__name__, time.monotonic() - call_start, 0)
+                        raise
+                    GitHub_Metrics.record_call(method, url, response.status_code, time.monotonic() - call_start,
+                                               len(response.content))
 
-        except Exception as ex:
-            raise ValueError("Problem connecting to Git Hub. Error is: " + str(ex))
-        
-        return GitHub_ReponseHandler().process(parent_context=parent_context, response=response)    
+            except Exception as ex:
+                delay                       = retry_policy.delay_after_exception(ex, attempt, time.monotonic() - start_time)
+                if delay is None:
+                    raise ValueError("Problem connecting to Git Hub. Error is: " + str(ex))
+                GitHub_Metrics.record_retry(method, url)
+                await self._wait_to_retry(parent_context, delay, f"'{method} {url}' failed with '{type(ex).__name__}: {ex}'")
+                continue
+
+            wait_secs                       = GitHub_RateLimiter.observe(response)
+            if not wait_secs is None and rate_limit_retries < GitHub_RateLimiter.MAX_RATE_LIMIT_RETRIES:
+                rate_limit_retries          += 1
+                # Waiting for the rate limit is not a failure, so it does not count as an attempt
+                attempt                     -= 1
+                GitHub_Metrics.record_rate_limit_wait(method, url, wait_secs)
+                await GitHub_RateLimiter.wait(wait_secs, f"'{method} {url}' was rate limited", parent_context)
+                continue
+
+            delay                           = retry_policy.delay_after_response(response, attempt, time.monotonic() - start_time)
+            if delay is None:
+                break
+            GitHub_Metrics.record_retry(method, url)
+            await self._wait_to_retry(parent_context, delay, f"'{method} {url}' returned status {response.status_code}")
 
+        if use_cache:
+            if response.status_code == 304 and not cached_response is None:
+                response                    = cached_response.as_response(response)
+            elif response.status_code == 200:
+                GitHub_ResponseCache.store(url, headers, response)
+
+        return response
+
+    async def _wait_to_retry(self, parent_context, delay, reason):
+        '''
+        Logs the ``reason`` why a GitHub call is going to be retried, and sleeps ``delay`` seconds.
+        '''
+        msg                                 = f"Will retry GitHub call in {delay:.1f} secs because {reason}"
+        if not parent_context is None:
+            Application.app().log(msg, xlabels=parent_context.as_xlabel())
+        else:
+            Application.app().log(msg)
+        await asyncio.sleep(delay)
 
     def _check_readiness(self):
         '''
@@ -194,11 +443,9 @@ class GitHub_Client():
             1.  This class `GitHub_Client` is an async context manager, and callers should only use it that
                 way. So if the caller is making HTTP calls via `GitHub_Client` but using an instance X of it 
                 that is not within an "async with X" statement, then we want to error out.
-            2.  Even if the caller initially made HTTP calls correctly using an instance X of `GitHub_Client`
-                via an `async with X` statement, we want to make sure the caller does not reuse of that instance X
-                outside of that `async with X` statement, since upon exiting the `asycn with X` statement
-                we closed the `self.async_client`, and it will error out with hard to track error message
-                like "ClosedResourceError". By pre-empting such errors via this `_check_readiness` check,
+            2.  If the pooled session was closed (e.g., via :meth:`GitHub_SessionPool.aclose`) while this
+                instance X was still in use, then `self.async_client` will error out with hard to track error
+                message like "ClosedResourceError". By pre-empting such errors via this `_check_readiness` check,
                 we can cause the error to instead be triggered by the Conway code base, making it more obvious
                 to see the caller code base that led to the problem, by inspecting the error's stack trace.
         '''
@@ -207,6 +454,6 @@ class GitHub_Client():
                              + "`asycn with X` statement, where `X` is an instance of `GitHub_Client")
         
         if self.async_client.is_closed:
-            raise ValueError("Invalid reuse of GitHub_Client instance since it is already closed. "
-                             + "This can happen when you reuse a prior GitHub_Client instance outside its "
-                             + "original `async with  ...` statement.")
\ No newline at end of file
+            raise ValueError("Invalid use of GitHub_Client instance since its pooled session is already closed. "
+                             + "This can happen when GitHub_SessionPool.aclose() is called while a "
+                             + "GitHub_Client is still in use.")
\ No newline at end of file
@@ -0,0 +1,204 @@
+import json
+import sqlite3
+import threading
+import time
+
+from pathlib                                                import Path
+
+class GitHub_CommitStore():
+
+    '''
+    Persistent store in the local file system (an SQLite database) of the commits already downloaded from GitHub,
+    keyed by repo and commit hash. It is used by :class:`GitHub_RepoInspector` so that crawls of a repo's history only
+    download the commits that are new since the previous crawl: commits are immutable, so once downloaded they never
+    need to be downloaded again.
+
+    The store only ever contains "closed" histories: a commit is saved together with all its ancestors that were not
+    yet saved, in the same transaction. That way, when a crawl reaches a commit that is already in the store, it knows
+    that the whole history behind that commit is in the store too.
+
+    If a repo's history is rewritten (e.g., by a force-push), commits that are no longer reachable just stay in the
+    store unused. They can be removed with :meth:`invalidate`, and the database can be shrunk with :meth:`compact`.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_CommitStore is a static class and should not be instantiated")
+
+    ENABLED                                             = True
+    DB_PATH                                             = str(Path.home()) + "/.conway_ops/cache/github_commits.sqlite3"
+
+    _initialized_path                                   = None
+    _lock                                               = threading.Lock()
+
+    def configure(db_path=None, enabled=None):
+        '''
+        :param str db_path: path in the local file system of the SQLite database file.
+        :param bool enabled: if False, commits are neither looked up nor saved in the store.
+        '''
+        GCS                                             = GitHub_CommitStore
+        with GCS._lock:
+            if not db_path is None:
+                GCS.DB_PATH                             = db_path
+            if not enabled is None:
+                GCS.ENABLED                             = enabled
+
+    def load(owner, repo_name):
+        '''
+        :param str owner: the GitHub user or organization that owns the repo.
+        :param str repo_name: the name of the repo.
+        :return: all the commits in the store for the repo, as a dictionary of :class:`StoredCommit` objects keyed
+            by commit hash. It is empty if the store is disabled.
+        :rtype: dict
+        '''
+        GCS                                             = GitHub_CommitStore
+        if not GCS.ENABLED:
+            return {}
+        repo_key                                        = f"{owner}/{repo_name}"
+        with GCS._lock, GCS._connect() as connection:
+            commits_dict                                = {}
+            for sha, commit_date, author, message, parents in connection.execute(
+                    "SELECT sha, commit_date, author, message, parents FROM commits WHERE repo = ?", (repo_key,)):
+                commits_dict[sha]                       = StoredCommit(sha, commit_date, author, message, json.loads(parents), [])
+
+            for sha, filename in connection.execute(
+                    "SELECT sha, filename FROM commit_files WHERE repo = ? ORDER BY sha, file_nb", (repo_key,)):
+                commits_dict[sha].files.append(filename)
+
+            connection.execute("UPDATE repos SET last_used = ? WHERE repo = ?", (time.time(), repo_key))
+        return commits_dict
+
+    def save(owner, repo_name, commits_l):
+        '''
+        Saves the ``commits_l`` in one transaction. Callers must include all the ancestors of these commits that
+        are not yet in the store.
+
+        :param str owner: the GitHub user or organization that owns the repo.
+        :param str repo_name: the name of the repo.
+        :param list[StoredCommit] commits_l: the commits to save.
+        '''
+        GCS                                             = GitHub_CommitStore
+        if not GCS.ENABLED or len(commits_l) == 0:
+            return
+        repo_key                                        = f"{owner}/{repo_name}"
+        with GCS._lock, GCS._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?)",
+                                   [(repo_key, c.sha, c.commit_date, c.author, c.message, json.dumps(c.parents))
+                                        for c in commits_l])
+            connection.executemany("INSERT OR REPLACE INTO commit_files VALUES (?, ?, ?, ?)",
+                                   [(repo_key, c.sha, file_nb, filename)
+                                        for c in commits_l for file_nb, filename in enumerate(c.files)])
+            connection.execute("INSERT OR REPLACE INTO repos VALUES (?, ?)", (repo_key, time.time()))
+
+    def invalidate(owner=None, repo_name=None):
+        '''
+        Removes commits from the store, e.g., because a repo's history was rewritten.
+
+        :param str owner: the GitHub user or organization whose repos are to be invalidated. If None, the whole
+            store is invalidated.
+        :param str repo_name: the name of the repo to invalidate. If None, all repos of the ``owner`` are invalidated.
+        '''
+        GCS                                             = GitHub_CommitStore
+        # GOTCHA: match repos exactly rather than with LIKE, for which "_" is a wildcard and case is ignored, so
+        #       that invalidating "my_org" does not also invalidate "myXorg" or "MY_ORG"
+        #
+        if owner is None:
+            condition, params_t                         = "1 = 1", ()
+        elif repo_name is None:
+            prefix                                      = f"{owner}/"
+            condition, params_t                         = "substr(repo, 1, length(?)) = ?", (prefix, prefix)
+        else:
+            condition, params_t                         = "repo = ?", (f"{owner}/{repo_name}",)
+        with GCS._lock, GCS._connect() as connection:
+            for table in ["commits", "commit_files", "repos"]:
+                connection.execute(f"DELETE FROM {table} WHERE {condition}", params_t)
+
+    def compact(max_idle_days=None):
+        '''
+        Shrinks the database file, after optionally removing repos that have not been used for a while.
+
+        :param float max_idle_days: if not None, the commits of repos that have not been crawled for more than
+            these many days are removed first.
+        '''
+        GCS                                             = GitHub_CommitStore
+        with GCS._lock:
+            with GCS._connect() as connection:
+                if not max_idle_days is None:
+                    cutoff                              = time.time() - max_idle_days * 24 * 3600
+                    idle_l                              = [row[0] for row in connection.execute(
+                                                            "SELECT repo FROM repos WHERE last_used < ?", (cutoff,))]
+                    for table in ["commits", "commit_files", "repos"]:
+                        connection.executemany(f"DELETE FROM {table} WHERE repo = ?", [(r,) for r in idle_l])
+            # VACUUM can't run within a transaction, so use a separate connection in autocommit mode
+            connection                                  = sqlite3.connect(GCS.DB_PATH, isolation_level=None)
+            try:
+                connection.execute("VACUUM")
+            finally:
+                connection.close()
+
+    def _connect():
+        '''
+        Must be called while holding ``_lock``.
+
+        :return: a connection to the database, creating the database if needed. When used as a context manager,
+            it commits on success and rolls back on error.
+        :rtype: sqlite3.Connection
+        '''
+        GCS                                             = GitHub_CommitStore
+        if GCS._initialized_path != GCS.DB_PATH:
+            Path(GCS.DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+            connection                                  = sqlite3.connect(GCS.DB_PATH)
+            try:
+                connection.executescript('''
+                    CREATE TABLE IF NOT EXISTS commits (
+                        repo TEXT, sha TEXT, commit_date TEXT, author TEXT, message TEXT, parents TEXT,
+                        PRIMARY KEY (repo, sha));
+                    CREATE TABLE IF NOT EXISTS commit_files (
+                        repo TEXT, sha TEXT, file_nb INTEGER, filename TEXT,
+                        PRIMARY KEY (repo, sha, file_nb));
+                    CREATE TABLE IF NOT EXISTS repos (
+                        repo TEXT PRIMARY KEY, last_used REAL);
+                ''')
+            finally:
+                connection.close()
+            GCS._initialized_path                       = GCS.DB_PATH
+        return _ClosingConnection(GCS.DB_PATH)
+
+class _ClosingConnection():
+    '''
+    Helper context manager around an SQLite connection that, unlike ``sqlite3.Connection``, also closes the
+    connection on exit, besides committing or rolling back.
+    '''
+    def __init__(self, db_path):
+        self.connection                                 = sqlite3.connect(db_path)
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
+
+class StoredCommit():
+    '''
+    Helper data structure with the information about a commit that is kept in the :class:`GitHub_CommitStore`.
+
+    :param str sha: the commit hash.
+    :param str commit_date: the author date of the commit, as given by GitHub.
+    :param str author: the name of the commit's author.
+    :param str message: the commit message.
+    :param list[str] parents: the hashes of the commit's parents.
+    :param list[str] files: the names of the files changed by the commit.
+    '''
+    def __init__(self, sha, commit_date, author, message, parents, files):
+        self.sha                                        = sha
+        self.commit_date                                = commit_date
+        self.author                                     = author
+        self.message                                    = message
+        self.parents                                    = parents
+        self.files                                      = files
@@ -0,0 +1,363 @@
+import asyncio
+import threading
+import time
+
+from conway.application.application                         import Application
+
+from conway_ops.util.github_client                          import GitHub_Client
+
+class GitHub_MergeabilityWaiter():
+
+    '''
+    Waits until GitHub pull requests can be merged, before merging them.
+
+    Right after a pull request is created, GitHub has usually not yet computed whether it is mergeable, and
+    required status checks may still be running. Merging at that point fails, so callers first await
+    :meth:`wait_until_mergeable`, which polls the pull request's status with exponential backoff until it is
+    ready, has failed, or the ``TIMEOUT`` expires. Polls that fail (e.g., because GitHub could not be reached) are
+    treated like polls that found the pull request not ready yet, so they are retried until the ``TIMEOUT``.
+
+    A pull request that is "BLOCKED" may be waiting for required checks to pass, but also for something that
+    waiting won't bring, such as a required review, so it is only waited for up to ``BLOCKED_TIMEOUT``.
+
+    Waits for many pull requests (e.g., across all repos of a bundle) are served by one shared poller per event
+    loop, which checks in each round all the pull requests that are due:
+
+    * If only one pull request is due, it is polled with a REST call. These are conditional requests backed by the
+      :class:`GitHub_ResponseCache`, so a "304 Not Modified" answer does not count against the rate limit.
+
+    * If several are due, they are polled together with one batched GraphQL query per ``BATCH_SIZE`` pull requests
+      of the same owner.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_MergeabilityWaiter is a static class and should not be instantiated")
+
+    ENABLED                                             = True
+    TIMEOUT                                             = 600   # In seconds
+    INITIAL_DELAY                                       = 1.0   # In seconds
+    MAX_DELAY                                           = 30.0  # In seconds
+    BACKOFF_FACTOR                                      = 2.0
+    BLOCKED_TIMEOUT                                     = 120   # In seconds
+
+    # Number of pull requests per GraphQL query
+    BATCH_SIZE                                          = 25
+
+    # Pull requests whose next poll is due within this many seconds are polled together with the ones due now, so
+    # that waits that started at about the same time share their polls
+    BATCH_WINDOW                                        = 0.5   # In seconds
+
+    # Merge states (as per GitHub's GraphQL MergeStateStatus) in which a pull request can be merged. "UNSTABLE"
+    # means that only non-required checks failed.
+    READY_STATES                                        = ["CLEAN", "UNSTABLE", "HAS_HOOKS"]
+
+    # Merge states that waiting will not change, so there is no point in waiting: merge conflicts, drafts, or a
+    # head branch that branch protection requires to be updated first
+    FAILED_STATES                                       = ["DIRTY", "DRAFT", "BEHIND"]
+
+    _pollers_dict                                       = {} # Keys are event loops, values are _Poller objects
+    _lock                                               = threading.Lock()
+
+    def configure(enabled=None, timeout=None, initial_delay=None, max_delay=None, backoff_factor=None,
+                  blocked_timeout=None):
+        '''
+        :param bool enabled: if False, :meth:`wait_until_mergeable` returns right away without polling.
+        :param float timeout: maximum number of seconds to wait for a pull request to become mergeable.
+        :param float initial_delay: seconds between the first and the second poll of a pull request.
+        :param float max_delay: maximum number of seconds between polls of a pull request.
+        :param float backoff_factor: factor by which the delay between polls grows after each poll.
+        :param float blocked_timeout: maximum number of seconds to wait for a pull request that stays "BLOCKED".
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        with GMW._lock:
+            if not enabled is None:
+                GMW.ENABLED                             = enabled
+            if not timeout is None:
+                GMW.TIMEOUT                             = timeout
+            if not initial_delay is None:
+                GMW.INITIAL_DELAY                       = initial_delay
+            if not max_delay is None:
+                GMW.MAX_DELAY                           = max_delay
+            if not backoff_factor is None:
+                GMW.BACKOFF_FACTOR                      = backoff_factor
+            if not blocked_timeout is None:
+                GMW.BLOCKED_TIMEOUT                     = blocked_timeout
+
+    async def wait_until_mergeable(parent_context, github_owner, repo_name, pull_number):
+        '''
+        Waits until a pull request can be merged. If it can't, or if it is still not known after ``TIMEOUT``
+        seconds (or it stayed "BLOCKED" for ``BLOCKED_TIMEOUT`` seconds), it raises an exception.
+
+        :param parent_context: the SchedulingContext of the caller.
+        :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
+
+        :param str github_owner: the GitHub user or organization that owns the repo.
+        :param str repo_name: the name of the repo.
+        :param int pull_number: the number of the pull request.
+        :return: the merge state of the pull request, such as "CLEAN", or None if waiting is disabled.
+        :rtype: str
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        if not GMW.ENABLED:
+            return None
+
+        waiter                                          = _PullRequestWaiter(github_owner, repo_name, pull_number,
+                                                                             asyncio.get_running_loop().create_future())
+        GMW._poller_for_running_loop().add(waiter)
+        merge_state                                     = await waiter.future
+
+        Application.app().log(f"{repo_name}: PR #{pull_number} is mergeable ({merge_state}) after "
+                              + f"{waiter.polls} poll(s) in {round(time.monotonic() - waiter.start, 1)} secs",
+                              xlabels=parent_context.as_xlabel())
+        return merge_state
+
+    def classify(state, mergeable, merge_state):
+        '''
+        :param str state: the state of the pull request, such as "OPEN" or "MERGED".
+        :param str mergeable: one of "MERGEABLE", "CONFLICTING" or "UNKNOWN".
+        :param str merge_state: the merge state of the pull request, such as "CLEAN" or "BLOCKED".
+        :return: "ready" if the pull request can be merged now, "failed" if waiting will not make it mergeable,
+            and "pending" otherwise.
+        :rtype: str
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        if state != "OPEN" or mergeable == "CONFLICTING" or merge_state in GMW.FAILED_STATES:
+            return "failed"
+        if mergeable == "MERGEABLE" and merge_state in GMW.READY_STATES:
+            return "ready"
+        # GitHub has not yet computed mergeability, or required checks may still be running ("BLOCKED"). The
+        # latter is only waited for up to BLOCKED_TIMEOUT (see _PullRequestWaiter.update)
+        return "pending"
+
+    async def poll(github_owner, pull_requests_l):
+        '''
+        Gets the current status of several pull requests of the same owner.
+
+        :param str github_owner: the GitHub user or organization that owns the repos.
+        :param list[tuple] pull_requests_l: pairs (repo name, pull request number).
+        :return: A dictionary whose keys are the pairs in ``pull_requests_l``, and whose values are triples
+            (state, mergeable, merge state) as explained in :meth:`classify`. Values are None for pull requests
+            that don't exist.
+        :rtype: dict
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        result_dict                                     = {}
+        async with GitHub_Client(github_owner = github_owner) as ctx:
+            if len(pull_requests_l) == 1:
+                repo_name, pull_number                  = pull_requests_l[0]
+                result_dict[pull_requests_l[0]]         = await GMW._poll_one(ctx, repo_name, pull_number)
+            else:
+                for start in range(0, len(pull_requests_l), GMW.BATCH_SIZE):
+                    result_dict.update(await GMW._poll_batch(ctx, pull_requests_l[start:start + GMW.BATCH_SIZE]))
+        return result_dict
+
+    async def _poll_one(ctx, repo_name, pull_number):
+        '''
+        Polls one pull request with a conditional REST call, converting the REST values to their GraphQL
+        counterparts.
+        '''
+        # GOTCHA: memoized responses must not be used, or we would keep seeing the same status
+        data                                            = await ctx.GET(
+                                                                parent_context  = None,
+                                                                resource        = "repos",
+                                                                sub_path        = f"/{repo_name}/pulls/{pull_number}",
+                                                                use_cache       = True,
+                                                                use_memo        = False,
+                                                                fields          = {"state": None, "merged": None,
+                                                                                   "mergeable": None,
+                                                                                   "mergeable_state": None})
+        if data.get("merged"):
+            state                                       = "MERGED"
+        else:
+            state                                       = data["state"].upper()
+        mergeable                                       = {True: "MERGEABLE", False: "CONFLICTING"}.get(data["mergeable"],
+                                                                                                        "UNKNOWN")
+        return state, mergeable, (data["mergeable_state"] or "unknown").upper()
+
+    async def _poll_batch(ctx, pull_requests_l):
+        '''
+        Polls several pull requests of the same owner with one GraphQL call.
+        '''
+        # We build a query with one aliased "repository" field per pull request, such as
+        #
+        #       p0: repository(owner: $owner, name: $n0) { pullRequest(number: $pr0) { state mergeable mergeStateStatus } }
+        #
+        variables                                       = {"owner": ctx.github_owner}
+        declarations_l                                  = ["$owner: String!"]
+        fields_l                                        = []
+        for idx, (repo_name, pull_number) in enumerate(pull_requests_l):
+            variables.update({f"n{idx}": repo_name, f"pr{idx}": int(pull_number)})
+            declarations_l.extend([f"$n{idx}: String!", f"$pr{idx}: Int!"])
+            fields_l.append(f"p{idx}: repository(owner: $owner, name: $n{idx}) "
+                            + f"{{ pullRequest(number: $pr{idx}) {{ state mergeable mergeStateStatus }} }}")
+
+        query                                           = "query(" + ", ".join(declarations_l) + ") {\n  " \
+                                                            + "\n  ".join(fields_l) + "\n}\n"
+
+        data                                            = await ctx.GRAPHQL(parent_context=None, query=query, variables=variables)
+
+        result_dict                                     = {}
+        for idx, pull_request in enumerate(pull_requests_l):
+            repo_data                                   = data.get(f"p{idx}")
+            if repo_data is None or repo_data["pullRequest"] is None:
+                result_dict[pull_request]               = None
+            else:
+                pr_data                                 = repo_data["pullRequest"]
+                result_dict[pull_request]               = (pr_data["state"], pr_data["mergeable"], pr_data["mergeStateStatus"])
+        return result_dict
+
+    def _poller_for_running_loop():
+        '''
+        :return: the poller for the running event loop. Pollers are kept per event loop since asyncio Futures
+            can't be awaited from other event loops.
+        :rtype: _Poller
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        loop                                            = asyncio.get_running_loop()
+        with GMW._lock:
+            for stale_loop in [l for l in GMW._pollers_dict.keys() if l.is_closed()]:
+                del GMW._pollers_dict[stale_loop]
+            poller                                      = GMW._pollers_dict.get(loop)
+            if poller is None:
+                poller                                  = _Poller()
+                GMW._pollers_dict[loop]                 = poller
+            return poller
+
+class _Poller():
+    '''
+    Helper class that polls, in a background task, all the pull requests being waited for in an event loop.
+    The task ends when there is nothing left to wait for, and is started again when needed.
+    '''
+    def __init__(self):
+        self.waiters_l                                  = []
+        self.wake_up                                    = asyncio.Event()
+        self.task                                       = None
+
+    def add(self, waiter):
+        self.waiters_l.append(waiter)
+        self.wake_up.set()
+        if self.task is None or self.task.done():
+            self.task                                   = asyncio.create_task(self._run())
+
+    async def _run(self):
+        GMW                                             = GitHub_MergeabilityWaiter
+        while True:
+            # Waiters whose caller was cancelled are just dropped
+            self.waiters_l                              = [w for w in self.waiters_l if not w.future.done()]
+            if len(self.waiters_l) == 0:
+                return
+            now                                         = time.monotonic()
+            if min(w.next_poll for w in self.waiters_l) > now:
+                # Sleep until the next poll is due, or until a new waiter arrives
+                self.wake_up.clear()
+                try:
+                    await asyncio.wait_for(self.wake_up.wait(), min(w.next_poll for w in self.waiters_l) - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due_l                                       = [w for w in self.waiters_l if w.next_poll <= now + GMW.BATCH_WINDOW]
+            by_owner_dict                               = {}
+            for waiter in due_l:
+                by_owner_dict.setdefault(waiter.github_owner, []).append(waiter)
+
+            for github_owner, owner_waiters_l in by_owner_dict.items():
+                try:
+                    status_dict                         = await GMW.poll(github_owner,
+                                                                         [(w.repo_name, w.pull_number) for w in owner_waiters_l])
+                except Exception as ex:
+                    # GOTCHA: a failed poll says nothing about the pull requests, so don't fail the waits but poll
+                    #       again later, like for pull requests that are not ready yet. A wait only fails if its
+                    #       deadline comes before a poll succeeds.
+                    Application.app().log(f"Polling {len(owner_waiters_l)} PR(s) of '{github_owner}' failed, so "
+                                          + f"will poll again later. Error is: {ex}")
+                    for waiter in owner_waiters_l:
+                        waiter.poll_failed(ex)
+                    continue
+
+                for waiter in owner_waiters_l:
+                    waiter.update(status_dict[(waiter.repo_name, waiter.pull_number)])
+
+class _PullRequestWaiter():
+    '''
+    Helper data structure for the :class:`GitHub_MergeabilityWaiter`, with the polling state of one pull request.
+    '''
+    def __init__(self, github_owner, repo_name, pull_number, future):
+        GMW                                             = GitHub_MergeabilityWaiter
+        self.github_owner                               = github_owner
+        self.repo_name                                  = repo_name
+        self.pull_number                                = pull_number
+        self.future                                     = future
+        self.start                                      = time.monotonic()
+        self.deadline                                   = self.start + GMW.TIMEOUT
+        self.next_poll                                  = self.start
+        self.delay                                      = GMW.INITIAL_DELAY
+        self.polls                                      = 0
+        self.blocked_since                              = None
+
+    def update(self, status):
+        '''
+        Processes the result of a poll, and schedules the next poll if needed.
+
+        :param tuple status: triple (state, mergeable, merge state), or None if the pull request does not exist.
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        if self.future.done():
+            return
+        self.polls                                      += 1
+        description                                     = f"{self.repo_name}: PR #{self.pull_number}"
+        if status is None:
+            self.fail(ValueError(f"{description} does not exist"))
+            return
+
+        state, mergeable, merge_state                   = status
+        outcome                                         = GMW.classify(state, mergeable, merge_state)
+        now                                             = time.monotonic()
+        if merge_state == "BLOCKED":
+            self.blocked_since                          = now if self.blocked_since is None else self.blocked_since
+        else:
+            self.blocked_since                          = None
+
+        if outcome == "ready":
+            self.future.set_result(merge_state)
+        elif outcome == "failed":
+            self.fail(ValueError(f"{description} can't be merged: state is {state}, mergeable is {mergeable}, "
+                                 + f"merge state is {merge_state}"))
+        elif now >= self.deadline:
+            self.fail(ValueError(f"{description} is still not mergeable after {GMW.TIMEOUT} secs: "
+                                 + f"mergeable is {mergeable}, merge state is {merge_state}"))
+        elif not self.blocked_since is None and now >= self.blocked_since + GMW.BLOCKED_TIMEOUT:
+            self.fail(ValueError(f"{description} can't be merged: it is still blocked after {GMW.BLOCKED_TIMEOUT} "
+                                 + "secs, e.g., because it lacks required reviews or required checks failed"))
+        else:
+            self._schedule_next_poll()
+
+    def poll_failed(self, ex):
+        '''
+        Processes a poll that failed, scheduling the next poll unless the deadline has passed.
+
+        :param Exception ex: the reason why the poll failed.
+        '''
+        GMW                                             = GitHub_MergeabilityWaiter
+        if self.future.done():
+            return
+        self.polls                                      += 1
+        if time.monotonic() >= self.deadline:
+            self.fail(ValueError(f"{self.repo_name}: PR #{self.pull_number} could not be polled successfully within "
+                                 + f"{GMW.TIMEOUT} secs. Last error is: {ex}"))
+        else:
+            self._schedule_next_poll()
+
+    def _schedule_next_poll(self):
+        GMW                                             = GitHub_MergeabilityWaiter
+        # The last poll is at the deadline (or when blocked for too long)
+        last_poll                                       = self.deadline
+        if not self.blocked_since is None:
+            last_poll                                   = min(last_poll, self.blocked_since + GMW.BLOCKED_TIMEOUT)
+        self.next_poll                                  = min(time.monotonic() + self.delay, last_poll)
+        self.delay                                      = min(self.delay * GMW.BACKOFF_FACTOR, GMW.MAX_DELAY)
+
+    def fail(self, ex):
+        if not self.future.done():
+            self.future.set_exception(ex)
@@ -0,0 +1,201 @@
+import re
+import threading
+
+from urllib.parse                                           import urlsplit
+
+import pandas                                               as _pd
+
+class GitHub_Metrics():
+
+    '''
+    Process-wide record of how much time and traffic goes into each kind of GitHub call made by
+    :class:`GitHub_Client`, to help spot slow endpoints (such as per-commit fetches) and track regressions.
+
+    Calls are aggregated per HTTP verb and endpoint template, i.e., the URL path with the variable parts replaced
+    by placeholders. For example, "GET /repos/my-org/my-repo/commits/7f3a...e1" is recorded under
+    "GET /repos/{owner}/{repo}/commits/{sha}".
+
+    For each endpoint template it records the number of calls, a latency histogram, the bytes received, the counts
+    per HTTP status, the number of retries, and the number and duration of waits caused by rate limits.
+
+    Metrics can be queried in-process with :meth:`snapshot` or as a table with :meth:`summary_df`.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_Metrics is a static class and should not be instantiated")
+
+    # Upper bounds, in seconds, of the buckets of the latency histograms. The last bucket is unbounded.
+    LATENCY_BUCKETS                                     = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+    _endpoints_dict                                     = {} # Keys are (method, template) pairs
+    _lock                                               = threading.Lock()
+
+    def endpoint_template(url):
+        '''
+        :param str url: URL of a GitHub API call.
+        :return: the path of the ``url`` with the variable parts replaced by placeholders, like
+            "/repos/{owner}/{repo}/pulls/{n}"
+        :rtype: str
+        '''
+        tokens_l                                        = urlsplit(url).path.strip("/").split("/")
+        if len(tokens_l) >= 1 and tokens_l[0] in ["repos", "orgs", "users"] and len(tokens_l) >= 2:
+            tokens_l[1]                                 = "{owner}"
+            if tokens_l[0] == "repos" and len(tokens_l) >= 3:
+                tokens_l[2]                             = "{repo}"
+
+        template_l                                      = tokens_l[:3]
+        for token in tokens_l[3:]:
+            if re.fullmatch(r"[0-9a-f]{40}", token):
+                template_l.append("{sha}")
+            elif token.isdigit():
+                template_l.append("{n}")
+            elif len(template_l) >= 4 and template_l[3] in ["commits", "compare", "git"] and not token in ["refs", "heads"]:
+                # Branch names, tags and "base...head" comparisons
+                template_l.append("{ref}")
+            else:
+                template_l.append(token)
+        return "/" + "/".join(template_l)
+
+    def record_call(method, url, status, secs, nbytes):
+        '''
+        Records one attempt of a GitHub call.
+
+        :param str method: the HTTP verb of the call.
+        :param str url: the URL of the call.
+        :param status: the HTTP status of the response, or the name of the exception raised if there was no response.
+        :param float secs: duration of the call, in seconds.
+        :param int nbytes: number of bytes received.
+        '''
+        GM                                              = GitHub_Metrics
+        with GM._lock:
+            metrics                                     = GM._metrics_for(method, url)
+            metrics.calls                               += 1
+            metrics.total_secs                          += secs
+            metrics.max_secs                            = max(metrics.max_secs, secs)
+            metrics.bytes_received                      += nbytes
+            metrics.statuses_dict[status]               = metrics.statuses_dict.get(status, 0) + 1
+
+            bucket_idx                                  = len(GM.LATENCY_BUCKETS)
+            for idx, upper_bound in enumerate(GM.LATENCY_BUCKETS):
+                if secs <= upper_bound:
+                    bucket_idx                          = idx
+                    break
+            metrics.histogram_l[bucket_idx]             += 1
+
+    def record_retry(method, url):
+        '''
+        Records that a GitHub call is being retried because of a transient failure.
+        '''
+        with GitHub_Metrics._lock:
+            GitHub_Metrics._metrics_for(method, url).retries += 1
+
+    def record_rate_limit_wait(method, url, secs):
+        '''
+        Records that a GitHub call had to wait ``secs`` seconds because of a rate limit.
+        '''
+        with GitHub_Metrics._lock:
+            metrics                                     = GitHub_Metrics._metrics_for(method, url)
+            metrics.rate_limit_waits                    += 1
+            metrics.rate_limit_wait_secs                += secs
+
+    def snapshot():
+        '''
+        :return: a dictionary whose keys are strings like "GET /repos/{owner}/{repo}/branches", and whose values are
+            dictionaries with the metrics for that endpoint template. The latency histogram is given under the
+            "latency_histogram" key, as a dictionary of call counts keyed by the bucket's upper bound in seconds
+            (None for the unbounded bucket).
+        :rtype: dict
+        '''
+        GM                                              = GitHub_Metrics
+        result_dict                                     = {}
+        with GM._lock:
+            for (method, template), metrics in GM._endpoints_dict.items():
+                result_dict[f"{method} {template}"]     = metrics.as_dict()
+        return result_dict
+
+    def summary_df():
+        '''
+        :return: a table with one row per endpoint template, sorted by total time spent, descending.
+            Latency percentiles are approximated by the upper bound of the histogram bucket they fall in.
+        :rtype: pandas.DataFrame
+        '''
+        GM                                              = GitHub_Metrics
+        rows_l                                          = []
+        with GM._lock:
+            for (method, template), metrics in GM._endpoints_dict.items():
+                rows_l.append([method, template, metrics.calls, round(metrics.total_secs, 3),
+                               round(1000 * metrics.total_secs / metrics.calls, 1) if metrics.calls > 0 else None,
+                               metrics.percentile(0.5), metrics.percentile(0.9), metrics.percentile(0.99),
+                               round(1000 * metrics.max_secs, 1), metrics.bytes_received,
+                               ", ".join(f"{s}: {c}" for s, c in sorted(metrics.statuses_dict.items(), key=lambda x: str(x[0]))),
+                               metrics.retries, metrics.rate_limit_waits, round(metrics.rate_limit_wait_secs, 1)])
+
+        columns                                         = ["Method", "Endpoint", "Calls", "Total secs", "Mean ms",
+                                                           "p50 secs <=", "p90 secs <=", "p99 secs <=", "Max ms",
+                                                           "Bytes received", "Statuses", "Retries",
+                                                           "Rate limit waits", "Rate limit wait secs"]
+        summary_df                                      = _pd.DataFrame(data=rows_l, columns=columns)
+        return summary_df.sort_values(by="Total secs", ascending=False, ignore_index=True)
+
+    def reset():
+        '''
+        Discards all metrics recorded so far.
+        '''
+        with GitHub_Metrics._lock:
+            GitHub_Metrics._endpoints_dict              = {}
+
+    def _metrics_for(method, url):
+        '''
+        Must be called while holding ``_lock``.
+        '''
+        GM                                              = GitHub_Metrics
+        key                                             = (method, GM.endpoint_template(url))
+        metrics                                         = GM._endpoints_dict.get(key)
+        if metrics is None:
+            metrics                                     = _EndpointMetrics(len(GM.LATENCY_BUCKETS) + 1)
+            GM._endpoints_dict[key]                     = metrics
+        return metrics
+
+class _EndpointMetrics():
+    '''
+    Helper data structure with the :class:`GitHub_Metrics` for one endpoint template.
+    '''
+    def __init__(self, nb_buckets):
+        self.calls                                      = 0
+        self.total_secs                                 = 0.0
+        self.max_secs                                   = 0.0
+        self.bytes_received                             = 0
+        self.statuses_dict                              = {}
+        self.histogram_l                                = [0] * nb_buckets
+        self.retries                                    = 0
+        self.rate_limit_waits                           = 0
+        self.rate_limit_wait_secs                       = 0.0
+
+    def percentile(self, fraction):
+        '''
+        :return: the upper bound of the histogram bucket in which the given ``fraction`` of calls falls, or None
+            if it falls in the unbounded bucket or there are no calls.
+        :rtype: float
+        '''
+        if self.calls == 0:
+            return None
+        threshold                                       = fraction * self.calls
+        cumulative                                      = 0
+        for idx, count in enumerate(self.histogram_l):
+            cumulative                                  += count
+            if cumulative >= threshold:
+                return GitHub_Metrics.LATENCY_BUCKETS[idx] if idx < len(GitHub_Metrics.LATENCY_BUCKETS) else None
+        return None
+
+    def as_dict(self):
+        bounds_l                                        = GitHub_Metrics.LATENCY_BUCKETS + [None]
+        return {"calls":                    self.calls,
+                "total_secs":               self.total_secs,
+                "max_secs":                 self.max_secs,
+                "bytes_received":           self.bytes_received,
+                "statuses":                 dict(self.statuses_dict),
+                "latency_histogram":        dict(zip(bounds_l, self.histogram_l)),
+                "retries":                  self.retries,
+                "rate_limit_waits":         self.rate_limit_waits,
+                "rate_limit_wait_secs":     self.rate_limit_wait_secs}
@@ -0,0 +1,177 @@
+import asyncio
+import os                                                   as _os
+import shutil
+import threading
+import time
+
+from pathlib                                                import Path
+
+from conway.application.application                         import Application
+
+from conway_ops.util.git_local_client                       import GitLocalClient
+
+class GitHub_MirrorCache():
+
+    '''
+    Keeps bare mirrors of GitHub repos in the local file system, so that read-only queries about those repos (such
+    as their branches, last commit or history) can be answered with local GIT commands at local disk speed instead
+    of with many GitHub API calls. It is used by the :class:`GitHub_MirrorRepoInspector`.
+
+    Mirrors live under ``CACHE_DIR`` as ``{owner}/{repo}.git``. Each is a bare clone with all the branches of the
+    GitHub repo (pull request refs are not fetched), and is refreshed with one ``git fetch`` when it is older than
+    ``MAX_AGE`` seconds. Refreshes of different repos run in parallel, up to ``MAX_CONCURRENT_FETCHES`` at a time,
+    and concurrent refreshes of the same repo share one fetch.
+
+    Mirrors are not used unless the cache is enabled with :meth:`configure`.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_MirrorCache is a static class and should not be instantiated")
+
+    ENABLED                                             = False
+    CACHE_DIR                                           = str(Path.home()) + "/.conway_ops/cache/github_mirrors"
+    MAX_AGE                                             = 60    # In seconds
+    MAX_CONCURRENT_FETCHES                              = 8
+
+    # File touched in a mirror after each successful clone or fetch, whose modification time tells how fresh
+    # the mirror is
+    REFRESH_MARKER                                      = "conway_ops_refreshed"
+
+    _loop_state_dict                                    = {} # Keys are event loops, values are _MirrorLoopState objects
+    _lock                                               = threading.Lock()
+
+    def configure(enabled=None, cache_dir=None, max_age=None, max_concurrent_fetches=None):
+        '''
+        :param bool enabled: if True, the :class:`RepoInspectorFactory` answers read-only queries about GitHub
+            repos from mirrors in this cache.
+        :param str cache_dir: folder in the local file system under which to keep the mirrors.
+        :param float max_age: number of seconds after which a mirror is refreshed before being used.
+        :param int max_concurrent_fetches: maximum number of mirrors that are cloned or fetched at the same time.
+        '''
+        GMC                                             = GitHub_MirrorCache
+        with GMC._lock:
+            if not enabled is None:
+                GMC.ENABLED                             = enabled
+            if not cache_dir is None:
+                GMC.CACHE_DIR                           = cache_dir
+            if not max_age is None:
+                GMC.MAX_AGE                             = max_age
+            if not max_concurrent_fetches is None:
+                GMC.MAX_CONCURRENT_FETCHES              = max_concurrent_fetches
+                GMC._loop_state_dict                    = {}
+
+    def mirror_path(github_owner, repo_name):
+        '''
+        :return: the location in the local file system of the mirror of a repo.
+        :rtype: str
+        '''
+        return f"{GitHub_MirrorCache.CACHE_DIR}/{github_owner}/{repo_name}.git"
+
+    async def refresh(parent_url, github_owner, repo_name, force=False):
+        '''
+        Clones the mirror of a repo if it does not exist yet, or fetches into it if it is older than ``MAX_AGE``.
+
+        :param str parent_url: the URL of the GitHub user or organization under which the repo lives, such as
+            "https://alejandro-fin@github.com/alejandro-fin"
+        :param str github_owner: the GitHub user or organization that owns the repo.
+        :param str repo_name: the name of the repo.
+        :param bool force: if True, the mirror is refreshed even if it is not older than ``MAX_AGE``.
+        :return: the location in the local file system of the mirror.
+        :rtype: str
+        '''
+        GMC                                             = GitHub_MirrorCache
+        path                                            = GMC.mirror_path(github_owner, repo_name)
+        if not force and GMC._age(path) < GMC.MAX_AGE:
+            return path
+
+        loop_state                                      = GMC._state_for_running_loop()
+        task                                            = loop_state.refreshes_dict.get(path)
+        if task is None:
+            remote_url                                  = parent_url.strip("/").strip() + "/" + repo_name + ".git"
+            task                                        = asyncio.create_task(GMC._refresh(loop_state, remote_url, path))
+            loop_state.refreshes_dict[path]             = task
+            task.add_done_callback(lambda t: loop_state.refreshes_dict.pop(path, None))
+
+        # Shield the shared refresh, so that if this caller is cancelled, the other callers awaiting it are not
+        await asyncio.shield(task)
+        return path
+
+    async def refresh_all(parent_url, github_owner, repo_names, force=False):
+        '''
+        Refreshes the mirrors of several repos in parallel. See :meth:`refresh`.
+
+        :param list[str] repo_names: the names of the repos.
+        '''
+        await asyncio.gather(*[GitHub_MirrorCache.refresh(parent_url, github_owner, repo_name, force)
+                                for repo_name in repo_names])
+
+    def mark_stale(github_owner, repo_name):
+        '''
+        Makes the next use of the mirror of a repo refresh it first, e.g., because the GitHub repo was just changed
+        through the GitHub API.
+        '''
+        try:
+            _os.remove(GitHub_MirrorCache.mirror_path(github_owner, repo_name) + "/" + GitHub_MirrorCache.REFRESH_MARKER)
+        except FileNotFoundError:
+            pass
+
+    def _age(path):
+        '''
+        :return: the number of seconds since the mirror at ``path`` was last refreshed, or infinity if it does not exist.
+        :rtype: float
+        '''
+        try:
+            return time.time() - _os.stat(path + "/" + GitHub_MirrorCache.REFRESH_MARKER).st_mtime
+        except FileNotFoundError:
+            return float("inf")
+
+    async def _refresh(loop_state, remote_url, path):
+        GMC                                             = GitHub_MirrorCache
+        async with loop_state.semaphore:
+            start                                       = time.monotonic()
+            if Path(path).exists():
+                executor                                = GitLocalClient(path)
+                await executor.execute(command = "git fetch --prune --quiet origin")
+            else:
+                # Clone into a temporary folder first, so that a failed clone never leaves a partial mirror behind
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                tmp_path                                = f"{path}.{_os.getpid()}.tmp"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                executor                                = GitLocalClient(str(Path(path).parent))
+                await executor.execute(command = f'git clone --bare --quiet "{remote_url}" "{Path(tmp_path).name}"')
+
+                executor                                = GitLocalClient(tmp_path)
+                await executor.execute(command = 'git config remote.origin.fetch "+refs/heads/*:refs/heads/*"')
+                # Queries on mirrors are about master, like those answered with the GitHub API
+                await executor.execute(command = "git symbolic-ref HEAD refs/heads/master")
+                _os.replace(tmp_path, path)
+
+            Path(path, GMC.REFRESH_MARKER).touch()
+            Application.app().log(f"Refreshed mirror '{path}' in {round(time.monotonic() - start, 2)} secs")
+
+    def _state_for_running_loop():
+        '''
+        :return: the semaphore and refreshes in progress for the running event loop. They are kept per event loop
+            since asyncio primitives can't be shared across event loops.
+        :rtype: _MirrorLoopState
+        '''
+        GMC                                             = GitHub_MirrorCache
+        loop                                            = asyncio.get_running_loop()
+        with GMC._lock:
+            for stale_loop in [l for l in GMC._loop_state_dict.keys() if l.is_closed()]:
+                del GMC._loop_state_dict[stale_loop]
+
+            loop_state                                  = GMC._loop_state_dict.get(loop)
+            if loop_state is None:
+                loop_state                              = _MirrorLoopState(GMC.MAX_CONCURRENT_FETCHES)
+                GMC._loop_state_dict[loop]              = loop_state
+        return loop_state
+
+class _MirrorLoopState():
+    '''
+    Helper data structure with the :class:`GitHub_MirrorCache` state that is specific to one event loop.
+    '''
+    def __init__(self, max_concurrent_fetches):
+        self.semaphore                                  = asyncio.Semaphore(max_concurrent_fetches)
+        self.refreshes_dict                             = {} # Keys are mirror paths, values are Tasks
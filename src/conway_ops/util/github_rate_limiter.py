@@ -0,0 +1,254 @@
+import asyncio
+import threading
+import time
+
+from contextlib                                             import asynccontextmanager
+
+from conway.application.application                         import Application
+
+class GitHub_RateLimiter():
+
+    '''
+    Process-wide scheduler used by :class:`GitHub_Client` to stay within GitHub's rate limits.
+
+    It works as follows:
+
+    * It tracks the remaining budget of API calls from the ``X-RateLimit-*`` headers of every response, per
+      GitHub rate limit resource (e.g., "core" for REST calls, "graphql" for GraphQL calls).
+
+    * It throttles concurrency, with a separate (and much lower) cap for mutating calls such as creating or merging
+      pull requests, since GitHub's secondary rate limits penalize bursts of concurrent mutations. It also spaces out
+      mutating calls by at least ``MIN_MUTATION_INTERVAL`` seconds, as recommended by GitHub.
+
+    * When the budget is nearly exhausted, calls are delayed until the budget resets, instead of failing.
+
+    * When GitHub does answer with a rate limit error (primary or secondary), it tells :class:`GitHub_Client` how
+      long to wait before trying again, honoring the ``Retry-After`` header.
+
+    The current budget and queue depth can be inspected with :meth:`status`, so operators can see why a run is
+    slowing down.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_RateLimiter is a static class and should not be instantiated")
+
+    MAX_CONCURRENT_CALLS                                = 20
+    MAX_CONCURRENT_MUTATIONS                            = 2
+    MIN_MUTATION_INTERVAL                               = 1.0   # In seconds
+
+    # When the remaining budget gets to this level, calls are delayed until the budget resets
+    BUDGET_RESERVE                                      = 10
+
+    # Used when GitHub signals a secondary rate limit without telling us how long to wait
+    DEFAULT_RATE_LIMIT_WAIT                             = 60    # In seconds
+
+    MAX_RATE_LIMIT_RETRIES                              = 3
+
+    MUTATING_METHODS                                    = ["POST", "PUT", "PATCH", "DELETE"]
+
+    _budgets_dict                                       = {} # Keys are GitHub rate limit resources, like "core"
+    _loop_state_dict                                    = {} # Keys are event loops, values are _LoopState objects
+    _queue_depth                                        = 0
+    _in_flight                                          = 0
+    _total_wait_secs                                    = 0.0
+    _lock                                               = threading.Lock()
+
+    def configure(max_concurrent_calls=None, max_concurrent_mutations=None, min_mutation_interval=None,
+                  budget_reserve=None):
+        '''
+        Changes the throttling settings. Concurrency caps only apply to event loops started after this call.
+
+        :param int max_concurrent_calls: maximum number of GitHub calls in flight at any time.
+        :param int max_concurrent_mutations: maximum number of mutating calls (POST, PUT, PATCH, DELETE) in flight.
+        :param float min_mutation_interval: minimum number of seconds between the start of two mutating calls.
+        :param int budget_reserve: remaining budget at which calls start being delayed until the budget resets.
+        '''
+        GRL                                             = GitHub_RateLimiter
+        if not max_concurrent_calls is None:
+            GRL.MAX_CONCURRENT_CALLS                    = max_concurrent_calls
+        if not max_concurrent_mutations is None:
+            GRL.MAX_CONCURRENT_MUTATIONS                = max_concurrent_mutations
+        if not min_mutation_interval is None:
+            GRL.MIN_MUTATION_INTERVAL                   = min_mutation_interval
+        if not budget_reserve is None:
+            GRL.BUDGET_RESERVE                          = budget_reserve
+
+    def status():
+        '''
+        :return: a snapshot of the scheduler's state, with these keys:
+
+            * "budgets": for each GitHub rate limit resource, a dictionary with the "limit", "remaining" and
+              "reset" (as epoch seconds) last reported by GitHub.
+            * "queue_depth": number of calls waiting for their turn.
+            * "in_flight": number of calls currently being made.
+            * "total_wait_secs": cumulative seconds that calls have been delayed because of rate limits.
+        :rtype: dict
+        '''
+        GRL                                             = GitHub_RateLimiter
+        with GRL._lock:
+            return {"budgets":          {resource: dict(budget) for resource, budget in GRL._budgets_dict.items()},
+                    "queue_depth":      GRL._queue_depth,
+                    "in_flight":        GRL._in_flight,
+                    "total_wait_secs":  GRL._total_wait_secs}
+
+    @asynccontextmanager
+    async def slot(method, budget_resource="core"):
+        '''
+        Asynchronous context manager that must wrap each HTTP call to GitHub. It waits until the call may proceed
+        without exceeding the concurrency caps or the rate limit budget.
+
+        :param str method: the HTTP verb of the call about to be made.
+        :param str budget_resource: the GitHub rate limit resource that the call will count against.
+        '''
+        GRL                                             = GitHub_RateLimiter
+        loop_state                                      = GRL._state_for_running_loop()
+        # GraphQL calls are all POSTs, but we only use GraphQL for queries, so they are not treated as mutations
+        is_mutation                                     = method in GRL.MUTATING_METHODS and budget_resource != "graphql"
+
+        queued                                          = True
+        GRL._add_to_counter("_queue_depth", 1)
+        try:
+            # GOTCHA: we must not wait for the budget while holding a slot. Otherwise, once a resource like "graphql"
+            #   runs out, its waiting calls would take up all the slots and starve calls for other resources, like
+            #   "core". So we wait before taking a slot, and if the budget ran out while we waited for the slot, we
+            #   give the slot back and wait again.
+            await GRL._wait_for_budget(budget_resource)
+            if is_mutation:
+                await loop_state.mutations_semaphore.acquire()
+            try:
+                await loop_state.calls_semaphore.acquire()
+                while GRL._secs_until_budget(budget_resource) > 0:
+                    loop_state.calls_semaphore.release()
+                    await GRL._wait_for_budget(budget_resource)
+                    await loop_state.calls_semaphore.acquire()
+                try:
+                    GRL._add_to_counter("_queue_depth", -1)
+                    queued                              = False
+                    GRL._add_to_counter("_in_flight", 1)
+                    try:
+                        if is_mutation:
+                            await loop_state.space_out_mutation()
+                        yield
+                    finally:
+                        GRL._add_to_counter("_in_flight", -1)
+                finally:
+                    loop_state.calls_semaphore.release()
+            finally:
+                if is_mutation:
+                    loop_state.mutations_semaphore.release()
+        finally:
+            # If we failed before getting a slot (e.g., if cancelled), we are still counted in the queue
+            if queued:
+                GRL._add_to_counter("_queue_depth", -1)
+
+    def observe(response):
+        '''
+        Updates the tracked budget from the headers of a GitHub ``response``.
+
+        :param httpx.Response response: a response just received from GitHub.
+        :return: if the response is a rate limit error, the number of seconds to wait before retrying the call.
+            Otherwise None.
+        :rtype: float
+        '''
+        GRL                                             = GitHub_RateLimiter
+        headers                                         = response.headers
+        remaining                                       = headers.get("X-RateLimit-Remaining")
+        reset                                           = headers.get("X-RateLimit-Reset")
+        if not remaining is None:
+            resource                                    = headers.get("X-RateLimit-Resource", "core")
+            with GRL._lock:
+                GRL._budgets_dict[resource]             = {"limit":     int(headers.get("X-RateLimit-Limit", 0)),
+                                                           "remaining": int(remaining),
+                                                           "reset":     int(reset) if not reset is None else None}
+
+        if not response.status_code in [403, 429]:
+            return None
+
+        retry_after                                     = headers.get("Retry-After")
+        if not retry_after is None:
+            return float(retry_after)
+        elif remaining == "0" and not reset is None:
+            return max(int(reset) - time.time(), 0) + 1
+        elif response.status_code == 429 or "rate limit" in response.text.lower():
+            return GRL.DEFAULT_RATE_LIMIT_WAIT
+        else:
+            # A 403 unrelated to rate limits, such as a permissions problem
+            return None
+
+    async def wait(secs, reason, parent_context=None):
+        '''
+        Sleeps for ``secs`` seconds, logging the ``reason`` and accounting for the time waited.
+        '''
+        GRL                                             = GitHub_RateLimiter
+        msg                                             = f"GitHub rate limit: waiting {secs:.1f} secs ({reason})"
+        if not parent_context is None:
+            Application.app().log(msg, xlabels=parent_context.as_xlabel())
+        else:
+            Application.app().log(msg)
+        GRL._add_to_counter("_total_wait_secs", secs)
+        await asyncio.sleep(secs)
+
+    async def _wait_for_budget(budget_resource):
+        GRL                                             = GitHub_RateLimiter
+        secs                                            = GRL._secs_until_budget(budget_resource)
+        if secs > 0:
+            await GRL.wait(secs, f"'{budget_resource}' budget nearly exhausted")
+
+    def _secs_until_budget(budget_resource):
+        '''
+        :return: how many seconds calls against ``budget_resource`` must wait for the budget to reset, or 0 if they
+            may proceed. All calls that find the budget exhausted wait until the same reset time, so they all wake
+            up together when it comes.
+        :rtype: float
+        '''
+        GRL                                             = GitHub_RateLimiter
+        with GRL._lock:
+            budget                                      = GRL._budgets_dict.get(budget_resource)
+            if budget is None or budget["reset"] is None or budget["remaining"] > GRL.BUDGET_RESERVE:
+                return 0
+            return max(budget["reset"] - time.time() + 1, 0)
+
+    def _add_to_counter(counter_name, delta):
+        GRL                                             = GitHub_RateLimiter
+        with GRL._lock:
+            setattr(GRL, counter_name, getattr(GRL, counter_name) + delta)
+
+    def _state_for_running_loop():
+        '''
+        :return: the semaphores and timing state for the running event loop. They are kept per event loop since
+            asyncio primitives can't be shared across event loops.
+        :rtype: _LoopState
+        '''
+        GRL                                             = GitHub_RateLimiter
+        loop                                            = asyncio.get_running_loop()
+        with GRL._lock:
+            for stale_loop in [l for l in GRL._loop_state_dict.keys() if l.is_closed()]:
+                del GRL._loop_state_dict[stale_loop]
+
+            loop_state                                  = GRL._loop_state_dict.get(loop)
+            if loop_state is None:
+                loop_state                              = _LoopState(GRL.MAX_CONCURRENT_CALLS,
+                                                                     GRL.MAX_CONCURRENT_MUTATIONS)
+                GRL._loop_state_dict[loop]              = loop_state
+        return loop_state
+
+class _LoopState():
+    '''
+    Helper data structure with the :class:`GitHub_RateLimiter` state that is specific to one event loop.
+    '''
+    def __init__(self, max_concurrent_calls, max_concurrent_mutations):
+        self.calls_semaphore                            = asyncio.Semaphore(max_concurrent_calls)
+        self.mutations_semaphore                        = asyncio.Semaphore(max_concurrent_mutations)
+        self.last_mutation_time                         = 0.0
+
+    async def space_out_mutation(self):
+        '''
+        Sleeps as needed so that consecutive mutating calls start at least ``MIN_MUTATION_INTERVAL`` seconds apart.
+        '''
+        now                                             = time.monotonic()
+        next_allowed                                    = self.last_mutation_time + GitHub_RateLimiter.MIN_MUTATION_INTERVAL
+        # Reserve our start time before sleeping, so that concurrent mutations queue up behind us
+        self.last_mutation_time                         = max(now, next_allowed)
+        if next_allowed > now:
+            await asyncio.sleep(next_allowed - now)
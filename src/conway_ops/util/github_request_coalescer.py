@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+from contextlib                                             import asynccontextmanager
+
+class GitHub_RequestCoalescer():
+
+    '''
+    Process-wide de-duplication of identical GitHub GET calls, used by :class:`GitHub_Client`.
+
+    It provides two mechanisms:
+
+    * Single-flight: if a GET for a URL is already in flight when another caller requests the same URL, the second
+      caller awaits the response of the first call instead of making its own call.
+
+    * Memoization: within a :meth:`memo_scope` (e.g., for the duration of a report run), responses are remembered
+      for a short time-to-live, so that different code paths asking for the same resource one after the other
+      (such as the stats and the logs of a report) only cause one call.
+
+    Since the same response is shared by multiple callers, callers must treat it as read-only.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_RequestCoalescer is a static class and should not be instantiated")
+
+    DEFAULT_MEMO_TTL                                    = 60 # In seconds
+
+    _in_flight_dict                                     = {} # Keys are event loops, values are dicts of Tasks per key
+    _memo_dict                                          = {} # Keys are request keys, values are (expiry, data) pairs
+    # The time-to-live of the innermost memo scope of the running code. It is kept per context rather than as
+    # one value for the process, so that a scope does not change the time-to-live of other scopes open meanwhile
+    _memo_ttl_var                                       = contextvars.ContextVar("github_memo_ttl", default=None)
+    _memo_scopes                                        = 0
+    _lock                                               = threading.Lock()
+
+    async def coalesce(key, fetch, use_memo=True):
+        '''
+        :param str key: identifies the GET call, i.e., calls with the same key are considered identical.
+        :param fetch: callable with no arguments that returns a coroutine making the GET call. It is only
+            called if there is no identical call in flight (or memoized).
+        :param bool use_memo: if False, the memoized responses are neither used nor updated. Identical calls in
+            flight are still shared.
+        :return: the result of the GET call identified by ``key``
+        '''
+        GRC                                             = GitHub_RequestCoalescer
+        if use_memo:
+            with GRC._lock:
+                memoized                                = GRC._memo_dict.get(key)
+            if not memoized is None and memoized[0] > time.monotonic():
+                return memoized[1]
+
+        in_flight_dict                                  = GRC._in_flight_for_running_loop()
+        task                                            = in_flight_dict.get(key)
+        if task is None:
+            task                                        = asyncio.create_task(fetch())
+            in_flight_dict[key]                         = task
+            task.add_done_callback(lambda t: in_flight_dict.pop(key, None) if in_flight_dict.get(key) is t else None)
+
+        # Shield the shared call, so that if this caller is cancelled, the other callers awaiting it are not
+        result                                          = await asyncio.shield(task)
+
+        if use_memo:
+            ttl                                         = GRC._memo_ttl_var.get()
+            ttl                                         = GRC.DEFAULT_MEMO_TTL if ttl is None else ttl
+            with GRC._lock:
+                if GRC._memo_scopes > 0:
+                    GRC._memo_dict[key]                 = (time.monotonic() + ttl, result)
+        return result
+
+    @asynccontextmanager
+    async def memo_scope(ttl=None):
+        '''
+        Asynchronous context manager within which GET responses are memoized for ``ttl`` seconds. Memoized responses
+        are discarded when the last open scope exits.
+
+        :param float ttl: time-to-live in seconds for responses memoized by code running within the scope. Defaults
+            to ``DEFAULT_MEMO_TTL``. When the scope exits, the time-to-live of the enclosing scope (if any) applies
+            again.
+        '''
+        GRC                                             = GitHub_RequestCoalescer
+        with GRC._lock:
+            GRC._memo_scopes                            += 1
+        ttl_token                                       = GRC._memo_ttl_var.set(GRC.DEFAULT_MEMO_TTL if ttl is None else ttl)
+        try:
+            yield
+        finally:
+            GRC._memo_ttl_var.reset(ttl_token)
+            with GRC._lock:
+                GRC._memo_scopes                        -= 1
+                if GRC._memo_scopes == 0:
+                    GRC._memo_dict                      = {}
+
+    def _in_flight_for_running_loop():
+        '''
+        :return: the calls in flight for the running event loop, as a dictionary of Tasks keyed by request key.
+            They are kept per event loop since asyncio Tasks can't be awaited from other event loops.
+        :rtype: dict
+        '''
+        GRC                                             = GitHub_RequestCoalescer
+        loop                                            = asyncio.get_running_loop()
+        with GRC._lock:
+            for stale_loop in [l for l in GRC._in_flight_dict.keys() if l.is_closed()]:
+                del GRC._in_flight_dict[stale_loop]
+            return GRC._in_flight_dict.setdefault(loop, {})
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os                                                   as _os
+import threading
+
+from pathlib                                                import Path
+
+from httpx                                                  import Response
+
+class GitHub_ResponseCache():
+
+    '''
+    On-disk cache of GitHub API responses for GET calls, used by :class:`GitHub_Client` to make conditional requests.
+
+    For each cached URL we remember the ``ETag`` and ``Last-Modified`` headers returned by GitHub, so that the next
+    GET for that URL can be sent with ``If-None-Match`` / ``If-Modified-Since`` headers. If GitHub answers with
+    "304 Not Modified" the cached body is served instead, which is faster and (as per GitHub's documentation)
+    does not count against the rate limit.
+
+    The cache is bounded in size: when it grows beyond ``MAX_BYTES``, the least recently used entries are evicted.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_ResponseCache is a static class and should not be instantiated")
+
+    ENABLED                                             = True
+    CACHE_DIR                                           = str(Path.home()) + "/.conway_ops/cache/github_responses"
+    MAX_BYTES                                           = 100 * 1024 * 1024
+
+    # When evicting, we free space down to this fraction of MAX_BYTES, so that we don't evict on every write
+    EVICTION_TARGET_RATIO                               = 0.8
+
+    _total_bytes                                        = None # Lazily computed the first time we store an entry
+    _lock                                               = threading.Lock()
+
+    def configure(cache_dir=None, max_bytes=None, enabled=None):
+        '''
+        :param str cache_dir: folder in the local file system under which to keep cached responses.
+        :param int max_bytes: maximum size in bytes of the cache before least recently used entries get evicted.
+        :param bool enabled: if False, no responses are cached or served from the cache.
+        '''
+        GRC                                             = GitHub_ResponseCache
+        with GRC._lock:
+            if not cache_dir is None:
+                GRC.CACHE_DIR                           = cache_dir
+                GRC._total_bytes                        = None
+            if not max_bytes is None:
+                GRC.MAX_BYTES                           = max_bytes
+            if not enabled is None:
+                GRC.ENABLED                             = enabled
+
+    def lookup(url, headers):
+        '''
+        :param str url: URL of a GET call about to be made.
+        :param dict headers: HTTP headers of the GET call about to be made.
+        :return: the cached entry for the ``url``, or None if there is none.
+        :rtype: CachedResponse
+        '''
+        path                                            = GitHub_ResponseCache._entry_path(url, headers)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry_dict                              = json.load(file)
+        except (OSError, ValueError):
+            # Missing or corrupted entries (e.g., if a concurrent eviction removed it) are just a cache miss
+            return None
+
+        # Touch the entry so that eviction treats it as recently used
+        try:
+            _os.utime(path)
+        except OSError:
+            pass
+
+        return CachedResponse(entry_dict)
+
+    def store(url, headers, response):
+        '''
+        Saves a successful GET ``response`` in the cache, provided GitHub returned a validator (``ETag`` or
+        ``Last-Modified``) that allows it to be revalidated later.
+
+        :param str url: URL of the GET call that was made.
+        :param dict headers: HTTP headers of the GET call that was made.
+        :param httpx.Response response: the response to cache.
+        '''
+        GRC                                             = GitHub_ResponseCache
+        etag                                            = response.headers.get("ETag")
+        last_modified                                   = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+
+        entry_dict                                      = {"url":              url,
+                                                           "etag":             etag,
+                                                           "last_modified":    last_modified,
+                                                           "headers":          dict(response.headers),
+                                                           "body":             response.text}
+        path                                            = GRC._entry_path(url, headers)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file and then rename it, so that concurrent readers never see a partial entry
+        tmp_path                                        = f"{path}.{_os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entry_dict, file)
+        try:
+            # The entry may replace an older one for the same call, whose size must no longer be counted
+            old_bytes                                   = _os.path.getsize(path)
+        except OSError:
+            old_bytes                                   = 0
+        _os.replace(tmp_path, path)
+
+        with GRC._lock:
+            if GRC._total_bytes is None:
+                GRC._total_bytes                        = sum(f.stat().st_size for f in GRC._entry_files())
+            else:
+                GRC._total_bytes                        += _os.path.getsize(path) - old_bytes
+
+            if GRC._total_bytes > GRC.MAX_BYTES:
+                GRC._evict()
+
+    def clear():
+        '''
+        Removes all entries in the cache.
+        '''
+        GRC                                             = GitHub_ResponseCache
+        with GRC._lock:
+            for entry_file in GRC._entry_files():
+                entry_file.unlink(missing_ok=True)
+            GRC._total_bytes                            = 0
+
+    def _evict():
+        '''
+        Removes least recently used entries until the cache is below its eviction target. Caller must hold the lock.
+        '''
+        GRC                                             = GitHub_ResponseCache
+        target_bytes                                    = GRC.MAX_BYTES * GRC.EVICTION_TARGET_RATIO
+
+        stats_l                                         = []
+        for entry_file in GRC._entry_files():
+            try:
+                stats_l.append((entry_file, entry_file.stat()))
+            except OSError:
+                continue
+
+        total_bytes                                     = sum(stat.st_size for _, stat in stats_l)
+        for entry_file, stat in sorted(stats_l, key=lambda pair: pair[1].st_mtime):
+            if total_bytes <= target_bytes:
+                break
+            entry_file.unlink(missing_ok=True)
+            total_bytes                                 -= stat.st_size
+
+        GRC._total_bytes                                = total_bytes
+
+    def _entry_files():
+        cache_dir                                       = Path(GitHub_ResponseCache.CACHE_DIR)
+        if not cache_dir.exists():
+            return []
+        return list(cache_dir.glob("*/*.json"))
+
+    def _entry_path(url, headers):
+        '''
+        :return: the path of the file for the cache entry of a GET call to ``url`` with the given ``headers``.
+            The identity of the caller (from the token in the headers) is part of the key, since different
+            identities may see different content for the same URL.
+        :rtype: str
+        '''
+        key                                             = "|".join([url,
+                                                                    headers.get("Accept", ""),
+                                                                    headers.get("Authorization", "")])
+        digest                                          = hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+        # Spread entries across sub-folders to keep folders small
+        return f"{GitHub_ResponseCache.CACHE_DIR}/{digest[:2]}/{digest}.json"
+
+class CachedResponse():
+    '''
+    Helper data structure for a response previously saved in the :class:`GitHub_ResponseCache`
+
+    :param dict entry_dict: the cached data, as saved by :meth:`GitHub_ResponseCache.store`
+    '''
+    def __init__(self, entry_dict):
+        self.etag                                       = entry_dict["etag"]
+        self.last_modified                              = entry_dict["last_modified"]
+        self.headers                                    = entry_dict["headers"]
+        self.body                                       = entry_dict["body"]
+
+    def conditional_headers(self):
+        '''
+        :return: the HTTP headers to add to a GET call so that GitHub answers "304 Not Modified" if the resource
+            did not change since it was cached.
+        :rtype: dict
+        '''
+        result                                          = {}
+        if not self.etag is None:
+            result["If-None-Match"]                     = self.etag
+        if not self.last_modified is None:
+            result["If-Modified-Since"]                 = self.last_modified
+        return result
+
+    def as_response(self, not_modified_response):
+        '''
+        :param httpx.Response not_modified_response: the "304 Not Modified" response received from GitHub.
+        :return: a response equivalent to the one originally cached, so that it can be processed exactly as if
+            GitHub had returned it. Headers are taken from the 304 response when present, since they are fresher
+            (e.g., for rate limit information).
+        :rtype: httpx.Response
+        '''
+        headers                                         = dict(self.headers)
+        headers.update(not_modified_response.headers)
+        # The cached body is already decoded text, so drop headers that describe the original transfer encoding
+        for header in ["content-encoding", "content-length", "transfer-encoding"]:
+            headers.pop(header, None)
+
+        return Response(status_code     = 200,
+                        headers         = headers,
+                        content         = self.body.encode("utf-8"),
+                        request         = not_modified_response.request)
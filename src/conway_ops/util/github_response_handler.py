@@ -2,14 +2,83 @@
 from conway.application.application                                 import Application
 from conway.util.http_response_handler                              import HTTP_ResponseHandler
 
+try:
+    import orjson                                                   as _orjson
+except ImportError:
+    # orjson is an optional dependency (see the "fast_json" extra), so fall back to the standard decoding
+    _orjson                                                         = None
+
 class GitHub_ReponseHandler(HTTP_ResponseHandler):
 
     '''
+    Decodes GitHub responses, using the ``orjson`` library when it is installed since it is several times faster
+    than the standard decoding for large payloads (like commits with long ``files`` arrays). Callers may also ask
+    for only some of the fields of the payload to be returned (see :meth:`project`).
     '''
     def __init__(self):
         super().__init__()
+        self._decoded_response                              = None
+        self._decoded_data                                  = None
+
+    # If False, responses are always decoded with the standard decoding, even if orjson is installed
+    USE_FAST_JSON                                           = True
+
+    # Fields consumed by this package from the "/commits/{ref}" endpoint. A value of None keeps the whole field,
+    # and a dictionary keeps only the sub-fields it lists. For lists, this applies to each element.
+    COMMIT_FIELDS                                           = {"sha":       None,
+                                                               "commit":    {"message":     None,
+                                                                             "author":      {"name": None, "date": None}},
+                                                               "parents":   {"sha": None, "url": None},
+                                                               "files":     {"filename": None}}
+
+    # Fields consumed by this package for each item of the "/branches" endpoint
+    BRANCH_FIELDS                                           = {"name": None}
+
+    # Fields consumed by this package for each item of the "/orgs/{owner}/repos" and "/users/{owner}/repos" endpoints
+    REPO_FIELDS                                             = {"name": None, "default_branch": None, "pushed_at": None}
 
-    def process(self, parent_context, response):
+    def project(data, fields):
+        '''
+        GOTCHA: this does not make decoding any cheaper, since the whole payload is decoded before it is trimmed.
+            What it saves is memory for the result (and for whatever keeps it, like memos), since the bulk of what
+            GitHub returns (such as the patches of each file in a commit) is not referenced once it is trimmed.
+
+        :param data: decoded Json payload from GitHub.
+        :param dict fields: the fields to keep, in the format of :attr:`COMMIT_FIELDS`. If None, all are kept.
+        :return: the ``data`` without the fields not listed in ``fields``.
+        '''
+        if fields is None or data is None:
+            return data
+        if isinstance(data, list):
+            return [GitHub_ReponseHandler.project(item, fields) for item in data]
+        if not isinstance(data, dict):
+            return data
+        return {key: GitHub_ReponseHandler.project(data[key], sub_fields)
+                    for key, sub_fields in fields.items() if key in data}
+
+    def _as_json(self, response):
+        '''
+        Overwrites parent's method to decode with orjson when available, and to decode each response only once even
+        if called multiple times while processing it.
+        '''
+        if self._decoded_response is response:
+            return self._decoded_data
+
+        data                                                = None
+        if GitHub_ReponseHandler.USE_FAST_JSON and not _orjson is None and len(response.content) > 0:
+            try:
+                data                                        = _orjson.loads(response.content)
+            except _orjson.JSONDecodeError:
+                # Let the parent class deal with it in its usual way
+                data                                        = super()._as_json(response)
+        else:
+            data                                            = super()._as_json(response)
+
+        self._decoded_response                              = response
+        self._decoded_data                                  = data
+        return data
+
+    def process(self, parent_context, response, fields=None):
         '''
         :param response: HTTP response object to process
         :type response: requests.models.Response
@@ -19,6 +88,9 @@ class GitHub_ReponseHandler(HTTP_ResponseHandler):
             method.
         :type parent_context: conway.async_utils.scheduling_context.SchedulingContext
 
+        :param dict fields: optional parameter with the fields of the payload to return, in the format of
+            :attr:`COMMIT_FIELDS`. If None (the default), the whole payload is returned.
+
         :returns: The payload of the response, if the handler considers the response successful. Otherwise
                 the handler will raise an exception.
         :rtype: dict
@@ -31,6 +103,17 @@ class GitHub_ReponseHandler(HTTP_ResponseHandler):
         #   - see https://requests.readthedocs.io/en/latest/api/#requests.PreparedRequest
         #
         req                                                 = response.request
+        try:
+            return self._process(parent_context, response, status, data, fields)
+        except GitHub_ResponseError:
+            raise
+        except ValueError as ex:
+            if status >= 400:
+                # So that callers can tell benign failures (like a 404 for something that does not exist) from others
+                raise GitHub_ResponseError(str(ex), status) from ex
+            raise
+
+    def _process(self, parent_context, response, status, data, fields):
         match status:
             case 422:
                 match data:
@@ -50,7 +133,15 @@ class GitHub_ReponseHandler(HTTP_ResponseHandler):
                     case _:
                         self._fail(response)
             case _:         
-                return super().process(response)
-            
+                return GitHub_ReponseHandler.project(super().process(response), fields)
+
+class GitHub_ResponseError(ValueError):
+    '''
+    Raised by :class:`GitHub_ReponseHandler` when GitHub responds with an error status.
 
-            
\ No newline at end of file
+    :param str message: the description of the error.
+    :param int status_code: the HTTP status of GitHub's response, such as 404.
+    '''
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code                                    = status_code
@@ -0,0 +1,134 @@
+import random
+import re
+
+import httpx
+
+class GitHub_RetryPolicy():
+
+    '''
+    Determines whether and when :class:`GitHub_Client` should retry a GitHub call that failed for transient reasons,
+    such as a connection problem, a timeout, or a 502 from GitHub.
+
+    Delays between attempts grow exponentially from ``base_delay`` up to ``max_delay``, and are randomized by
+    ``jitter`` so that many concurrent callers don't retry in lockstep. No retry is attempted if it would go
+    beyond the ``total_budget`` of seconds since the first attempt.
+
+    Retries are idempotency-aware: for non-idempotent calls (like creating or merging a pull request) a retry is
+    only done if the request certainly never reached GitHub (e.g., the connection could not be established),
+    since otherwise replaying it could, for example, create a second pull request.
+
+    :param int max_attempts: maximum number of attempts, including the first one.
+    :param float base_delay: seconds to wait before the first retry.
+    :param float max_delay: maximum seconds to wait between two attempts.
+    :param float jitter: number between 0 and 1, for the fraction of each delay that is randomized.
+    :param float total_budget: maximum seconds since the first attempt after which no more retries are made.
+    :param tuple[int] retry_statuses: HTTP status codes that are considered transient.
+    :param bool idempotent: if True, calls may be retried even if they might have reached GitHub.
+    '''
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, jitter=0.5, total_budget=60.0,
+                 retry_statuses=(500, 502, 503, 504), idempotent=True):
+        self.max_attempts                               = max_attempts
+        self.base_delay                                 = base_delay
+        self.max_delay                                  = max_delay
+        self.jitter                                     = jitter
+        self.total_budget                               = total_budget
+        self.retry_statuses                             = tuple(retry_statuses)
+        self.idempotent                                 = idempotent
+
+    # Exceptions raised by httpx when the request could not have been sent to GitHub, so it is always safe to retry
+    NOT_SENT_EXCEPTIONS                                 = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    # Exceptions raised by httpx after the request might have reached GitHub
+    MAYBE_SENT_EXCEPTIONS                               = (httpx.ReadTimeout, httpx.WriteTimeout, httpx.ReadError,
+                                                           httpx.WriteError, httpx.RemoteProtocolError)
+
+    def delay_after_exception(self, exception, attempt, elapsed):
+        '''
+        :param Exception exception: the exception raised by the attempt that just failed.
+        :param int attempt: number of attempts made so far, including the one that just failed.
+        :param float elapsed: seconds since the first attempt started.
+        :return: the seconds to wait before retrying, or None if the call should not be retried.
+        :rtype: float
+        '''
+        if isinstance(exception, GitHub_RetryPolicy.NOT_SENT_EXCEPTIONS):
+            return self._delay(attempt, elapsed)
+        if self.idempotent and isinstance(exception, GitHub_RetryPolicy.MAYBE_SENT_EXCEPTIONS):
+            return self._delay(attempt, elapsed)
+        return None
+
+    def delay_after_response(self, response, attempt, elapsed):
+        '''
+        :param httpx.Response response: the response received by the attempt that just completed.
+        :param int attempt: number of attempts made so far, including the one that just completed.
+        :param float elapsed: seconds since the first attempt started.
+        :return: the seconds to wait before retrying, or None if the call should not be retried.
+        :rtype: float
+        '''
+        # For a non-idempotent call, a 5xx does not tell us whether GitHub processed the request before failing
+        if self.idempotent and response.status_code in self.retry_statuses:
+            return self._delay(attempt, elapsed)
+        return None
+
+    def _delay(self, attempt, elapsed):
+        if attempt >= self.max_attempts:
+            return None
+        backoff                                         = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay                                           = backoff * (1 - self.jitter * random.random())
+        if elapsed + delay > self.total_budget:
+            return None
+        return delay
+
+    # GraphQL calls are all POSTs, so their policies are not chosen by HTTP verb but by whether they are queries
+    # (which are idempotent) or mutations (which are not). These are the keys to configure them.
+    GRAPHQL_QUERY                                       = "GRAPHQL_QUERY"
+    GRAPHQL_MUTATION                                    = "GRAPHQL_MUTATION"
+
+    _MUTATION_REGEX                                     = re.compile(r"\s*mutation\b")
+
+    # Policies per HTTP verb (or GraphQL operation). GET and DELETE are idempotent, while POST, PUT and PATCH are
+    # not, since in this package they are used for things like creating and merging pull requests.
+    #
+    _policies_dict                                      = {}
+
+    def for_method(method):
+        '''
+        :param str method: an HTTP verb, like "GET"
+        :return: the retry policy to use for calls to the REST API with the HTTP verb ``method``.
+        :rtype: GitHub_RetryPolicy
+        '''
+        return GitHub_RetryPolicy._policy_for(method, idempotent = method in ["GET", "HEAD", "DELETE"])
+
+    def for_call(method, resource, body=None):
+        '''
+        :param str method: an HTTP verb, like "GET"
+        :param str resource: the GitHub API called: "graphql" for the GraphQL API, or "core" for the REST API.
+        :param dict body: the payload of the call. For GraphQL calls, its "query" tells whether it is a mutation.
+        :return: the retry policy to use for the call.
+        :rtype: GitHub_RetryPolicy
+        '''
+        GRP                                             = GitHub_RetryPolicy
+        if resource != "graphql":
+            return GRP.for_method(method)
+        query                                           = "" if body is None else body.get("query", "")
+        if GRP._MUTATION_REGEX.match(query):
+            return GRP._policy_for(GRP.GRAPHQL_MUTATION, idempotent=False)
+        return GRP._policy_for(GRP.GRAPHQL_QUERY, idempotent=True)
+
+    def configure(method, policy):
+        '''
+        Sets the retry policy to use for calls with a given HTTP verb.
+
+        :param str method: an HTTP verb, like "GET", or one of ``GRAPHQL_QUERY`` and ``GRAPHQL_MUTATION`` for
+            calls to the GraphQL API.
+        :param GitHub_RetryPolicy policy: the policy to use for calls with the HTTP verb ``method``. To disable
+            retries, use a policy with ``max_attempts=1``.
+        '''
+        GitHub_RetryPolicy._policies_dict[method]       = policy
+
+    def _policy_for(key, idempotent):
+        GRP                                             = GitHub_RetryPolicy
+        policy                                          = GRP._policies_dict.get(key)
+        if policy is None:
+            policy                                      = GRP(idempotent = idempotent)
+            GRP._policies_dict[key]                     = policy
+        return policy
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+from httpx                                                  import AsyncClient, Limits
+
+class GitHub_SessionPool():
+
+    '''
+    Process-wide pool of HTTP connections to the GitHub API, shared by all :class:`GitHub_Client` instances.
+
+    Creating an ``httpx.AsyncClient`` per API call means paying a new TCP+TLS handshake for each call. Instead,
+    all :class:`GitHub_Client` instances borrow the same session from this pool, so that a multi-repo workflow
+    (e.g., stats across a whole bundle of repos) reuses a handful of warm keep-alive connections. If the optional
+    ``h2`` package is installed, HTTP/2 is used so that concurrent requests are multiplexed over one connection.
+
+    GOTCHA:
+        An ``httpx.AsyncClient`` is bound to the event loop in which it was first used, and notebooks typically
+        create a new event loop per cell (e.g., via ``asyncio.Runner``). That is why this pool keeps one session
+        per event loop, and discards sessions for event loops that have been closed.
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_SessionPool is a static class and should not be instantiated")
+
+    MAX_CONNECTIONS                                     = 20
+    MAX_KEEPALIVE_CONNECTIONS                           = 10
+    KEEPALIVE_EXPIRY                                    = 30 # In seconds
+    HTTP2                                               = True
+
+    _sessions_dict                                      = {} # Keys are event loops, values are AsyncClient objects
+    _lock                                               = threading.Lock()
+
+    def configure(max_connections=None, max_keepalive_connections=None, keepalive_expiry=None, http2=None):
+        '''
+        Changes the settings used to create pooled sessions. Sessions already created are not affected, so
+        this should be called before making GitHub calls, or after calling :meth:`aclose`.
+
+        :param int max_connections: maximum number of concurrent connections to the GitHub API.
+        :param int max_keepalive_connections: maximum number of idle connections kept alive for reuse.
+        :param float keepalive_expiry: seconds after which an idle connection is closed.
+        :param bool http2: if True, HTTP/2 is used provided the ``h2`` package is installed.
+        '''
+        GSP                                             = GitHub_SessionPool
+        if not max_connections is None:
+            GSP.MAX_CONNECTIONS                         = max_connections
+        if not max_keepalive_connections is None:
+            GSP.MAX_KEEPALIVE_CONNECTIONS               = max_keepalive_connections
+        if not keepalive_expiry is None:
+            GSP.KEEPALIVE_EXPIRY                        = keepalive_expiry
+        if not http2 is None:
+            GSP.HTTP2                                   = http2
+
+    def session():
+        '''
+        Must be called from within a running event loop.
+
+        :return: the pooled session for the running event loop, creating it if needed.
+        :rtype: httpx.AsyncClient
+        '''
+        GSP                                             = GitHub_SessionPool
+        loop                                            = asyncio.get_running_loop()
+        with GSP._lock:
+            # Drop sessions of event loops that no longer exist, since they can't be used anymore
+            for stale_loop in [l for l in GSP._sessions_dict.keys() if l.is_closed()]:
+                del GSP._sessions_dict[stale_loop]
+
+            async_client                                = GSP._sessions_dict.get(loop)
+            if async_client is None or async_client.is_closed:
+                limits                                  = Limits(max_connections            = GSP.MAX_CONNECTIONS,
+                                                                 max_keepalive_connections  = GSP.MAX_KEEPALIVE_CONNECTIONS,
+                                                                 keepalive_expiry           = GSP.KEEPALIVE_EXPIRY)
+                async_client                            = AsyncClient(limits=limits, http2=GSP._http2_available())
+                GSP._sessions_dict[loop]                = async_client
+
+        return async_client
+
+    async def aclose():
+        '''
+        Closes the pooled session for the running event loop, if any. A new session will be created the next
+        time that :meth:`session` is called.
+        '''
+        GSP                                             = GitHub_SessionPool
+        loop                                            = asyncio.get_running_loop()
+        with GSP._lock:
+            async_client                                = GSP._sessions_dict.pop(loop, None)
+        if not async_client is None:
+            await async_client.aclose()
+
+    def _http2_available():
+        '''
+        :return: True if HTTP/2 was requested and the optional ``h2`` package needed by ``httpx`` for it is installed.
+        :rtype: bool
+        '''
+        if not GitHub_SessionPool.HTTP2:
+            return False
+        try:
+            import h2
+            return True
+        except ImportError:
+            return False
@@ -0,0 +1,230 @@
+import subprocess
+import tempfile
+
+from pathlib                                                import Path
+
+import pandas                                               as _pd
+
+from conway_ops.onboarding.repo_bundle                      import RepoBundle
+from conway_ops.repo_admin.branch_lifecycle_manager         import BranchLifecycleManager
+from conway_ops.repo_admin.repo_statics                     import RepoStatics
+from conway_ops.util.git_branches                           import GitBranches
+from conway_ops.util.github_change_detector                 import GitHub_ChangeDetector
+from conway_ops.util.github_client                          import GitHub_Client
+from conway_ops.util.github_commit_store                    import GitHub_CommitStore
+from conway_ops.util.github_metrics                         import GitHub_Metrics
+from conway_ops.util.github_response_cache                  import GitHub_ResponseCache
+from conway_ops.util.github_stand_in_server                 import GitHub_StandInServer
+
+class GitHub_StandInDrill():
+
+    '''
+    Scripted run of the pull request flows of the :class:`BranchLifecycleManager` against a
+    :class:`GitHub_StandInServer`, so that the :class:`GitHub_Client` (with its retries, rate limiting, caching and
+    metrics), the :class:`GitHub_MergeabilityWaiter` and the pull request logic can be exercised and timed offline.
+
+    Each run creates bare repos in a temporary folder, one per scenario:
+
+    * "drill.ahead": the integration branch has commits that master lacks, so master is fast-forwarded or gets a
+      merge commit, depending on ``fast_forward``.
+    * "drill.diverged": each branch has a commit that the other lacks, so integration gets a merge commit first.
+      Then master is fast-forwarded to it or gets a merge commit of its own, depending on ``fast_forward``.
+    * "drill.synced": both branches are the same, so no pull request is made.
+
+    Then it calls :meth:`BranchLifecycleManager.pull_request_integration_to_master` with ``fast_forward`` on and
+    off, while the server injects errors, and checks both the reported outcomes and the resulting branches.
+
+    It must run within a Conway application (see, for example, ``Chassis_NB_Application``), since the
+    :class:`GitHub_Client` logs through it and gets the GitHub token from it. The server ignores the token.
+
+    Example:
+
+    .. code-block:: python
+
+        result_df, metrics_df = await GitHub_StandInDrill.run(error_rate=0.2, seed=7)
+
+    This class is not meant to be instantiated: its state and methods are static.
+    '''
+    def __init__(self):
+        raise ValueError("GitHub_StandInDrill is a static class and should not be instantiated")
+
+    AHEAD                                               = "drill.ahead"
+    DIVERGED                                            = "drill.diverged"
+    SYNCED                                              = "drill.synced"
+
+    # Expected outcome of each pull request, keyed by (fast_forward, repo, from branch, to branch)
+    _MASTER                                             = GitBranches.MASTER_BRANCH.value
+    _INTEGRATION                                        = GitBranches.INTEGRATION_BRANCH.value
+    EXPECTED_OUTCOMES_DICT                              = {
+        (True,  AHEAD,    _INTEGRATION, _MASTER):           "Fast-forwarded",
+        (True,  AHEAD,    _MASTER, _INTEGRATION):           "Skipped (nothing to merge)",
+        (True,  DIVERGED, _INTEGRATION, _MASTER):           "Fast-forwarded",
+        (True,  DIVERGED, _MASTER, _INTEGRATION):           "Merged",
+        (True,  SYNCED,   _INTEGRATION, _MASTER):           "Skipped (nothing to merge)",
+        (True,  SYNCED,   _MASTER, _INTEGRATION):           "Skipped (nothing to merge)",
+        (False, AHEAD,    _INTEGRATION, _MASTER):           "Merged",
+        (False, AHEAD,    _MASTER, _INTEGRATION):           "Skipped (nothing to merge)",
+        (False, DIVERGED, _INTEGRATION, _MASTER):           "Merged",
+        (False, DIVERGED, _MASTER, _INTEGRATION):           "Merged",
+        (False, SYNCED,   _INTEGRATION, _MASTER):           "Skipped (nothing to merge)",
+        (False, SYNCED,   _MASTER, _INTEGRATION):           "Skipped (nothing to merge)",
+    }
+
+    async def run(work_dir=None, error_rate=0.2, error_statuses=[502, 503], seed=None, latency=0.0,
+                  mergeability_delay=1.0, rate_limit=5000, rate_limit_window=3600):
+        '''
+        Runs the drill. If an outcome or a resulting branch is not as expected, it raises an exception.
+
+        GOTCHA: it points the :class:`GitHub_Client` to the server, and the :class:`GitHub_ResponseCache`,
+            :class:`GitHub_CommitStore` and :class:`GitHub_ChangeDetector` to the ``work_dir``, and leaves them so.
+
+        :param str work_dir: folder under which to create the repos and caches. If None, a temporary folder is used.
+        :param float error_rate: probability that the server fails a call with an injected error. Errors are only
+            injected into calls that are safe to retry (see :class:`GitHub_StandInServer`).
+        :param list[int] error_statuses: HTTP statuses from which injected errors are randomly chosen.
+        :param int seed: optional seed for the error injection.
+        :param float latency: seconds of delay the server adds to each response.
+        :param float mergeability_delay: seconds during which the mergeability of a new pull request is unknown.
+        :param int rate_limit: number of calls the server allows per ``rate_limit_window``.
+        :param int rate_limit_window: duration of the rate limit window, in seconds.
+        :return: a pair of DataFrames: the outcome of each pull request (with an extra column for
+            ``fast_forward``), and the :class:`GitHub_Metrics` of the run.
+        :rtype: tuple
+        '''
+        GSD                                             = GitHub_StandInDrill
+        work_dir                                        = tempfile.mkdtemp(prefix="github_drill_") if work_dir is None \
+                                                            else work_dir
+        repos_root                                      = work_dir + "/github"
+        local_root                                      = work_dir + "/local"
+        Path(local_root).mkdir(parents=True, exist_ok=True)
+
+        GitHub_ResponseCache.configure(cache_dir=work_dir + "/cache/responses")
+        GitHub_CommitStore.configure(db_path=work_dir + "/cache/commits.sqlite3")
+        GitHub_ChangeDetector.configure(snapshot_dir=work_dir + "/cache/snapshots")
+        GitHub_Metrics.reset()
+
+        summaries_l                                     = []
+        with GitHub_StandInServer(repos_root            = repos_root,
+                                  latency               = latency,
+                                  rate_limit            = rate_limit,
+                                  rate_limit_window     = rate_limit_window,
+                                  error_rate            = error_rate,
+                                  error_statuses        = error_statuses,
+                                  seed                  = seed,
+                                  mergeability_delay    = mergeability_delay,
+                                  inject_into_mutations = False) as server:
+            GitHub_Client.configure(api_url=server.url())
+            for fast_forward in [True, False]:
+                # Each run gets its own owner, so that it starts from freshly created repos
+                owner                                   = "drill-ff" if fast_forward else "drill-merge"
+                heads_dict                              = GSD._create_repos(work_dir, repos_root + "/" + owner)
+                manager                                 = BranchLifecycleManager(
+                                                                local_root              = local_root,
+                                                                remote_root             = f"https://drill@github.com/{owner}",
+                                                                repo_bundle             = RepoBundle("drill", ["ahead", "diverged",
+                                                                                                              "synced"]),
+                                                                remote_gh_user          = None,
+                                                                remote_gh_organization  = owner,
+                                                                gh_secrets_path         = None)
+                summary_df                              = await manager.pull_request_integration_to_master(
+                                                                fast_forward = fast_forward)
+                GSD._check(fast_forward, summary_df, repos_root + "/" + owner, heads_dict)
+                summary_df.insert(0, "Fast forward", fast_forward)
+                summaries_l.append(summary_df)
+
+        return _pd.concat(summaries_l, ignore_index=True), GitHub_Metrics.summary_df()
+
+    def _create_repos(work_dir, owner_path):
+        '''
+        Creates the bare repos of the drill's scenarios under ``owner_path``.
+
+        :return: the heads of the branches of each repo before the drill, keyed by (repo, branch).
+        :rtype: dict
+        '''
+        GSD                                             = GitHub_StandInDrill
+        MASTER, INTEGRATION                             = GSD._MASTER, GSD._INTEGRATION
+        heads_dict                                      = {}
+        for repo_name in [GSD.AHEAD, GSD.DIVERGED, GSD.SYNCED]:
+            bare_path                                   = f"{owner_path}/{repo_name}.git"
+            seed_path                                   = f"{work_dir}/seed/{Path(owner_path).name}/{repo_name}"
+            GSD._git(None, ["init", "--quiet", "--bare", "--initial-branch", MASTER, bare_path])
+            GSD._git(None, ["init", "--quiet", "--initial-branch", MASTER, seed_path])
+
+            GSD._commit(seed_path, "base.txt")
+            GSD._git(seed_path, ["branch", INTEGRATION])
+            if repo_name == GSD.DIVERGED:
+                GSD._commit(seed_path, "hotfix.txt")
+            if repo_name in [GSD.AHEAD, GSD.DIVERGED]:
+                GSD._git(seed_path, ["checkout", "--quiet", INTEGRATION])
+                GSD._commit(seed_path, "feature1.txt")
+                GSD._commit(seed_path, "feature2.txt")
+
+            GSD._git(seed_path, ["push", "--quiet", bare_path, MASTER, INTEGRATION])
+            for branch in [MASTER, INTEGRATION]:
+                heads_dict[(repo_name, branch)]         = GSD._git(bare_path, ["rev-parse", branch])
+        return heads_dict
+
+    def _check(fast_forward, summary_df, owner_path, heads_dict):
+        '''
+        Raises an exception if the outcomes in ``summary_df``, or the branches in the repos under ``owner_path``,
+        are not what the drill expects.
+        '''
+        GSD                                             = GitHub_StandInDrill
+        RS                                              = RepoStatics
+        MASTER, INTEGRATION                             = GSD._MASTER, GSD._INTEGRATION
+        for _, row in summary_df.iterrows():
+            key                                         = (fast_forward, row[RS.REPO_NAME_COL], row[RS.FROM_BRANCH_COL],
+                                                           row[RS.TO_BRANCH_COL])
+            expected                                    = GSD.EXPECTED_OUTCOMES_DICT[key]
+            if row[RS.PR_OUTCOME_COL] != expected:
+                raise ValueError(f"Drill failed for {key}: outcome is '{row[RS.PR_OUTCOME_COL]}' instead of '{expected}'")
+
+        for repo_name in [GSD.AHEAD, GSD.DIVERGED, GSD.SYNCED]:
+            bare_path                                   = f"{owner_path}/{repo_name}.git"
+            heads_now_dict                              = {branch: GSD._git(bare_path, ["rev-parse", branch])
+                                                            for branch in [MASTER, INTEGRATION]}
+            if repo_name == GSD.SYNCED:
+                expected_l                              = [heads_dict[(repo_name, MASTER)]] * 2
+            elif repo_name == GSD.AHEAD:
+                expected_l                              = [heads_dict[(repo_name, INTEGRATION)] if fast_forward else None,
+                                                           heads_dict[(repo_name, INTEGRATION)]]
+            else:
+                expected_l                              = [heads_now_dict[INTEGRATION] if fast_forward else None, None]
+
+            for branch, expected in zip([MASTER, INTEGRATION], expected_l):
+                head                                    = heads_now_dict[branch]
+                if expected is None:
+                    # The branch must have gotten a merge commit that brings together both branches' prior commits
+                    parents_l                           = GSD._git(bare_path, ["rev-list", "--parents", "-n", "1",
+                                                                               head]).split()[1:]
+                    is_ok                               = len(parents_l) == 2 and all(
+                                                            GSD._git(bare_path, ["merge-base", "--is-ancestor",
+                                                                                 heads_dict[(repo_name, b)], head],
+                                                                     check=False) is not None
+                                                            for b in [MASTER, INTEGRATION])
+                else:
+                    is_ok                               = head == expected
+                if not is_ok:
+                    raise ValueError(f"Drill failed for '{repo_name}' (fast_forward={fast_forward}): "
+                                     + f"'{branch}' is at {head}")
+
+    def _commit(seed_path, file_name):
+        (Path(seed_path) / file_name).write_text(f"Content of {file_name}\n")
+        GitHub_StandInDrill._git(seed_path, ["add", file_name])
+        GitHub_StandInDrill._git(seed_path, ["commit", "--quiet", "-m", f"Add {file_name}"])
+
+    def _git(repo_path, args_l, check=True):
+        '''
+        :return: the output of GIT, without surrounding white space, or None if it failed and ``check`` is False.
+        :rtype: str
+        '''
+        # The drill's commits need an author even if GIT is not configured for the user
+        command_l                                       = ["git", "-c", "user.name=Drill", "-c", "user.email=drill@example.com"]
+        if not repo_path is None:
+            command_l                                   += ["-C", repo_path]
+        result                                          = subprocess.run(command_l + args_l, capture_output=True, text=True)
+        if result.returncode != 0:
+            if check:
+                raise ValueError(f"GIT command '{' '.join(args_l)}' failed: {result.stderr}")
+            return None
+        return result.stdout.strip()
@@ -0,0 +1,731 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+
+from http.server                                            import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib                                                import Path
+from urllib.parse                                           import urlsplit, parse_qs, urlencode
+
+class GitHub_StandInServer():
+
+    '''
+    Local HTTP server that stands in for the GitHub REST and GraphQL APIs, backed by bare GIT repos in the local
+    file system. It implements the subset of the GitHub API used by this package, so that :class:`GitHub_Client`,
+    the :class:`GitHub_RepoInspector` and the pull request flows of the :class:`BranchLifecycleManager` can be
+    exercised, benchmarked and load-tested offline.
+
+    To use it, point the :class:`GitHub_Client` to it:
+
+    .. code-block:: python
+
+        with GitHub_StandInServer(repos_root="/tmp/gh_repos", latency=0.05) as server:
+            GitHub_Client.configure(api_url=server.url())
+            ...
+
+    Repos are looked up as ``{repos_root}/{owner}/{repo}.git`` (or ``{repos_root}/{owner}/{repo}``), where ``owner``
+    is the GitHub user or organization.
+
+    To approximate real conditions, the server can simulate latency, enforce a rate limit budget (advertised through
+    the usual ``X-RateLimit-*`` headers) and inject errors.
+
+    :param str repos_root: folder in the local file system under which the bare repos live.
+    :param float latency: seconds of delay added to each response.
+    :param int rate_limit: number of calls allowed per ``rate_limit_window`` and per rate limit resource ("core"
+        and "graphql"), after which calls fail with a 403 until the window resets.
+    :param int rate_limit_window: duration of the rate limit window, in seconds.
+    :param float error_rate: probability between 0 and 1 that a call fails with an injected error.
+    :param list[int] error_statuses: HTTP statuses from which injected errors are randomly chosen.
+    :param bool inject_into_mutations: if False, errors are only injected into calls that don't change anything
+        (REST GETs and GraphQL queries), which clients may safely retry. Clients can't tell whether a mutation that
+        failed with, e.g., a 502 was done, so they don't retry it, and injecting errors into mutations makes runs fail.
+    :param int seed: optional seed for the random generator, for reproducible error injection.
+    :param str host: interface on which the server listens.
+    :param int port: port on which the server listens. If 0, a free port is chosen.
+    :param float mergeability_delay: seconds after the creation of a pull request during which its mergeability is
+        reported as unknown and it can't be merged, to simulate GitHub computing mergeability in the background.
+    '''
+    def __init__(self, repos_root, latency=0.0, rate_limit=5000, rate_limit_window=3600, error_rate=0.0,
+                 error_statuses=[502], seed=None, host="127.0.0.1", port=0, mergeability_delay=0.0,
+                 inject_into_mutations=True):
+        self.repos_root                                 = repos_root
+        self.latency                                    = latency
+        self.rate_limit                                 = rate_limit
+        self.rate_limit_window                          = rate_limit_window
+        self.error_rate                                 = error_rate
+        self.error_statuses                             = error_statuses
+        self.inject_into_mutations                      = inject_into_mutations
+        self.random                                     = random.Random(seed)
+        self.host                                       = host
+        self.port                                       = port
+        self.mergeability_delay                         = mergeability_delay
+
+        self.http_server                                = None
+        self.server_thread                              = None
+
+        # Pull requests only live in memory. Keys are (owner, repo) pairs, values are lists of pull request dicts
+        self.pulls_dict                                 = {}
+
+        # Keys are rate limit resources ("core", "graphql"), values are [remaining, reset] lists
+        self.budgets_dict                               = {}
+
+        # Serializes mutations of repos and of the server's in-memory state
+        self.lock                                       = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        '''
+        Starts the server in a background thread.
+
+        :return: the base URL of the server, to be used as the GitHub API URL.
+        :rtype: str
+        '''
+        server                                          = self
+
+        class _Handler(_StandInRequestHandler):
+            stand_in                                    = server
+
+        self.http_server                                = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.http_server.daemon_threads                 = True
+        self.port                                       = self.http_server.server_address[1]
+        self.server_thread                              = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+        self.server_thread.start()
+        return self.url()
+
+    def stop(self):
+        '''
+        Stops the server, if it is running.
+        '''
+        if not self.http_server is None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_server                            = None
+
+    def url(self):
+        '''
+        :return: the base URL of the server, to be used as the GitHub API URL.
+        :rtype: str
+        '''
+        return f"http://{self.host}:{self.port}"
+
+    def repo_path(self, owner, repo):
+        '''
+        :return: the path of the bare repo for the given ``owner`` and ``repo``, or None if there is no such repo.
+        :rtype: str
+        '''
+        for candidate in [f"{self.repos_root}/{owner}/{repo}.git", f"{self.repos_root}/{owner}/{repo}"]:
+            if Path(candidate).is_dir():
+                return candidate
+        return None
+
+    def git(self, repo_path, args, check=True, env=None):
+        '''
+        Runs a GIT command in the bare repo at ``repo_path``.
+
+        :return: the standard output of the command, or None if it failed and ``check`` is False.
+        :rtype: str
+        '''
+        completed                                       = subprocess.run(["git", "-C", repo_path] + args, capture_output=True,
+                                                                         text=True, env=env)
+        if completed.returncode != 0:
+            if check:
+                raise ValueError(f"GIT command {args} failed in '{repo_path}': {completed.stderr}")
+            return None
+        return completed.stdout
+
+    def charge_budget(self, resource):
+        '''
+        Consumes one call from the rate limit budget of ``resource``.
+
+        :return: the rate limit headers to add to the response, and whether the budget was already exhausted.
+        :rtype: tuple
+        '''
+        now                                             = time.time()
+        with self.lock:
+            budget                                      = self.budgets_dict.get(resource)
+            if budget is None or budget[1] <= now:
+                budget                                  = [self.rate_limit, int(now) + self.rate_limit_window]
+                self.budgets_dict[resource]             = budget
+            exhausted                                   = budget[0] <= 0
+            if not exhausted:
+                budget[0]                               -= 1
+            headers                                     = {"X-RateLimit-Limit":       str(self.rate_limit),
+                                                           "X-RateLimit-Remaining":   str(budget[0]),
+                                                           "X-RateLimit-Reset":       str(budget[1]),
+                                                           "X-RateLimit-Resource":    resource}
+        return headers, exhausted
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    '''
+    Handles the HTTP requests received by a :class:`GitHub_StandInServer`. The ``stand_in`` class attribute is set
+    to the server instance by a subclass created when the server starts.
+    '''
+    stand_in                                            = None
+
+    # HTTP/1.1 so that clients can keep connections alive, as they would with GitHub
+    protocol_version                                    = "HTTP/1.1"
+
+    DOC_URL                                             = "https://docs.github.com/rest"
+
+    # Routes are tried in order. Each is a tuple (method, regex for the path, name of the handler method)
+    ROUTES                                              = [
+        ("GET",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)",                                 "_get_repo"),
+        ("GET",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/branches",                        "_list_branches"),
+        ("GET",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/commits",                         "_list_commits"),
+        ("GET",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/commits/(?P<ref>.+)",             "_get_commit"),
+        ("GET",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/compare/(?P<basehead>.+)",       "_compare"),
+        ("PATCH",   r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/refs/heads/(?P<branch>.+)",   "_update_ref"),
+        ("POST",    r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pulls",                           "_create_pull"),
+        ("GET",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)",           "_get_pull"),
+        ("PUT",     r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)/merge",     "_merge_pull"),
+        ("GET",     r"/(?:orgs|users)/(?P<owner>[^/]+)/repos",                                  "_list_repos"),
+        ("POST",    r"/orgs/(?P<owner>[^/]+)/repos",                                            "_create_repo"),
+        ("POST",    r"/user/repos",                                                             "_create_repo"),
+        ("GET",     r"/user",                                                                   "_get_user"),
+        ("GET",     r"/user/repos",                                                             "_list_user_repos"),
+        ("POST",    r"/graphql",                                                                "_graphql"),
+    ]
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        # Silence the default logging to stderr for each request
+        pass
+
+    def _dispatch(self, method):
+        S                                               = self.stand_in
+        split_url                                       = urlsplit(self.path)
+        self.query                                      = {k: v[-1] for k, v in parse_qs(split_url.query).items()}
+        length                                          = int(self.headers.get("Content-Length", 0))
+        raw_body                                        = self.rfile.read(length) if length > 0 else b""
+        try:
+            self.body                                   = json.loads(raw_body) if len(raw_body) > 0 else {}
+        except ValueError:
+            self.body                                   = {}
+
+        if S.latency > 0:
+            time.sleep(S.latency)
+
+        resource                                        = "graphql" if split_url.path == "/graphql" else "core"
+        rate_headers, exhausted                         = S.charge_budget(resource)
+        if exhausted:
+            return self._respond(403, {"message": "API rate limit exceeded", "documentation_url": self.DOC_URL},
+                                 rate_headers)
+
+        is_mutation                                     = method != "GET" and not (
+                                                            resource == "graphql"
+                                                            and not str(self.body.get("query", "")).lstrip().startswith("mutation"))
+        if S.error_rate > 0 and (S.inject_into_mutations or not is_mutation) and S.random.random() < S.error_rate:
+            status                                      = S.random.choice(S.error_statuses)
+            return self._respond(status, {"message": f"Injected error {status}"}, rate_headers)
+
+        for route_method, pattern, handler_name in self.ROUTES:
+            match                                       = re.fullmatch(pattern, split_url.path.rstrip("/"))
+            if route_method == method and not match is None:
+                try:
+                    status, payload, extra_headers      = getattr(self, handler_name)(**match.groupdict())
+                except Exception as ex:
+                    status, payload, extra_headers      = 500, {"message": str(ex)}, {}
+                headers                                 = dict(rate_headers)
+                headers.update(extra_headers)
+                return self._respond(status, payload, headers)
+
+        self._respond(404, {"message": "Not Found", "documentation_url": self.DOC_URL}, rate_headers)
+
+    def _respond(self, status, payload, headers):
+        body                                            = json.dumps(payload).encode("utf-8")
+        etag                                            = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+        if status == 200 and self.command == "GET" and self.headers.get("If-None-Match") == etag:
+            status, body                                = 304, b""
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status in [200, 304] and self.command == "GET":
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        return 404, {"message": "Not Found", "documentation_url": self.DOC_URL}, {}
+
+    def _page_links(self, more_pages):
+        '''
+        :return: the headers with a GitHub-style ``Link`` header to the next page, if there are ``more_pages``.
+        :rtype: dict
+        '''
+        if not more_pages:
+            return {}
+        query                                           = dict(self.query)
+        query["page"]                                   = str(int(query.get("page", 1)) + 1)
+        next_url                                        = f"{self.stand_in.url()}{urlsplit(self.path).path}?{urlencode(query)}"
+        return {"Link": f'<{next_url}>; rel="next"'}
+
+    def _paging(self):
+        per_page                                        = min(int(self.query.get("per_page", 30)), 100)
+        page                                            = int(self.query.get("page", 1))
+        return per_page, page
+
+    # ------------------------------------- Route handlers --------------------------------------------
+
+    def _get_repo(self, owner, repo):
+        repo_path                                       = self.stand_in.repo_path(owner, repo)
+        if repo_path is None:
+            return self._not_found()
+        return 200, self._repo_json(owner, repo, repo_path), {}
+
+    def _list_repos(self, owner):
+        S                                               = self.stand_in
+        owner_path                                      = Path(S.repos_root) / owner
+        if not owner_path.is_dir():
+            return self._not_found()
+        per_page, page                                  = self._paging()
+        repos_l                                         = sorted([p.name[:-len(".git")] if p.name.endswith(".git") else p.name
+                                                                    for p in owner_path.iterdir() if p.is_dir()])
+        page_l                                          = repos_l[(page - 1) * per_page: page * per_page]
+        payload                                         = [self._repo_json(owner, repo, S.repo_path(owner, repo)) for repo in page_l]
+        return 200, payload, self._page_links(page * per_page < len(repos_l))
+
+    def _list_branches(self, owner, repo):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        if repo_path is None:
+            return self._not_found()
+        per_page, page                                  = self._paging()
+        raw                                             = S.git(repo_path, ["for-each-ref", "--format=%(refname:short) %(objectname)",
+                                                                            "refs/heads"])
+        branches_l                                      = [line.split(" ") for line in raw.splitlines() if len(line) > 0]
+        page_l                                          = branches_l[(page - 1) * per_page: page * per_page]
+        payload                                         = [{"name": name, "commit": {"sha": sha}} for name, sha in page_l]
+        return 200, payload, self._page_links(page * per_page < len(branches_l))
+
+    def _list_commits(self, owner, repo):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        if repo_path is None:
+            return self._not_found()
+        per_page, page                                  = self._paging()
+
+        # Resolve the ref first, since GitHub answers an unknown ref with an error that is not worth retrying (as
+        # opposed to the 500 that a failing "git log" would cause)
+        ref                                             = self.query.get("sha", "HEAD")
+        sha                                             = S.git(repo_path, ["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+                                                                check=False)
+        if sha is None and not "sha" in self.query:
+            return 409, {"message": "Git Repository is empty.", "documentation_url": self.DOC_URL}, {}
+        if sha is None:
+            return 404, {"message": f"No commit found for SHA: {ref}", "documentation_url": self.DOC_URL}, {}
+
+        args                                            = ["log", "--format=%H", f"--skip={(page - 1) * per_page}",
+                                                           f"--max-count={per_page + 1}"]
+        for param in ["since", "until"]:
+            if param in self.query:
+                args.append(f"--{param}={self.query[param]}")
+        args.append(sha.strip())
+        if "path" in self.query:
+            args.extend(["--", self.query["path"]])
+
+        shas_l                                          = S.git(repo_path, args).split()
+        payload                                         = [self._commit_json(owner, repo, repo_path, sha, with_files=False)
+                                                           for sha in shas_l[:per_page]]
+        return 200, payload, self._page_links(len(shas_l) > per_page)
+
+    def _get_commit(self, owner, repo, ref):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        if repo_path is None:
+            return self._not_found()
+        sha                                             = S.git(repo_path, ["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+                                                                check=False)
+        if sha is None:
+            return 422, {"message": f"No commit found for SHA: {ref}", "documentation_url": self.DOC_URL}, {}
+        return 200, self._commit_json(owner, repo, repo_path, sha.strip(), with_files=True), {}
+
+    def _compare(self, owner, repo, basehead):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        if repo_path is None or not "..." in basehead:
+            return self._not_found()
+        base, head                                      = basehead.split("...", 1)
+        shas_l                                          = [S.git(repo_path, ["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+                                                                 check=False) for ref in [base, head]]
+        if None in shas_l:
+            return 404, {"message": "Not Found", "documentation_url": self.DOC_URL}, {}
+        base_sha, head_sha                              = [sha.strip() for sha in shas_l]
+
+        behind_by, ahead_by                             = [int(n) for n in S.git(repo_path, ["rev-list", "--left-right", "--count",
+                                                                                             f"{base_sha}...{head_sha}"]).split()]
+        merge_base                                      = S.git(repo_path, ["merge-base", base_sha, head_sha], check=False)
+        status                                          = "identical" if ahead_by == behind_by == 0 \
+                                                            else "ahead" if behind_by == 0 \
+                                                            else "behind" if ahead_by == 0 else "diverged"
+        per_page, page                                  = self._paging()
+        commits_l                                       = S.git(repo_path, ["rev-list", "--reverse", f"{base_sha}..{head_sha}"]).split()
+        page_l                                          = commits_l[(page - 1) * per_page: page * per_page]
+        return 200, {"status":              status,
+                     "ahead_by":            ahead_by,
+                     "behind_by":           behind_by,
+                     "total_commits":       ahead_by,
+                     "base_commit":         {"sha": base_sha},
+                     "merge_base_commit":   {"sha": None if merge_base is None else merge_base.strip()},
+                     "commits":             [self._commit_json(owner, repo, repo_path, sha, with_files=False) for sha in page_l],
+                     "files":               []}, \
+               self._page_links(page * per_page < len(commits_l))
+
+    def _update_ref(self, owner, repo, branch):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        if repo_path is None:
+            return self._not_found()
+        new_sha                                         = self.body.get("sha")
+        with S.lock:
+            old_sha                                     = self._branch_sha(repo_path, branch)
+            if old_sha is None or new_sha is None \
+                    or S.git(repo_path, ["cat-file", "-e", f"{new_sha}^{{commit}}"], check=False) is None:
+                return 422, {"message": "Reference does not exist", "documentation_url": self.DOC_URL}, {}
+            if not self.body.get("force", False) \
+                    and S.git(repo_path, ["merge-base", "--is-ancestor", old_sha, new_sha], check=False) is None:
+                return 422, {"message": "Update is not a fast forward", "documentation_url": self.DOC_URL}, {}
+            S.git(repo_path, ["update-ref", f"refs/heads/{branch}", new_sha, old_sha])
+        return 200, {"ref": f"refs/heads/{branch}", "object": {"sha": new_sha, "type": "commit"}}, {}
+
+    def _create_pull(self, owner, repo):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        if repo_path is None:
+            return self._not_found()
+        head, base                                      = self.body.get("head"), self.body.get("base")
+        head_sha                                        = self._branch_sha(repo_path, head)
+        base_sha                                        = self._branch_sha(repo_path, base)
+        if head_sha is None or base_sha is None:
+            return 422, {"message": "Validation Failed",
+                         "errors": [{"resource": "PullRequest", "field": "head" if head_sha is None else "base",
+                                     "code": "invalid"}],
+                         "documentation_url": self.DOC_URL}, {}
+
+        if S.git(repo_path, ["merge-base", "--is-ancestor", head_sha, base_sha], check=False) is not None:
+            return 422, {"message": "Validation Failed",
+                         "errors": [{"resource": "PullRequest", "code": "custom",
+                                     "message": f"No commits between {base} and {head}"}],
+                         "documentation_url": self.DOC_URL}, {}
+
+        with S.lock:
+            pulls_l                                     = S.pulls_dict.setdefault((owner, repo), [])
+            pull                                        = {"number":      len(pulls_l) + 1,
+                                                           "state":       "open",
+                                                           "title":       self.body.get("title"),
+                                                           "body":        self.body.get("body"),
+                                                           "head":        {"ref": head, "sha": head_sha},
+                                                           "base":        {"ref": base, "sha": base_sha},
+                                                           "merged":      False,
+                                                           "_created":    time.monotonic()}
+            pulls_l.append(pull)
+        return 201, self._pull_json(repo_path, pull), {}
+
+    def _get_pull(self, owner, repo, number):
+        repo_path                                       = self.stand_in.repo_path(owner, repo)
+        pull                                            = self._find_pull(owner, repo, number)
+        if repo_path is None or pull is None:
+            return self._not_found()
+        return 200, self._pull_json(repo_path, pull), {}
+
+    def _merge_pull(self, owner, repo, number):
+        S                                               = self.stand_in
+        repo_path                                       = S.repo_path(owner, repo)
+        pull                                            = self._find_pull(owner, repo, number)
+        if repo_path is None or pull is None:
+            return self._not_found()
+
+        with S.lock:
+            if pull["merged"] or not self._is_mergeability_known(pull):
+                return 405, {"message": "Pull Request is not mergeable", "documentation_url": self.DOC_URL}, {}
+            head_sha                                    = self._branch_sha(repo_path, pull["head"]["ref"])
+            base_sha                                    = self._branch_sha(repo_path, pull["base"]["ref"])
+            if "sha" in self.body and self.body["sha"] != head_sha:
+                return 409, {"message": "Head branch was modified. Review and try the merge again.",
+                             "documentation_url": self.DOC_URL}, {}
+
+            merge_sha                                   = self._merge_commit(repo_path, base_sha, head_sha,
+                                                                             self.body.get("commit_title") or pull["title"])
+            if merge_sha is None:
+                return 405, {"message": "Pull Request is not mergeable", "documentation_url": self.DOC_URL}, {}
+            S.git(repo_path, ["update-ref", f"refs/heads/{pull['base']['ref']}", merge_sha, base_sha])
+            pull["merged"]                              = True
+            pull["state"]                               = "closed"
+        return 200, {"sha": merge_sha, "merged": True, "message": "Pull Request successfully merged"}, {}
+
+    def _authenticated_user(self):
+        '''
+        :return: the owner taken to be the authenticated user, or None if it can't be inferred. Since the stand-in
+            does not know users, it is the only owner folder if there is exactly one.
+        :rtype: str
+        '''
+        S                                               = self.stand_in
+        owners_l                                        = [p.name for p in Path(S.repos_root).iterdir() if p.is_dir()] \
+                                                            if Path(S.repos_root).is_dir() else []
+        return owners_l[0] if len(owners_l) == 1 else None
+
+    def _get_user(self):
+        owner                                           = self._authenticated_user()
+        if owner is None:
+            return 401, {"message": "Requires authentication", "documentation_url": self.DOC_URL}, {}
+        return 200, {"login": owner, "type": "User"}, {}
+
+    def _list_user_repos(self):
+        # The stand-in has no private repos nor collaborators, so every "affiliation" lists the same repos
+        owner                                           = self._authenticated_user()
+        if owner is None:
+            return 401, {"message": "Requires authentication", "documentation_url": self.DOC_URL}, {}
+        return self._list_repos(owner)
+
+    def _create_repo(self, owner=None):
+        S                                               = self.stand_in
+        name                                            = self.body.get("name")
+        if owner is None:
+            # The "user" resource creates the repo for the authenticated user
+            owner                                       = self._authenticated_user()
+            if owner is None:
+                return 422, {"message": "Can't infer the authenticated user", "documentation_url": self.DOC_URL}, {}
+        if name is None or not S.repo_path(owner, name) is None:
+            return 422, {"message": "Validation Failed",
+                         "errors": [{"resource": "Repository", "field": "name", "code": "custom",
+                                     "message": "name already exists on this account"}],
+                         "documentation_url": self.DOC_URL}, {}
+        repo_path                                       = f"{S.repos_root}/{owner}/{name}.git"
+        Path(repo_path).mkdir(parents=True)
+        S.git(repo_path, ["init", "--bare", "--initial-branch=master"])
+        return 201, self._repo_json(owner, name, repo_path), {}
+
+    def _graphql(self):
+        '''
+        Supports queries with aliased ``repository(owner: ..., name: ...)`` fields, like those made by
+        :class:`GitHub_BundleInspector`. Within each of them, it supports the ``name``, ``refs``, and
+        ``ref(qualifiedName: ...)`` fields, the latter with its ``target`` commit and ``compare(headRef: ...)``, and
+        the ``pullRequest(number: ...)`` field. Arguments may be literals or variables.
+        '''
+        S                                               = self.stand_in
+        query                                           = self.body.get("query", "")
+        variables                                       = self.body.get("variables") or {}
+
+        def _value(token):
+            token                                       = token.strip()
+            return variables.get(token[1:]) if token.startswith("$") else token.strip('"')
+
+        def _argument(pattern, text):
+            match                                       = re.search(pattern + r"\s*(\$\w+|\"[^\"]*\"|\d+)", text)
+            return None if match is None else _value(match.group(1))
+
+        data                                            = {}
+        for match in re.finditer(
+                r"(\w+)\s*:\s*repository\(\s*owner:\s*(\$\w+|\"[^\"]*\")\s*,\s*name:\s*(\$\w+|\"[^\"]*\")\s*\)", query):
+            alias, owner, repo                          = match.group(1), _value(match.group(2)), _value(match.group(3))
+            repo_path                                   = S.repo_path(owner, repo)
+            if repo_path is None:
+                data[alias]                             = None
+                continue
+
+            # The selection of this alias is the balanced block of braces after it. If it uses fragments, we
+            # look at the whole query instead
+            block                                       = self._balanced_block(query, match.end())
+            scope                                       = query if "..." in block else block
+
+            ref_json                                    = None
+            qualified_ref                               = _argument(r"ref\(qualifiedName:", scope)
+            sha                                         = None if qualified_ref is None \
+                                                            else S.git(repo_path, ["rev-parse", "--verify", "--quiet",
+                                                                                   qualified_ref], check=False)
+            if not sha is None:
+                commit                                  = self._commit_json(owner, repo, repo_path, sha.strip(), with_files=False)
+                ref_json                                = {"target": {"oid":       commit["sha"],
+                                                                      "message":   commit["commit"]["message"],
+                                                                      "author":    {"date": commit["commit"]["author"]["date"]}}}
+                head_ref                                = _argument(r"compare\(headRef:", scope)
+                head_sha                                = None if head_ref is None \
+                                                            else S.git(repo_path, ["rev-parse", "--verify", "--quiet", head_ref],
+                                                                       check=False)
+                if not head_sha is None:
+                    behind_by, ahead_by                 = [int(n) for n in S.git(repo_path, ["rev-list", "--left-right", "--count",
+                                                                                             f"{sha.strip()}...{head_sha.strip()}"]).split()]
+                    ref_json["compare"]                 = {"aheadBy": ahead_by, "behindBy": behind_by}
+                else:
+                    ref_json["compare"]                 = None
+
+            pull_json                                   = None
+            pull_number                                 = _argument(r"pullRequest\(number:", scope)
+            pull                                        = None if pull_number is None else self._find_pull(owner, repo, pull_number)
+            if not pull is None:
+                rest_json                               = self._pull_json(repo_path, pull)
+                pull_json                               = {"number":            pull["number"],
+                                                           "state":             "MERGED" if pull["merged"] else pull["state"].upper(),
+                                                           "mergeable":         {None: "UNKNOWN", True: "MERGEABLE",
+                                                                                 False: "CONFLICTING"}[rest_json["mergeable"]],
+                                                           "mergeStateStatus":  rest_json["mergeable_state"].upper()}
+
+            raw                                         = S.git(repo_path, ["for-each-ref", "--format=%(refname:short)", "refs/heads"])
+            data[alias]                                 = {"name":  repo,
+                                                           "ref":   ref_json,
+                                                           "pullRequest": pull_json,
+                                                           "refs":  {"pageInfo":  {"hasNextPage": False},
+                                                                     "nodes":     [{"name": b} for b in raw.splitlines() if len(b) > 0]}}
+        return 200, {"data": data}, {}
+
+    def _balanced_block(self, text, start):
+        '''
+        :return: the text from the first "{" at or after ``start`` up to its matching "}".
+        :rtype: str
+        '''
+        open_idx                                        = text.find("{", start)
+        if open_idx < 0:
+            return ""
+        depth                                           = 0
+        for idx in range(open_idx, len(text)):
+            depth                                       += {"{": 1, "}": -1}.get(text[idx], 0)
+            if depth == 0:
+                return text[open_idx: idx + 1]
+        return text[open_idx:]
+
+    # ------------------------------------- Helpers --------------------------------------------
+
+    def _find_pull(self, owner, repo, number):
+        with self.stand_in.lock:
+            for pull in self.stand_in.pulls_dict.get((owner, repo), []):
+                if pull["number"] == int(number):
+                    return pull
+        return None
+
+    def _branch_sha(self, repo_path, branch):
+        if branch is None:
+            return None
+        sha                                             = self.stand_in.git(repo_path, ["rev-parse", "--verify", "--quiet",
+                                                                                        f"refs/heads/{branch}"], check=False)
+        return None if sha is None else sha.strip()
+
+    def _merge_commit(self, repo_path, base_sha, head_sha, title):
+        '''
+        Creates a merge commit of ``head_sha`` into ``base_sha`` without needing a working tree.
+
+        :return: the SHA of the merge commit, or None if there are conflicts.
+        :rtype: str
+        '''
+        S                                               = self.stand_in
+        tree                                            = S.git(repo_path, ["merge-tree", "--write-tree", base_sha, head_sha],
+                                                                check=False)
+        if tree is None:
+            return None
+        env                                             = dict(os.environ,
+                                                               GIT_AUTHOR_NAME        = "GitHub Stand-In",
+                                                               GIT_AUTHOR_EMAIL       = "noreply@localhost",
+                                                               GIT_COMMITTER_NAME     = "GitHub Stand-In",
+                                                               GIT_COMMITTER_EMAIL    = "noreply@localhost")
+        return S.git(repo_path, ["commit-tree", tree.splitlines()[0], "-p", base_sha, "-p", head_sha, "-m", title],
+                     env=env).strip()
+
+    def _repo_json(self, owner, repo, repo_path):
+        S                                               = self.stand_in
+        head                                            = S.git(repo_path, ["symbolic-ref", "--short", "HEAD"], check=False)
+        # Like in GitHub, pushed_at is the last time any ref was updated, which we take from the refs' files
+        ref_paths_l                                     = [p for p in Path(repo_path, "refs").rglob("*")] \
+                                                            + [Path(repo_path, "packed-refs")]
+        mtimes_l                                        = [p.stat().st_mtime for p in ref_paths_l if p.exists()]
+        pushed_at                                       = None if len(mtimes_l) == 0 \
+                                                            else time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(max(mtimes_l))) \
+                                                                + f".{int(max(mtimes_l) * 1e6) % 1000000:06d}Z"
+        return {"name":              repo,
+                "full_name":         f"{owner}/{repo}",
+                "default_branch":    "master" if head is None else head.strip(),
+                "pushed_at":         pushed_at,
+                "url":               f"{S.url()}/repos/{owner}/{repo}"}
+
+    def _commit_json(self, owner, repo, repo_path, sha, with_files):
+        S                                               = self.stand_in
+        FIELDS                                          = ["%H", "%P", "%an", "%ae", "%aI", "%cn", "%ce", "%cI", "%B"]
+        raw                                             = S.git(repo_path, ["show", "-s", "--format=" + "%x00".join(FIELDS), sha])
+        sha, parents, a_name, a_email, a_date, c_name, c_email, c_date, message \
+                                                        = raw.split("\x00", len(FIELDS) - 1)
+        parents_l                                       = parents.split()
+        commit_url                                      = f"{S.url()}/repos/{owner}/{repo}/commits"
+        result                                          = {"sha":       sha,
+                                                           "url":       f"{commit_url}/{sha}",
+                                                           "commit":    {"author":      {"name": a_name, "email": a_email, "date": a_date},
+                                                                         "committer":   {"name": c_name, "email": c_email, "date": c_date},
+                                                                         "message":     message.rstrip("\n")},
+                                                           "parents":   [{"sha": p, "url": f"{commit_url}/{p}"} for p in parents_l]}
+        if with_files:
+            # Like GitHub, files of a merge commit are those changed with respect to the first parent
+            diff_args                                   = ["diff-tree", "-r", "--root", "--no-commit-id", "--name-status", sha] \
+                                                            if len(parents_l) < 2 else ["diff", "--name-status", parents_l[0], sha]
+            STATUS_NAMES                                = {"A": "added", "M": "modified", "D": "removed", "R": "renamed"}
+            files_l                                     = []
+            for line in S.git(repo_path, diff_args).splitlines():
+                tokens                                  = line.split("\t")
+                if len(tokens) >= 2:
+                    files_l.append({"filename": tokens[-1], "status": STATUS_NAMES.get(tokens[0][0], "changed")})
+            result["files"]                             = files_l
+        return result
+
+    def _pull_json(self, repo_path, pull):
+        result                                          = {k: v for k, v in pull.items() if not k.startswith("_")}
+        # GitHub computes mergeability in the background, which we simulate with the mergeability_delay
+        if pull["merged"] or not self._is_mergeability_known(pull):
+            result["mergeable"]                         = None
+        else:
+            result["mergeable"]                         = self._is_mergeable(repo_path, pull)
+        result["mergeable_state"]                       = {None: "unknown", True: "clean", False: "dirty"}[result["mergeable"]]
+        return result
+
+    def _is_mergeability_known(self, pull):
+        return time.monotonic() - pull["_created"] >= self.stand_in.mergeability_delay
+
+    def _is_mergeable(self, repo_path, pull):
+        return not self.stand_in.git(repo_path, ["merge-tree", "--write-tree", pull["base"]["ref"], pull["head"]["ref"]],
+                                     check=False) is None
+
+if __name__ == "__main__":
+    parser                                              = argparse.ArgumentParser(description="Local stand-in for the GitHub API")
+    parser.add_argument("--repos-root",     required=True, help="folder with bare repos as {owner}/{repo}.git")
+    parser.add_argument("--port",           type=int,   default=8765)
+    parser.add_argument("--latency",        type=float, default=0.0, help="seconds of delay per response")
+    parser.add_argument("--rate-limit",     type=int,   default=5000, help="calls per rate limit window")
+    parser.add_argument("--error-rate",     type=float, default=0.0, help="probability of an injected error")
+    parser.add_argument("--mergeability-delay", type=float, default=0.0,
+                        help="seconds during which the mergeability of a new pull request is unknown")
+    args                                                = parser.parse_args()
+
+    stand_in                                            = GitHub_StandInServer(repos_root   = args.repos_root,
+                                                                               latency      = args.latency,
+                                                                               rate_limit   = args.rate_limit,
+                                                                               error_rate   = args.error_rate,
+                                                                               port         = args.port,
+                                                                               mergeability_delay = args.mergeability_delay)
+    print(f"GitHub stand-in serving '{args.repos_root}' at {stand_in.start()} - press Ctrl+C to stop")
+    try:
+        stand_in.server_thread.join()
+    except KeyboardInterrupt:
+        stand_in.stop()
@@ -36,6 +36,7 @@ class Troubleshooter():
             with asyncio.Runner() as runner:
             
                 #runner.run(self.create_pull_request())
+                #runner.run(self.drill_pull_requests_against_stand_in())
                 #runner.run(self.troubleshoot_repo_report())
                 runner.run(self.troubleshoot_scheduled_based_sorter())
 
@@ -61,6 +62,24 @@ class Troubleshooter():
                                                                         body          = "Discard this PR")
         return pr1
         
+    async def drill_pull_requests_against_stand_in(self):
+        '''
+        '''
+        # Pre-flight: need to initialize an application since the GitHub_Client logs through it and reads the
+        # GitHub token from it (the stand-in server ignores the token)
+        #
+        sys.path.extend([CODING_ROOT + "/conway_ops/src/nb_apps"])
+        from chassis_nb_application                                     import Chassis_NB_Application
+        Chassis_NB_Application()
+
+        from conway_ops.util.github_stand_in_drill                      import GitHub_StandInDrill
+
+        # Now the main troubleshooting: pull requests with and without fast-forwarding, while 1 in 5 calls fails
+        result_df, metrics_df               = await GitHub_StandInDrill.run(error_rate=0.2, seed=7)
+        print(result_df.to_string(index=False))
+        print(metrics_df.to_string(index=False))
+        return result_df
+
     async def troubleshoot_repo_report(self):
         '''
         '''